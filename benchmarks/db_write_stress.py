@@ -0,0 +1,272 @@
+# benchmarks/db_write_stress.py
+"""Нагружает запись в БД конкурентными писателями и ищет предел текущей схемы.
+
+Запуск из корня проекта:
+    python -m benchmarks.db_write_stress [--writers 1,4,16,64] [--journal-modes default,wal]
+        [--ops-per-writer 200] [--hot-users 10] [--busy-timeout 5] [--output stress.json]
+
+N корутин-писателей одновременно вызывают сервисы бота - log_group_message,
+increment_interview_count, log_link_request и add_link - каждая операция в
+своей сессии и на своем соединении из пула, как при обработке обновлений.
+Для каждого режима журнала SQLite (по умолчанию - rollback journal, и WAL)
+и каждого числа писателей берется чистая база. Выводится:
+
+*   tx_per_second - успешных транзакций в секунду;
+*   latency - задержка одной операции (p50/p95/p99);
+*   contention_wait - сколько операции ждали сверх своей медианы без
+    конкуренции (замер с одним писателем): ожидание блокировок SQLite,
+    свободного соединения в пуле и event loop;
+*   failures и locked_errors - неуспешные операции и ошибки "database is locked";
+*   lost_increments - насколько счетчики UserStats у "горячих" пользователей
+    меньше числа успешных инкрементов (потерянные обновления read-modify-write).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Обязательные настройки для запуска без .env
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK-TOKEN")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("MAIN_GROUP_ID", "-1001000000001")
+
+from sqlalchemy import event, select
+
+from benchmarks.update_replay import percentile
+
+OPERATIONS = ("log_group_message", "increment_interview_count", "log_link_request", "add_link")
+DEFAULT_MIX = "log_group_message=60,increment_interview_count=20,log_link_request=15,add_link=5"
+HOT_USER_BASE = 2_000_000
+GROUP_ID = -1001000000001
+
+
+class LockErrorCounter:
+    """Считает ошибки "database is locked" на уровне драйвера (сервисы ловят исключения сами)."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "handle_error", self._on_error)
+
+    def _on_error(self, exception_context) -> None:
+        if "database is locked" in str(exception_context.original_exception):
+            self.count += 1
+
+
+def parse_mix(raw: str) -> Dict[str, int]:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {name}")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+async def _configure(db_path: Path, journal_mode: str, writers: int, busy_timeout: float):
+    from src.services.database import async_init_db, configure_database
+
+    engine = await configure_database(
+        f"sqlite+aiosqlite:///{db_path}",
+        pool_size=writers, max_overflow=0, connect_args={"timeout": busy_timeout},
+    )
+    if journal_mode != "default":
+        @event.listens_for(engine.sync_engine, "connect")
+        def _set_journal_mode(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.close()
+    await async_init_db()
+    return engine
+
+
+async def _seed(hot_users: int) -> int:
+    """Горячие пользователи с одним сообщением и опубликованная ссылка для log_link_request."""
+    from src.services.link_service import add_link
+    from src.services.stats_service import log_group_message
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for index in range(hot_users):
+        user_id = HOT_USER_BASE + index
+        await log_group_message(index, GROUP_ID, user_id, f"user{user_id}", "seed", now)
+    link = await add_link(user_id=1, username="admin", first_name="Admin", last_name=None,
+                          link_url="https://meet.example.com/stress", announcement_text="Stress")
+    return link.id
+
+
+async def run_level(journal_mode: str, writers: int, args, db_dir: Path,
+                    baseline: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    from src.db.models import UserStats
+    from src.services.database import get_session
+    from src.services.link_service import add_link, log_link_request
+    from src.services.stats_service import increment_interview_count, log_group_message
+
+    engine = await _configure(db_dir / f"{journal_mode}-{writers}.db", journal_mode, writers, args.busy_timeout)
+    link_id = await _seed(args.hot_users)
+    lock_errors = LockErrorCounter(engine)
+
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    successes: Counter = Counter()
+    failures: Counter = Counter()
+    # Успешные инкременты по горячим пользователям: (user_id, поле) -> число
+    expected: Counter = Counter()
+    sequence = iter(range(10**9))
+
+    async def writer(writer_index: int):
+        rnd = random.Random(args.seed * 1000 + writer_index)
+        for _ in range(args.ops_per_writer):
+            operation = rnd.choices(names, weights)[0]
+            n = next(sequence)
+            hot_user = HOT_USER_BASE + rnd.randrange(args.hot_users)
+            start = time.perf_counter()
+            try:
+                if operation == "log_group_message":
+                    ok = await log_group_message(
+                        100_000 + n, GROUP_ID, hot_user, f"user{hot_user}", "stress message",
+                        datetime.datetime.now(datetime.timezone.utc),
+                    )
+                elif operation == "increment_interview_count":
+                    ok = await increment_interview_count(hot_user, f"user{hot_user}")
+                elif operation == "log_link_request":
+                    ok = await log_link_request(hot_user, f"user{hot_user}", link_id)
+                else:
+                    # Уникальный автор, чтобы его инкремент не смешивался с горячими пользователями
+                    ok = await add_link(user_id=5_000_000 + n, username=None, first_name="Stress", last_name=None,
+                                        link_url=f"https://meet.example.com/{n}", announcement_text="Stress")
+                    ok = ok is not None
+            except Exception:
+                ok = False
+            latencies[operation].append(time.perf_counter() - start)
+            if ok:
+                successes[operation] += 1
+                if operation == "log_group_message":
+                    expected[(hot_user, "message_count")] += 1
+                elif operation == "increment_interview_count":
+                    expected[(hot_user, "interview_count")] += 1
+            else:
+                failures[operation] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(index) for index in range(writers)))
+    elapsed = time.perf_counter() - start
+
+    # Потерянные инкременты: сравниваем счетчики в БД с числом успешных вызовов
+    async with get_session() as session:
+        result = await session.execute(select(UserStats).where(
+            UserStats.user_id.between(HOT_USER_BASE, HOT_USER_BASE + args.hot_users - 1)
+        ))
+        rows = {row.user_id: row for row in result.scalars()}
+    lost = Counter()
+    for (user_id, field), count in expected.items():
+        # +1 сообщение за счет начального заполнения
+        want = count + (1 if field == "message_count" else 0)
+        have = getattr(rows[user_id], field) if user_id in rows else 0
+        lost[field] += max(0, want - have)
+
+    all_latencies = sorted(value for values in latencies.values() for value in values)
+    contention_wait = 0.0
+    if baseline:
+        for operation, values in latencies.items():
+            median = baseline.get(operation, 0.0)
+            contention_wait += sum(max(0.0, value - median) for value in values)
+    total_ops = len(all_latencies)
+    return {
+        "journal_mode": journal_mode,
+        "writers": writers,
+        "operations": total_ops,
+        "seconds": round(elapsed, 3),
+        "tx_per_second": round(sum(successes.values()) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(all_latencies, 50) * 1000, 3),
+            "p95": round(percentile(all_latencies, 95) * 1000, 3),
+            "p99": round(percentile(all_latencies, 99) * 1000, 3),
+        },
+        "contention_wait_ms": {
+            "total": round(contention_wait * 1000, 1),
+            "per_operation": round(contention_wait / total_ops * 1000, 3) if total_ops else 0.0,
+        } if baseline else None,
+        "successes": dict(successes),
+        "failures": dict(failures),
+        "locked_errors": lock_errors.count,
+        "lost_increments": {"message_count": lost["message_count"], "interview_count": lost["interview_count"]},
+        "_medians": {
+            operation: percentile(sorted(values), 50) for operation, values in latencies.items()
+        },
+    }
+
+
+async def _run(args) -> Dict[str, Any]:
+    from src.services import sql_profiler
+
+    # Профайлер SQL пишет медленные запросы в лог - здесь это шум
+    sql_profiler.configure_sql_profiler(False, 1000.0)
+    writer_levels = [int(value) for value in args.writers.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bot-stress-") as db_dir:
+        for journal_mode in args.journal_modes.split(","):
+            # Медианы без конкуренции - точка отсчета для contention_wait
+            calibration = await run_level(journal_mode, 1, args, Path(db_dir), None)
+            baseline = calibration["_medians"]
+            for writers in writer_levels:
+                if writers == 1:
+                    result = calibration
+                    result["contention_wait_ms"] = {"total": 0.0, "per_operation": 0.0}
+                else:
+                    result = await run_level(journal_mode, writers, args, Path(db_dir), baseline)
+                results.append({key: value for key, value in result.items() if not key.startswith("_")})
+                print(
+                    f"{journal_mode:>8} writers={writers:<4} tx/s={result['tx_per_second']:<8} "
+                    f"p95={result['latency_ms']['p95']:.1f} ms failures={sum(result['failures'].values())} "
+                    f"locked={result['locked_errors']} lost={sum(result['lost_increments'].values())}",
+                    file=sys.stderr, flush=True,
+                )
+        from src.services.database import engine
+        await engine.dispose()
+    return {
+        "params": {
+            "ops_per_writer": args.ops_per_writer,
+            "hot_users": args.hot_users,
+            "mix": parse_mix(args.mix),
+            "busy_timeout_s": args.busy_timeout,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", default="1,4,16,64", help="Уровни конкуренции через запятую")
+    parser.add_argument("--journal-modes", default="default,wal", help="Режимы журнала SQLite: default, wal")
+    parser.add_argument("--ops-per-writer", type=int, default=200)
+    parser.add_argument("--hot-users", type=int, default=10, help="Сколько пользователей делят счетчики")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Веса операций")
+    parser.add_argument("--busy-timeout", type=float, default=5.0, help="Таймаут ожидания блокировки SQLite, с")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Сохранить результат в JSON-файл")
+    args = parser.parse_args()
+
+    # Ошибки сервисов считаются через события движка, в консоль их не печатаем
+    from loguru import logger
+    logger.remove()
+    logging.basicConfig(level=logging.CRITICAL, force=True)
+
+    result = asyncio.run(_run(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
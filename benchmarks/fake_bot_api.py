@@ -0,0 +1,367 @@
+# benchmarks/fake_bot_api.py
+"""Локальный фейковый сервер Telegram Bot API для сквозных нагрузочных прогонов.
+
+Запуск из корня проекта:
+    python -m benchmarks.fake_bot_api [--port 8081] [--latency-ms 40] [--blocked-ratio 0.05]
+        [--feed group_flood --feed-rate 50 --feed-count 5000]
+
+Затем бот запускается с TELEGRAM_API_URL=http://127.0.0.1:8081 и работает с
+сервером как с настоящим API: забирает обновления через getUpdates и
+отправляет сообщения. Поддерживаются getUpdates, sendMessage,
+answerCallbackQuery, editMessageText и deleteMessage (плюс getMe и
+deleteWebhook, без которых бот не стартует; прочие методы просто возвращают
+true). Сервер имитирует:
+
+*   задержку ответа (логнормальное распределение с медианой --latency-ms);
+*   лимиты Telegram: общий на отправку (--global-rate в секунду) и на чат
+    (--private-rate в секунду для личек, --group-rate в минуту для групп),
+    при превышении - ошибка 429 с parameters.retry_after;
+*   пользователей, заблокировавших бота (ошибка 403).
+
+Служебные эндпоинты:
+    POST /control/updates - добавить обновления в очередь (JSON-объект или список);
+    GET  /control/stats   - счетчики вызовов, 429 и 403, доставленные сообщения;
+    POST /control/reset   - сбросить счетчики.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import math
+import random
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+# Методы, на которые действуют лимиты отправки
+RATE_LIMITED_METHODS = frozenset({"sendMessage", "editMessageText"})
+
+
+class SlidingWindow:
+    """Скользящее окно: сколько событий было за последние period секунд."""
+    __slots__ = ("limit", "period", "events")
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self.events: Deque[float] = collections.deque()
+
+    def try_acquire(self, now: float) -> float:
+        """Регистрирует событие; если лимит исчерпан, возвращает секунды до освобождения."""
+        while self.events and self.events[0] <= now - self.period:
+            self.events.popleft()
+        if len(self.events) >= self.limit:
+            return self.events[0] + self.period - now
+        self.events.append(now)
+        return 0.0
+
+
+class FakeBotApi:
+    """Состояние фейкового API: очередь обновлений, лимиты, счетчики."""
+
+    def __init__(
+        self,
+        latency_ms: float = 40.0,
+        latency_sigma: float = 0.5,
+        global_rate: int = 30,
+        private_rate: int = 1,
+        group_rate: int = 20,
+        blocked_ratio: float = 0.0,
+        blocked_users: Optional[List[int]] = None,
+        seed: int = 0,
+    ):
+        self.latency = latency_ms / 1000
+        self.latency_sigma = latency_sigma
+        self.global_window = SlidingWindow(global_rate, 1.0) if global_rate else None
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.blocked_ratio = blocked_ratio
+        self.blocked_users = set(blocked_users or ())
+        self._random = random.Random(seed)
+        self._chat_windows: Dict[int, SlidingWindow] = {}
+        self._message_ids: Dict[int, int] = collections.defaultdict(int)
+        self._updates: Deque[Dict[str, Any]] = collections.deque()
+        self._new_updates = asyncio.Event()
+        self._next_update_id = 1
+        self.reset_stats()
+
+    # --- Счетчики --- #
+
+    def reset_stats(self) -> None:
+        self.calls: collections.Counter = collections.Counter()
+        self.rate_limited: collections.Counter = collections.Counter()
+        self.blocked: collections.Counter = collections.Counter()
+        self.delivered = 0
+        self.updates_served = 0
+        self.started_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "seconds": round(elapsed, 3),
+            "calls": dict(self.calls),
+            "rate_limited": dict(self.rate_limited),
+            "blocked": dict(self.blocked),
+            "delivered_messages": self.delivered,
+            "delivered_per_second": round(self.delivered / elapsed, 1) if elapsed else None,
+            "updates_served": self.updates_served,
+            "updates_pending": len(self._updates),
+        }
+
+    # --- Очередь обновлений --- #
+
+    def push_update(self, update: Dict[str, Any]) -> None:
+        update = dict(update)
+        update["update_id"] = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append(update)
+        self._new_updates.set()
+
+    async def get_updates(self, offset: int, limit: int, timeout: float) -> List[Dict[str, Any]]:
+        # offset подтверждает все обновления с меньшим id
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch = list(self._updates)[:limit]
+        self.updates_served += len(batch)
+        return batch
+
+    # --- Имитация поведения API --- #
+
+    async def simulate_latency(self) -> None:
+        if self.latency > 0:
+            await asyncio.sleep(self._random.lognormvariate(math.log(self.latency), self.latency_sigma))
+
+    def is_blocked(self, chat_id: int) -> bool:
+        if chat_id <= 0:
+            return False
+        if chat_id in self.blocked_users:
+            return True
+        # Детерминированно по id: один и тот же пользователь "заблокирован" всегда
+        return self.blocked_ratio > 0 and (chat_id * 2654435761 % 1000) < self.blocked_ratio * 1000
+
+    def check_rate_limit(self, chat_id: int, now: float) -> float:
+        window = self._chat_windows.get(chat_id)
+        if window is None:
+            window = (
+                SlidingWindow(self.private_rate, 1.0) if chat_id > 0 else SlidingWindow(self.group_rate, 60.0)
+            )
+            self._chat_windows[chat_id] = window
+        retry_after = window.try_acquire(now)
+        if retry_after:
+            return retry_after
+        if self.global_window is not None:
+            retry_after = self.global_window.try_acquire(now)
+            if retry_after:
+                # Глобальный лимит не должен съедать слот чата
+                window.events.pop()
+        return retry_after
+
+    def make_message(self, chat_id: int, text: Optional[str], reply_markup: Any = None,
+                     message_id: Optional[int] = None) -> Dict[str, Any]:
+        if message_id is None:
+            self._message_ids[chat_id] += 1
+            message_id = self._message_ids[chat_id]
+        chat = {"id": chat_id, "type": "private"} if chat_id > 0 else {"id": chat_id, "type": "supergroup", "title": "Fake group"}
+        message = {"message_id": message_id, "date": int(time.time()), "chat": chat, "from": BOT_USER, "text": text or ""}
+        if reply_markup:
+            message["reply_markup"] = reply_markup
+        return message
+
+
+# --- HTTP --- #
+
+def _ok(result: Any) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(code: int, description: str, parameters: Optional[Dict[str, Any]] = None) -> web.Response:
+    payload: Dict[str, Any] = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        payload["parameters"] = parameters
+    return web.json_response(payload, status=code)
+
+
+def _parse_value(value: Any) -> Any:
+    # aiogram шлет сложные поля (reply_markup и т.п.) JSON-строкой в form-data
+    if isinstance(value, str) and value[:1] in ("{", "["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+async def _read_params(request: web.Request) -> Dict[str, Any]:
+    if request.content_type == "application/json":
+        return await request.json()
+    params: Dict[str, Any] = dict(request.query)
+    if request.can_read_body:
+        form = await request.post()
+        params.update({key: _parse_value(value) for key, value in form.items() if isinstance(value, str)})
+    return params
+
+
+async def handle_method(request: web.Request) -> web.Response:
+    api: FakeBotApi = request.app["api"]
+    method = request.match_info["method"]
+    params = await _read_params(request)
+    api.calls[method] += 1
+
+    if method == "getUpdates":
+        updates = await api.get_updates(
+            offset=int(params.get("offset", 0)),
+            limit=int(params.get("limit", 100)),
+            timeout=float(params.get("timeout", 0)),
+        )
+        return _ok(updates)
+
+    await api.simulate_latency()
+
+    if method == "getMe":
+        return _ok(BOT_USER)
+    if method in ("sendMessage", "editMessageText", "deleteMessage"):
+        if "chat_id" not in params:
+            # Inline-сообщения (inline_message_id) не имитируем
+            return _ok(True)
+        try:
+            chat_id = int(params["chat_id"])
+        except ValueError:
+            return _error(400, "Bad Request: chat not found")
+        if api.is_blocked(chat_id):
+            api.blocked[method] += 1
+            return _error(403, "Forbidden: bot was blocked by the user")
+        if method in RATE_LIMITED_METHODS:
+            retry_after = api.check_rate_limit(chat_id, time.monotonic())
+            if retry_after:
+                api.rate_limited[method] += 1
+                seconds = max(1, math.ceil(retry_after))
+                return _error(429, f"Too Many Requests: retry after {seconds}", {"retry_after": seconds})
+        if method == "deleteMessage":
+            return _ok(True)
+        api.delivered += 1
+        message_id = int(params["message_id"]) if method == "editMessageText" else None
+        return _ok(api.make_message(chat_id, params.get("text"), params.get("reply_markup"), message_id))
+    # answerCallbackQuery, deleteWebhook и все остальное
+    return _ok(True)
+
+
+async def handle_push_updates(request: web.Request) -> web.Response:
+    api: FakeBotApi = request.app["api"]
+    payload = await request.json()
+    updates = payload if isinstance(payload, list) else [payload]
+    for update in updates:
+        api.push_update(update)
+    return web.json_response({"queued": len(updates)})
+
+
+async def handle_stats(request: web.Request) -> web.Response:
+    return web.json_response(request.app["api"].stats())
+
+
+async def handle_reset(request: web.Request) -> web.Response:
+    request.app["api"].reset_stats()
+    return web.json_response({"ok": True})
+
+
+def create_app(api: FakeBotApi) -> web.Application:
+    app = web.Application()
+    app["api"] = api
+    app.router.add_post("/control/updates", handle_push_updates)
+    app.router.add_get("/control/stats", handle_stats)
+    app.router.add_post("/control/reset", handle_reset)
+    app.router.add_route("*", "/bot{token}/{method}", handle_method)
+    return app
+
+
+# --- Генерация нагрузки --- #
+
+def _scenario_payloads(name: str, count: int, group_id: int, link_id: int) -> List[Dict[str, Any]]:
+    from benchmarks import update_replay
+
+    builders = {
+        "group_flood": lambda: update_replay.group_flood_updates(count, group_id),
+        "get_link_storm": lambda: update_replay.get_link_updates(count, link_id, group_id, 777),
+        "addlink_burst": lambda: update_replay.addlink_updates(count),
+        "topmsg": lambda: update_replay.topmsg_updates(count),
+    }
+    return [
+        json.loads(update.model_dump_json(by_alias=True, exclude_none=True))
+        for update in builders[name]()
+    ]
+
+
+async def feed_updates(api: FakeBotApi, payloads: List[Dict[str, Any]], rate: float) -> None:
+    """Ставит обновления в очередь с заданной частотой (в секунду)."""
+    interval = 1 / rate if rate > 0 else 0
+    start = time.monotonic()
+    for i, payload in enumerate(payloads):
+        if interval:
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        api.push_update(payload)
+
+
+async def _serve(args) -> None:
+    api = FakeBotApi(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        global_rate=args.global_rate,
+        private_rate=args.private_rate,
+        group_rate=args.group_rate,
+        blocked_ratio=args.blocked_ratio,
+        blocked_users=[int(user_id) for user_id in args.blocked_users.split(",") if user_id],
+        seed=args.seed,
+    )
+    runner = web.AppRunner(create_app(api), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=args.host, port=args.port).start()
+    print(f"Fake Bot API listening on http://{args.host}:{args.port} (TELEGRAM_API_URL)", flush=True)
+    try:
+        if args.feed:
+            payloads = _scenario_payloads(args.feed, args.feed_count, args.group_id, args.link_id)
+            await feed_updates(api, payloads, args.feed_rate)
+            print(f"Queued {len(payloads)} '{args.feed}' updates", flush=True)
+        while True:
+            await asyncio.sleep(args.stats_interval)
+            print(json.dumps(api.stats(), ensure_ascii=False), flush=True)
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Медианная задержка ответа")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Разброс задержки (sigma логнормального)")
+    parser.add_argument("--global-rate", type=int, default=30, help="Отправок в секунду на бота (0 - без лимита)")
+    parser.add_argument("--private-rate", type=int, default=1, help="Отправок в секунду в один личный чат")
+    parser.add_argument("--group-rate", type=int, default=20, help="Отправок в минуту в одну группу")
+    parser.add_argument("--blocked-ratio", type=float, default=0.0, help="Доля пользователей, заблокировавших бота")
+    parser.add_argument("--blocked-users", default="", help="Явный список id через запятую")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--feed", choices=("group_flood", "get_link_storm", "addlink_burst", "topmsg"), default=None,
+                        help="Сразу поставить в очередь синтетические обновления (см. benchmarks.update_replay)")
+    parser.add_argument("--feed-rate", type=float, default=50.0, help="Обновлений в секунду")
+    parser.add_argument("--feed-count", type=int, default=1000)
+    parser.add_argument("--group-id", type=int, default=-1001000000001, help="MAIN_GROUP_ID бота (для group_flood)")
+    parser.add_argument("--link-id", type=int, default=1, help="Опубликованная ссылка (для get_link_storm)")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="Как часто печатать счетчики")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
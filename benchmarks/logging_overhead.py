@@ -0,0 +1,101 @@
+# benchmarks/logging_overhead.py
+"""Измеряет накладные расходы LoggingMiddleware на одно обновление.
+
+Запуск из корня проекта:
+    python -m benchmarks.logging_overhead [--updates 20000] [--profile prod]
+
+Сравнивает "голый" вызов обработчика с вызовом через LoggingMiddleware
+для выбранного профиля логирования. Вывод в stderr подавляется, чтобы
+измерять форматирование и фильтрацию, а не скорость терминала.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+# Обязательные настройки для запуска без .env; реальные значения из окружения не трогаем
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK-TOKEN")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("MAIN_GROUP_ID", "-1001000000001")
+
+from aiogram.types import Update, Chat, User
+
+
+def _make_update(update_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.datetime.now().timestamp()),
+            "chat": {"id": -1001, "type": "supergroup", "title": "bench"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Bench", "username": "bench"},
+            "text": "Сообщение для проверки накладных расходов логирования\nвторая строка",
+        },
+    })
+
+
+async def _run(updates: int, profile: str, level: Optional[str], sample_rates: dict) -> dict:
+    from src.logging_config import setup_logging
+    from src.middlewares.logging_middleware import LoggingMiddleware
+
+    setup_logging(profile=profile, level=level, sample_rates=sample_rates)
+    middleware = LoggingMiddleware()
+    events = [_make_update(i) for i in range(updates)]
+    data = {
+        "event_from_user": User(id=42, is_bot=False, first_name="Bench", username="bench"),
+        "event_chat": Chat(id=-1001, type="supergroup", title="bench"),
+    }
+
+    async def handler(event, data):
+        return None
+
+    start = time.perf_counter()
+    for event in events:
+        await handler(event, data)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for event in events:
+        await middleware(handler, event, data)
+    with_middleware = time.perf_counter() - start
+
+    return {
+        "profile": profile,
+        "level": level,
+        "sample_rates": sample_rates,
+        "updates": updates,
+        "baseline_us_per_update": baseline / updates * 1e6,
+        "middleware_us_per_update": with_middleware / updates * 1e6,
+        "overhead_us_per_update": (with_middleware - baseline) / updates * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--profile", choices=("dev", "prod"), default="prod")
+    parser.add_argument("--level", default=None, help="Уровень консоли (по умолчанию из профиля)")
+    parser.add_argument("--sample-rates", default="{}", help='JSON, например {"group_message": 0.01}')
+    args = parser.parse_args()
+
+    # Настройки и middleware импортируем до подавления вывода, чтобы их ошибки были видны
+    import src.logging_config  # noqa: F401
+    import src.middlewares.logging_middleware  # noqa: F401
+
+    # Подавляем консольный вывод: sink'и Loguru получают этот поток при настройке
+    devnull = open(os.devnull, "w")
+    sys.stderr = devnull
+    try:
+        result = asyncio.run(_run(args.updates, args.profile, args.level, json.loads(args.sample_rates)))
+    finally:
+        sys.stderr = sys.__stderr__
+        devnull.close()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
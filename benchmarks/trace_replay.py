@@ -0,0 +1,342 @@
+# benchmarks/trace_replay.py
+"""Воспроизводит записанные трассы обновлений через диспетчер бота.
+
+Запуск из корня проекта:
+    python -m benchmarks.trace_replay logs/updates.jsonl.gz [logs/updates.jsonl.gz.1 ...]
+        [--speed 1] [--limit 0] [--api-latency-ms 0] [--output replay.json]
+
+Трассы пишет UpdateRecorderMiddleware (UPDATE_RECORDER_ENABLED=true). В
+трассе нет текстов и настоящих id, поэтому обновления собираются заново:
+хэши пользователей и чатов превращаются в стабильные синтетические id
+(основная группа - в MAIN_GROUP_ID), текст заменяется заполнителем той же
+длины, команды и действия из callback data сохраняются. Хэши id ссылок в
+callback data (и старые трассы с настоящими id) указывают на ссылки,
+которые перед прогоном создаются опубликованными в базе прогона, так что
+"Получить ссылку" проходит тот же путь, что и в проде; кнопкам с токеном
+(lt) выдается токен, подписанный ключом прогона. Обновления подаются в том же
+темпе, что и в проде (--speed 1), ускоренно (--speed 10) или без пауз
+(--speed 0), и обрабатываются конкурентно, как при поллинге. Диспетчер,
+база и сессия Bot API - как в benchmarks.update_replay.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from benchmarks.update_replay import BOT_USER, ReplaySession, percentile # Там же выставляются настройки по умолчанию
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.types import Update
+
+FILLER = "восстановленный текст сообщения "
+MAX_SEEDED_LINKS = 1000 # Больше разных ссылок в трассе - id переиспользуются по кругу
+ANNOUNCEMENT_MESSAGE_ID = 777
+
+
+class TraceUpdateFactory:
+    """Собирает Update из анонимной записи трассы."""
+
+    def __init__(self, main_group_id: int):
+        self.main_group_id = main_group_id
+        self._users: Dict[str, int] = {}
+        self._groups: Dict[str, int] = {}
+        self._message_id = 0
+        self._chat_hashes: Set[str] = set()
+        self._link_ids: Dict[str, int] = {} # Хэш (или id из старой трассы) -> id ссылки в базе прогона
+        self._token: Optional[str] = None
+
+    def _user_id(self, user_hash: Optional[str]) -> int:
+        if user_hash is None:
+            user_hash = "anonymous"
+        if user_hash not in self._users:
+            self._users[user_hash] = 10_000_000 + len(self._users)
+        return self._users[user_hash]
+
+    def _chat(self, record: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+        chat_type = record.get("chat_type", "private")
+        if chat_type == "private":
+            # В личке id чата совпадает с id пользователя - хэши тоже совпадают
+            return {"id": user_id, "type": "private", "first_name": f"User{user_id}"}
+        if record.get("main_group"):
+            chat_id = self.main_group_id
+        else:
+            chat_id = self._group_id(record.get("chat", "unknown"))
+        return {"id": chat_id, "type": chat_type, "title": "Replay chat"}
+
+    def _group_id(self, chat_hash: str) -> int:
+        if chat_hash not in self._groups:
+            self._groups[chat_hash] = -1_009_000_000_000 - len(self._groups)
+        return self._groups[chat_hash]
+
+    def _link_key(self, part: str) -> Optional[str]:
+        """Ключ ссылки для части callback data: хэш id (не чата) или id из старой трассы."""
+        if part.startswith("#"):
+            return None if part[1:] in self._chat_hashes else part
+        if part.isdigit() and part not in ("0", "1"):
+            return part
+        return None
+
+    async def seed_links(self, records: List[Dict[str, Any]]) -> int:
+        """Создает опубликованные ссылки для id из callback data трассы. Возвращает их число."""
+        from src.db.models import Link
+        from src.services.link_service import add_links_bulk, mark_links_published
+        from src.services.link_tokens import issue_link_token
+
+        for record in records:
+            if record.get("chat"):
+                self._chat_hashes.add(record["chat"])
+                if record.get("main_group"):
+                    self._groups[record["chat"]] = self.main_group_id
+        keys: Dict[str, None] = {} # Упорядоченное множество
+        needs_token = False
+        for record in records:
+            prefix, *parts = (record.get("data") or "").split(":")
+            needs_token = needs_token or prefix == "lt"
+            for part in parts:
+                key = self._link_key(part)
+                if key is not None:
+                    keys[key] = None
+        count = min(len(keys), MAX_SEEDED_LINKS) + (1 if needs_token else 0)
+        if not count:
+            return 0
+        links = [
+            {"link_url": f"https://replay.example.com/link/{number}", "announcement_text": "Анонс",
+             "event_time_str": None, "event_time_utc": None}
+            for number in range(count)
+        ]
+        link_ids = await add_links_bulk(1, links)
+        await mark_links_published([(link_id, self.main_group_id, ANNOUNCEMENT_MESSAGE_ID) for link_id in link_ids])
+        for number, key in enumerate(keys):
+            self._link_ids[key] = link_ids[number % MAX_SEEDED_LINKS]
+        if needs_token:
+            self._token = issue_link_token(Link(id=link_ids[-1], link_url=links[-1]["link_url"], event_time_utc=None))
+        return count
+
+    def _callback_data(self, data: str) -> str:
+        prefix, *parts = data.split(":")
+        if prefix == "lt":
+            return f"lt:{self._token}" if self._token else data
+        rebuilt = [prefix]
+        for part in parts:
+            key = self._link_key(part)
+            if key is not None and key in self._link_ids:
+                rebuilt.append(str(self._link_ids[key]))
+            elif part.startswith("#"):
+                rebuilt.append(str(self._group_id(part[1:])))
+            else:
+                rebuilt.append(part)
+        return ":".join(rebuilt)
+
+    @staticmethod
+    def _text(record: Dict[str, Any], update_id: int) -> str:
+        size = record.get("size", 0)
+        prefix = ""
+        if record.get("cmd"):
+            prefix = record["cmd"]
+            if prefix == "/addlink":
+                prefix += f" https://replay.example.com/{update_id}"
+        elif record.get("url"):
+            prefix = f"https://replay.example.com/{update_id}"
+        if size <= len(prefix) + 1:
+            return prefix or "."
+        padding = size - len(prefix) - (1 if prefix else 0)
+        filler = (FILLER * (padding // len(FILLER) + 1))[:padding]
+        return f"{prefix} {filler}" if prefix else filler
+
+    def build(self, record: Dict[str, Any], update_id: int) -> Optional[Update]:
+        event_type = record.get("type")
+        user_id = self._user_id(record.get("user"))
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+        chat = self._chat(record, user_id)
+        now = int(time.time())
+        self._message_id += 1
+
+        if event_type in ("message", "edited_message"):
+            message: Dict[str, Any] = {
+                "message_id": self._message_id,
+                "date": now,
+                "chat": chat,
+                "from": user,
+                "text": self._text(record, update_id),
+            }
+            if event_type == "edited_message":
+                message["edit_date"] = now
+            if record.get("fwd"):
+                source = {"id": self.main_group_id, "type": "supergroup", "title": "Replay group"}
+                message["forward_origin"] = {"type": "chat", "date": now, "sender_chat": source}
+                message["forward_from_chat"] = source
+            return Update.model_validate({"update_id": update_id, event_type: message})
+
+        if event_type == "callback_query":
+            return Update.model_validate({
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "from": user,
+                    "chat_instance": "replay",
+                    "data": self._callback_data(record.get("data") or ""),
+                    "message": {
+                        "message_id": self._message_id,
+                        "date": now,
+                        "chat": chat,
+                        "from": BOT_USER.model_dump(),
+                        "text": "Анонс",
+                    },
+                },
+            })
+        # Остальные типы (chat_member и т.п.) бот не обрабатывает
+        return None
+
+
+def load_trace(paths: List[Path], limit: int = 0) -> List[Dict[str, Any]]:
+    from src.services.update_recorder import iter_trace_records
+
+    records = []
+    for path in paths:
+        records.extend(iter_trace_records(path))
+    records.sort(key=lambda record: record["t"])
+    return records[:limit] if limit else records
+
+
+async def replay(dp, bot: Bot, records: List[Dict[str, Any]], factory: TraceUpdateFactory,
+                 speed: float) -> Dict[str, Any]:
+    """Подает обновления в исходном темпе (деленном на speed) и меряет обработку."""
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    lags: List[float] = []
+    errors = 0
+    skipped = 0
+    tasks = []
+
+    async def process(update: Update, event_type: str):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            errors += 1
+        latencies[event_type].append(time.perf_counter() - start)
+
+    if not records:
+        return {"updates": 0}
+    first_t = records[0]["t"]
+    started = time.perf_counter()
+    for update_id, record in enumerate(records, 1):
+        update = factory.build(record, update_id)
+        if update is None:
+            skipped += 1
+            continue
+        if speed > 0:
+            due = started + (record["t"] - first_t) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Насколько позже положенного обновление попало в обработку
+            lags.append(max(0.0, time.perf_counter() - due))
+        tasks.append(asyncio.create_task(process(update, record["type"])))
+        if speed == 0 and len(tasks) % 100 == 0:
+            await asyncio.sleep(0) # Даем обработчикам поработать
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    def summary(values: List[float]) -> Dict[str, float]:
+        values = sorted(values)
+        return {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        }
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    recorded_span = records[-1]["t"] - first_t
+    return {
+        "updates": len(tasks),
+        "skipped": skipped,
+        "errors": errors,
+        "recorded_seconds": round(recorded_span, 3),
+        "replay_seconds": round(elapsed, 3),
+        "updates_per_second": round(len(tasks) / elapsed, 1) if elapsed else None,
+        "latency": summary(all_latencies),
+        "latency_by_type": {event_type: summary(values) for event_type, values in latencies.items()},
+        "schedule_lag": summary(lags) if lags else None,
+    }
+
+
+async def _run(args) -> Dict[str, Any]:
+    from main import create_dispatcher
+    from src.config.config import settings
+    from src.services.database import async_init_db, configure_database
+    from src.services.fsm_storage import DatabaseStorage
+    from src.services.link_tokens import configure_link_tokens
+    from src.services.request_log_writer import configure_request_log_writer
+
+    records = load_trace([Path(path) for path in args.traces], args.limit)
+    session = ReplaySession(latency=args.api_latency_ms / 1000)
+    bot = Bot(token=settings.bot_token.get_secret_value(), session=session,
+              default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    storage = DatabaseStorage(ttl=settings.fsm_ttl_seconds or None, cache_size=settings.fsm_cache_size,
+                              flush_interval=settings.fsm_flush_interval_ms / 1000)
+    dp = create_dispatcher(storage)
+    # Ключ прогона: токены из трассы не записаны, кнопкам lt выдаются новые
+    configure_link_tokens(
+        "callback", "", settings.bot_token.get_secret_value(),
+        grace=datetime.timedelta(minutes=settings.link_expiry_grace_minutes),
+        ttl=datetime.timedelta(days=settings.link_token_ttl_days),
+    )
+    writer = configure_request_log_writer(settings.request_log_flush_interval_seconds, settings.request_log_batch_size)
+
+    with tempfile.TemporaryDirectory(prefix="bot-replay-") as db_dir:
+        await configure_database(args.database_url or f"sqlite+aiosqlite:///{Path(db_dir) / 'replay.db'}")
+        await async_init_db()
+        factory = TraceUpdateFactory(settings.main_group_id)
+        seeded = await factory.seed_links(records)
+        writer.start(bot)
+        session.calls.clear()
+        result = await replay(dp, bot, records, factory, args.speed)
+        await writer.stop()
+        result["seeded_links"] = seeded
+        await storage.close()
+        from src.services.database import engine
+        await engine.dispose()
+
+    result["speed"] = args.speed
+    result["api_calls"] = dict(session.calls)
+    result["timestamp"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("traces", nargs="+", help="Файлы трасс (gzip или JSONL)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Ускорение: 1 - как в проде, 0 - без пауз")
+    parser.add_argument("--limit", type=int, default=0, help="Воспроизвести только первые N записей")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Искусственная задержка вызова Bot API")
+    parser.add_argument("--database-url", default=None, help="База для прогона (по умолчанию временная SQLite)")
+    parser.add_argument("--log-level", default="CRITICAL", help="Уровень логов во время прогона")
+    parser.add_argument("--output", default=None, help="Сохранить результат в JSON-файл")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    logging.basicConfig(level=args.log_level, force=True)
+
+    result = asyncio.run(_run(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
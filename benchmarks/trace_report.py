@@ -0,0 +1,79 @@
+# benchmarks/trace_report.py
+"""Разбивка времени обработки обновлений по span'ам из файла трассировки.
+
+Запуск из корня проекта:
+    python -m benchmarks.trace_report logs/traces.jsonl [--top 20]
+
+Для каждого обновления (корневой span "update") показывает общее время
+и сколько из него ушло на транзакции БД, SQL-запросы, вызовы Bot API
+и отправку ссылки; в конце - перцентили по обработчикам.
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List
+
+# Категории, на которые раскладывается время обновления
+CATEGORIES = ("db.session", "db.statement", "telegram.api", "send_link_to_user")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_traces(path: str) -> Dict[str, List[dict]]:
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Файл, записанный FileSpanExporter (TRACING_FILE)")
+    parser.add_argument("--top", type=int, default=20, help="Сколько самых медленных обновлений показать")
+    args = parser.parse_args()
+
+    rows = []
+    by_handler: Dict[str, List[float]] = defaultdict(list)
+    for trace_id, spans in load_traces(args.path).items():
+        root = next((s for s in spans if s["parent_id"] is None and s["name"] == "update"), None)
+        if root is None:
+            continue
+        totals = {category: 0.0 for category in CATEGORIES}
+        counts = {category: 0 for category in CATEGORIES}
+        handler = "-"
+        for span in spans:
+            if span["name"] in totals:
+                totals[span["name"]] += span["duration_ms"]
+                counts[span["name"]] += 1
+            elif span["name"] == "handler":
+                handler = span["attributes"].get("handler", "-")
+        by_handler[handler].append(root["duration_ms"])
+        rows.append((root, handler, totals, counts))
+
+    rows.sort(key=lambda row: row[0]["duration_ms"], reverse=True)
+    header = f"{'update_id':>10} {'event':<15} {'handler':<32} {'total':>9} " + " ".join(f"{c:>18}" for c in CATEGORIES)
+    print(header)
+    for root, handler, totals, counts in rows[:args.top]:
+        cells = " ".join(f"{totals[c]:>10.2f}ms ({counts[c]:>3})" for c in CATEGORIES)
+        print(f"{root['attributes'].get('update_id', '-'):>10} {root['attributes'].get('event_type', '-'):<15} "
+              f"{handler:<32} {root['duration_ms']:>7.2f}ms {cells}")
+
+    print()
+    print(f"{'handler':<32} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for handler, durations in sorted(by_handler.items(), key=lambda item: -len(item[1])):
+        print(f"{handler:<32} {len(durations):>7} {_percentile(durations, 0.5):>7.2f}ms "
+              f"{_percentile(durations, 0.95):>7.2f}ms {_percentile(durations, 0.99):>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
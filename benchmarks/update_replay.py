@@ -0,0 +1,368 @@
+# benchmarks/update_replay.py
+"""Прогоняет синтетические обновления через настоящий Dispatcher и меряет пропускную способность.
+
+Запуск из корня проекта:
+    python -m benchmarks.update_replay [--scenario all] [--updates 2000] [--concurrency 8]
+        [--api-latency-ms 0] [--output results.json] [--compare baseline.json]
+
+Диспетчер собирается так же, как в main.py (create_dispatcher: все middleware
+и роутеры), но работает с временной SQLite-базой и фиктивной сессией Bot API,
+которая ничего не отправляет в сеть. Для каждого сценария выводятся
+обновления в секунду и p50/p95/p99 задержки обработки одного обновления.
+Результат - JSON, его можно сохранить и сравнить с прогоном на другом коммите.
+
+Сценарии:
+    group_flood    - поток текстовых сообщений в основной группе;
+    get_link_storm - массовые нажатия кнопки "Получить ссылку" под анонсом;
+    addlink_burst  - серия команд /addlink в личке;
+    topmsg         - команда /topmsg на заполненной статистике;
+    recorded       - обновления из файла --updates-file (JSON Update на строку).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Обязательные настройки для запуска без .env; реальные значения из окружения не трогаем
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK-TOKEN")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("MAIN_GROUP_ID", "-1001000000001")
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.types import Chat, Message, Update, User
+
+BOT_USER = User(id=123456, is_bot=True, first_name="Bench", username="bench_bot")
+SCENARIOS = ("group_flood", "get_link_storm", "addlink_burst", "topmsg")
+PRIVATE_USERS = 500 # Сколько разных пользователей пишут боту
+
+
+class ReplaySession(BaseSession):
+    """Сессия Bot API без сети: отвечает правдоподобными объектами и считает вызовы."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_id = 0
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None) -> Any:
+        name = method.__api_method__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if name == "getMe":
+            return BOT_USER
+        if name in ("sendMessage", "editMessageText", "sendPhoto", "copyMessage"):
+            self._message_id += 1
+            chat_id = getattr(method, "chat_id", None)
+            return Message(
+                message_id=self._message_id,
+                date=datetime.datetime.now(datetime.timezone.utc),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 1, type="private"),
+                from_user=BOT_USER,
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+# --- Генераторы обновлений --- #
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+
+def _message_update(update_id: int, chat: Dict[str, Any], user_id: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": chat,
+            "from": _user(user_id),
+            "text": text,
+        },
+    })
+
+
+def _private_chat(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "type": "private", "first_name": f"User{user_id}"}
+
+
+def group_flood_updates(count: int, group_id: int) -> List[Update]:
+    chat = {"id": group_id, "type": "supergroup", "title": "Bench group"}
+    return [
+        _message_update(i, chat, 1000 + i % 200, f"Сообщение номер {i} в общем чате, обсуждаем собеседования")
+        for i in range(1, count + 1)
+    ]
+
+
+def get_link_updates(count: int, link_id: int, group_id: int, announcement_message_id: int) -> List[Update]:
+    from src.utils.callback_data import LinkCallbackFactory
+
+    data = LinkCallbackFactory(action="get", link_id=link_id).pack()
+    announcement = {
+        "message_id": announcement_message_id,
+        "date": int(time.time()),
+        "chat": {"id": group_id, "type": "supergroup", "title": "Bench group"},
+        "from": BOT_USER.model_dump(),
+        "text": "Анонс",
+    }
+    return [
+        Update.model_validate({
+            "update_id": i,
+            "callback_query": {
+                "id": str(i),
+                "from": _user(1000 + i % PRIVATE_USERS),
+                "chat_instance": "bench",
+                "message": announcement,
+                "data": data,
+            },
+        })
+        for i in range(1, count + 1)
+    ]
+
+
+def addlink_updates(count: int) -> List[Update]:
+    updates = []
+    for i in range(1, count + 1):
+        user_id = 1000 + i % PRIVATE_USERS
+        text = f"/addlink https://meet.example.com/room-{i} Собеседование номер {i}"
+        updates.append(_message_update(i, _private_chat(user_id), user_id, text))
+    return updates
+
+
+def topmsg_updates(count: int) -> List[Update]:
+    return [
+        _message_update(i, _private_chat(1000 + i % PRIVATE_USERS), 1000 + i % PRIVATE_USERS, "/topmsg")
+        for i in range(1, count + 1)
+    ]
+
+
+def recorded_updates(path: Path, count: int) -> List[Update]:
+    updates = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                updates.append(Update.model_validate_json(line))
+            if len(updates) >= count:
+                break
+    return updates
+
+
+# --- Подготовка данных для сценариев --- #
+
+async def _seed_published_link(group_id: int) -> int:
+    from src.services.link_service import add_link, publish_link
+
+    link = await add_link(
+        user_id=1, username="admin", first_name="Admin", last_name=None,
+        link_url="https://meet.example.com/bench", announcement_text="Бенчмарк",
+    )
+    await publish_link(link.id, group_id, 777)
+    return link.id
+
+
+async def _seed_message_stats(group_id: int, users: int = 300, messages_per_user: int = 5) -> None:
+    from src.services.stats_service import log_group_message
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    message_id = 0
+    for user_id in range(1000, 1000 + users):
+        for _ in range(messages_per_user):
+            message_id += 1
+            await log_group_message(message_id, group_id, user_id, f"user{user_id}", "seed", now)
+
+
+# --- Прогон --- #
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга (значения уже отсортированы)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def _replay(dp, bot: Bot, updates: List[Update], concurrency: int) -> Dict[str, Any]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                update = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "updates": len(updates),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "updates_per_second": round(len(updates) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+async def run_scenario(name: str, dp, bot: Bot, session: ReplaySession, db_dir: Path, args) -> Dict[str, Any]:
+    from src.config.config import settings
+    from src.services.database import async_init_db, configure_database
+
+    # У каждого сценария своя чистая база
+    await configure_database(f"sqlite+aiosqlite:///{db_dir / (name + '.db')}")
+    await async_init_db()
+
+    group_id = settings.main_group_id
+    builders: Dict[str, Callable[[int], List[Update]]] = {
+        "group_flood": lambda n: group_flood_updates(n, group_id),
+        "addlink_burst": addlink_updates,
+        "topmsg": topmsg_updates,
+        "recorded": lambda n: recorded_updates(Path(args.updates_file), n),
+    }
+    if name == "get_link_storm":
+        link_id = await _seed_published_link(group_id)
+        builders[name] = lambda n: get_link_updates(n, link_id, group_id, 777)
+    elif name == "topmsg":
+        await _seed_message_stats(group_id)
+
+    build = builders[name]
+    if args.warmup:
+        await _replay(dp, bot, build(args.warmup), args.concurrency)
+    session.calls.clear()
+    result = await _replay(dp, bot, build(args.updates), args.concurrency)
+    result["api_calls"] = dict(session.calls)
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _run(args) -> Dict[str, Any]:
+    from main import create_dispatcher
+    from src.config.config import settings
+    from src.services.fsm_storage import DatabaseStorage
+
+    session = ReplaySession(latency=args.api_latency_ms / 1000)
+    bot = Bot(token=settings.bot_token.get_secret_value(), session=session,
+              default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    storage = DatabaseStorage(ttl=settings.fsm_ttl_seconds or None, cache_size=settings.fsm_cache_size,
+                              flush_interval=settings.fsm_flush_interval_ms / 1000)
+    dp = create_dispatcher(storage)
+
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="bot-bench-") as db_dir:
+        for name in scenarios:
+            results[name] = await run_scenario(name, dp, bot, session, Path(db_dir), args)
+        await storage.close()
+        from src.services.database import engine
+        await engine.dispose()
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "params": {
+            "updates": args.updates,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "api_latency_ms": args.api_latency_ms,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Относительное изменение пропускной способности и p95 против сохраненного прогона (в %)."""
+    diff = {}
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or not base.get("updates_per_second") or not base["latency_ms"]["p95"]:
+            continue
+        diff[name] = {
+            "updates_per_second_change_pct": round(
+                (result["updates_per_second"] / base["updates_per_second"] - 1) * 100, 1
+            ),
+            "p95_change_pct": round((result["latency_ms"]["p95"] / base["latency_ms"]["p95"] - 1) * 100, 1),
+        }
+    return {"baseline_commit": baseline.get("commit"), "scenarios": diff}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ("recorded", "all"), default="all")
+    parser.add_argument("--updates", type=int, default=2000, help="Обновлений на сценарий")
+    parser.add_argument("--warmup", type=int, default=50, help="Обновлений на прогрев (не учитываются)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Сколько обновлений обрабатывается одновременно")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Искусственная задержка вызова Bot API")
+    parser.add_argument("--updates-file", default=None, help="JSONL с обновлениями для сценария recorded")
+    parser.add_argument("--log-level", default="CRITICAL", help="Уровень логов во время прогона")
+    parser.add_argument("--output", default=None, help="Сохранить результат в JSON-файл")
+    parser.add_argument("--compare", default=None, help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+    if args.scenario == "recorded" and not args.updates_file:
+        parser.error("--scenario recorded requires --updates-file")
+
+    # Логи почти полностью выключены: меряем обработку, а не скорость терминала
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    logging.basicConfig(level=args.log_level, force=True)
+
+    result = asyncio.run(_run(args))
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            result["comparison"] = compare(result, json.load(f))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,96 +1,277 @@
 # main.py (New version)
+import argparse
 import asyncio
+import datetime
 from contextlib import suppress
 
-from aiogram import Bot, Dispatcher
-from aiogram.enums import ParseMode
-from aiogram.client.default import DefaultBotProperties # Для указания ParseMode по умолчанию
+from src.utils.startup_profiler import StartupProfiler
 
-# Импортируем настройки, обработчики и базу данных
-from src.config import load_config # Убрали импорт settings, импортируем load_config
-from src.handlers import common as common_handlers
-from src.handlers import links as link_handlers
-from src.handlers import stats as stats_handlers
-from src.handlers import callbacks, forwarded, group_messages, link_callbacks # Импортируем все роутеры
-from src.services.database import async_init_db
-from src.bot import bot # Используем наш экземпляр бота
-from src import scheduler # Импортируем наш планировщик
+# Профайлер создаем до остальных импортов, чтобы в разбивку попало и их время
+profiler = StartupProfiler()
 
-# --- Импорт Middleware --- 
-from src.middlewares.logging_middleware import LoggingMiddleware
+# --- Легкие импорты: настройки и логирование ---
+# Тяжелые модули (aiogram.types, обработчики, модели, планировщик) импортируются
+# в main() уже после настройки логов, каждый ровно один раз
+with profiler.phase("import_config"):
+    from loguru import logger
+    from src.config import settings
+    from src.logging_config import setup_logging # Импортируем нашу функцию настройки
 
-# --- Импорт Loguru --- 
-from loguru import logger
-from src.logging_config import setup_logging # Импортируем нашу функцию настройки
+# Типы событий, для которых вешаем inner middleware (метрики и трассировка обработчиков)
+HANDLER_EVENT_TYPES = ("message", "edited_message", "callback_query")
+
+
+# --- Сборка диспетчера ---
+def create_dispatcher(storage=None):
+    """Создает диспетчер с middleware и всеми роутерами бота.
+
+    Без обработчиков жизненного цикла - их добавляет main(); бенчмарки
+    используют эту функцию, чтобы гонять обновления через тот же конвейер.
+    """
+    from aiogram import Dispatcher
+    from src.middlewares.logging_middleware import LoggingMiddleware
+    from src.middlewares.metrics_middleware import HandlerMetricsMiddleware
+    from src.services import tracing, update_recorder
+
+    dp = Dispatcher(storage=storage)
+    # --- Регистрация Middleware ---
+    # Важно регистрировать middleware ДО роутеров
+    if tracing.is_enabled():
+        from src.middlewares.tracing_middleware import TracingMiddleware, HandlerTracingMiddleware
+        # Корневой span должен охватывать все остальные middleware
+        dp.update.outer_middleware(TracingMiddleware())
+        for event_type in HANDLER_EVENT_TYPES:
+            dp.observers[event_type].middleware(HandlerTracingMiddleware())
+    if update_recorder.update_recorder is not None:
+        from src.middlewares.recorder_middleware import UpdateRecorderMiddleware
+        dp.update.outer_middleware(UpdateRecorderMiddleware())
+    dp.update.outer_middleware(LoggingMiddleware())
+    # Метрики по обработчикам (inner middleware видит выбранный handler)
+    for event_type in HANDLER_EVENT_TYPES:
+        dp.observers[event_type].middleware(HandlerMetricsMiddleware(event_type))
+
+    # Регистрируем роутеры (порядок важен: group_messages ловит все сообщения группы)
+    # link_tokens - до common: /start <токен> из deep link не должен попасть в общий /start
+    from src.handlers import common, links, stats, activity, request_logs, link_admin, link_import, search, callbacks, link_callbacks, link_tokens, forwarded, group_messages
+    for module in (link_tokens, common, links, stats, activity, request_logs, link_admin, link_import, search, callbacks, link_callbacks, forwarded, group_messages):
+        dp.include_router(module.router)
+    return dp
+
+
+def instrument_bot(bot) -> None:
+    """Вешает middleware на исходящие вызовы Bot API."""
+    from src.middlewares.metrics_middleware import ApiMetricsMiddleware
+    from src.services import tracing
+
+    if tracing.is_enabled():
+        from src.middlewares.tracing_middleware import TracingRequestMiddleware
+        bot.session.middleware(TracingRequestMiddleware())
+    # Метрики исходящих вызовов Bot API
+    bot.session.middleware(ApiMetricsMiddleware())
 
-# --- Инициализация диспетчера ---
-# Убрали создание Bot здесь, используем импортированный
-dp = Dispatcher()
 
 # --- Функции жизненного цикла ---
-async def on_startup(dispatcher: Dispatcher, bot: Bot):
-    """Выполняется при запуске бота.""" 
+async def on_startup(dispatcher, bot):
+    """Выполняется при запуске бота.
+
+    Независимые шаги идут параллельно: фразы читаются в отдельном потоке,
+    вебхук удаляется, пока создаются таблицы, а напоминания и чаты для
+    анонсов загружаются из БД одновременно.
+    """
+    from src import scheduler # Импортируем наш планировщик
+    from src.services import link_tokens, request_log_writer, tracing, update_recorder
+    from src.services.chat_registry import chat_registry
+    from src.services.database import async_init_db
+    from src.services.link_url_cache import link_url_cache
+    from src.utils.misc import warm_up_phrases
+
     logger.info("Starting up...")
-    # Импортируем модели ДО инициализации БД, чтобы Base.metadata был полным
-    from src.db import models # Явный импорт для регистрации моделей
-    logger.info("DB models imported.")
-    # Инициализируем базу данных
-    await async_init_db()
-    # Загрузка и планирование ожидающих напоминаний
-    await scheduler.load_scheduled_jobs()
+    # Мониторинг event loop запускаем первым, чтобы он видел и блокировки при старте
+    if settings.loop_monitor_enabled:
+        from src.services.loop_monitor import start_loop_monitor
+        start_loop_monitor(
+            interval=settings.loop_monitor_interval_ms / 1000,
+            threshold=settings.loop_lag_threshold_ms / 1000,
+        )
+    # Чтение файла фраз не зависит от БД - запускаем сразу в отдельном потоке
+    phrases_task = asyncio.create_task(profiler.run("warm_up_phrases", asyncio.to_thread(warm_up_phrases)))
+
+    async def init_db():
+        # Импортируем модели ДО инициализации БД, чтобы Base.metadata был полным
+        from src.db import models # Явный импорт для регистрации моделей
+        await async_init_db()
+
+    # Удаляем вебхук и пропускаем старые обновления (сетевой вызов, пока создаются таблицы)
+    await asyncio.gather(
+        profiler.run("init_db", init_db()),
+        profiler.run("delete_webhook", bot.delete_webhook(drop_pending_updates=True)),
+    )
+    # Напоминания, чаты для анонсов (target_chats дополняют .env) и карта URL для токенов читаются независимо
+    startup_loads = [
+        profiler.run("load_reminders", scheduler.load_scheduled_jobs()),
+        profiler.run("load_target_chats", chat_registry.refresh_from_db()),
+        phrases_task,
+    ]
+    if settings.link_token_mode != "off":
+        startup_loads.append(profiler.run("warm_link_urls", link_url_cache.warm()))
+    await asyncio.gather(*startup_loads)
+    # Для кнопок-ссылок t.me/<бот>?start=<токен> нужно имя бота
+    if settings.link_token_mode == "deeplink":
+        link_tokens.link_token_signer.bot_username = (await bot.me()).username
     logger.info("Pending reminders scheduled.")
+    scheduler.scheduler.add_job(
+        chat_registry.refresh_from_db, 'interval', seconds=60,
+        id="refresh_target_chats", replace_existing=True
+    )
+    # Перенос старых сообщений группы в архив (раз в сутки, ночью)
+    if settings.retention_enabled:
+        from src.services.retention_service import run_retention
+        scheduler.scheduler.add_job(
+            run_retention, 'cron', hour=settings.retention_hour,
+            id="group_messages_retention", replace_existing=True, coalesce=True, max_instances=1
+        )
+    # Выключение ссылок, события которых прошли (первый проход - сразу при старте)
+    if settings.link_expiry_enabled:
+        from src.services.link_expiry_service import run_link_expiry
+        scheduler.scheduler.add_job(
+            run_link_expiry, 'interval', minutes=settings.link_expiry_interval_minutes,
+            next_run_time=datetime.datetime.now(scheduler.MOSCOW_TZ),
+            id="link_expiry", replace_existing=True, coalesce=True, max_instances=1
+        )
+    # Индекс /search пуст, а сообщения есть (первый запуск или смена токенизатора) - строим его разово в фоне
+    if settings.search_enabled:
+        from src.services.search_service import reindex_search, search_index_is_empty
+        if await search_index_is_empty():
+            scheduler.scheduler.add_job(reindex_search, id="search_reindex", replace_existing=True)
     # Запускаем планировщик
     scheduler.start_scheduler()
     logger.info("Scheduler started.")
+    # Поднимаем эндпоинт /metrics, если он включен в настройках
+    if settings.metrics_enabled:
+        from src.services.metrics import start_metrics_server
+        with profiler.phase("metrics_server"):
+            await start_metrics_server(settings.metrics_host, settings.metrics_port)
+    # Фоновая выгрузка span'ов (если трассировка включена)
+    tracing.start_tracing()
+    if update_recorder.update_recorder is not None:
+        update_recorder.update_recorder.start()
+    if request_log_writer.request_log_writer is not None:
+        request_log_writer.request_log_writer.start(bot)
+
+    if profiler.enabled:
+        print(f"Startup profile (before polling):\n{profiler.report()}", flush=True)
 
-async def on_shutdown(dispatcher: Dispatcher, bot: Bot):
+async def on_shutdown(dispatcher, bot):
     """Выполняется при остановке бота."""
-    logger.info("Shutting down...") 
+    from src import scheduler
+    from src.services import announcement_counter, request_log_writer, tracing, sql_profiler, update_recorder
+    from src.services.activity_service import shutdown_activity_executor
+    from src.services.loop_monitor import stop_loop_monitor
+    from src.services.metrics import stop_metrics_server
+
+    logger.info("Shutting down...")
     # Останавливаем планировщик
     scheduler.stop_scheduler()
     logger.info("Scheduler stopped.")
+    await stop_metrics_server()
+    await stop_loop_monitor()
+    await tracing.stop_tracing()
+    if update_recorder.update_recorder is not None:
+        await update_recorder.update_recorder.stop()
+    # Дописываем отложенные запросы ссылок до остановки счетчика на анонсах
+    if request_log_writer.request_log_writer is not None:
+        await request_log_writer.request_log_writer.stop()
+    if announcement_counter.announcement_counter is not None:
+        await announcement_counter.announcement_counter.stop()
+    shutdown_activity_executor()
+    # Сводка по самым тяжелым SQL-запросам за время работы
+    for statement, stats in sql_profiler.top_statements(limit=5):
+        logger.info(
+            "SQL top: {} calls, {:.1f} ms total, {:.1f} ms max: {}",
+            stats.count, stats.total_time * 1000, stats.max_time * 1000, statement[:200]
+        )
     # Закрываем сессию бота (если нужно)
     # await bot.session.close() # aiogram >= 3.x handles this automatically? Check docs.
     logger.info("Shutdown complete.")
 
 
+def _print_first_update(elapsed: float) -> None:
+    print(f"Time to first update: {elapsed * 1000:.1f} ms", flush=True)
+
+
 # --- Основная функция ---
 async def main():
-    # --- Настройка Loguru --- 
+    # --- Настройка Loguru ---
     # Вызываем настройку в самом начале, чтобы все логи были перехвачены
-    setup_logging()
-    
-    logger.info("Configuring bot...")
+    with profiler.phase("setup_logging"):
+        setup_logging(
+            profile=settings.log_profile,
+            level=settings.log_level,
+            sample_rates=settings.log_sample_rates,
+        )
 
-    # --- Регистрация Middleware --- 
-    # Важно регистрировать middleware ДО роутеров
-    dp.update.outer_middleware(LoggingMiddleware())
-    logger.info("Logging middleware registered.")
-    
-    # Регистрируем роутеры
-    dp.include_router(common_handlers.router)
-    dp.include_router(link_handlers.router)
-    dp.include_router(stats_handlers.router)
-    dp.include_router(callbacks.router)
-    dp.include_router(link_callbacks.router)
-    dp.include_router(forwarded.router)
-    dp.include_router(group_messages.router)
+    logger.info("Configuring bot...")
+    with profiler.phase("import_aiogram"):
+        import aiogram.types # Самый тяжелый импорт: модели всех типов Bot API
+    with profiler.phase("configure_services"):
+        from src.services import tracing, sql_profiler
+        sql_profiler.configure_sql_profiler(settings.sql_profiler_enabled, settings.sql_slow_query_ms)
+        if settings.tracing_enabled:
+            tracing.configure_tracing(True, tracing.build_exporter(
+                settings.tracing_exporter, settings.tracing_file, settings.tracing_otlp_endpoint
+            ))
+        if settings.update_recorder_enabled:
+            from src.services.update_recorder import configure_update_recorder
+            configure_update_recorder(
+                settings.update_recorder_path, settings.update_recorder_max_mb, settings.update_recorder_backups,
+                settings.update_recorder_salt.get_secret_value(), main_group_id=settings.main_group_id,
+            )
+        if settings.live_request_counter_enabled:
+            from src.services.announcement_counter import configure_announcement_counter
+            configure_announcement_counter(settings.live_request_counter_interval_seconds)
+        # Проверка токенов ссылок работает всегда, чтобы кнопки уже опубликованных анонсов
+        # не сломались после LINK_TOKEN_MODE=off; режим влияет только на выпуск новых
+        from src.services.link_tokens import configure_link_tokens
+        from src.services.link_url_cache import link_url_cache
+        from src.services.request_log_writer import configure_request_log_writer
+        configure_link_tokens(
+            settings.link_token_mode, settings.link_token_secret.get_secret_value(),
+            settings.bot_token.get_secret_value(),
+            grace=datetime.timedelta(minutes=settings.link_expiry_grace_minutes),
+            ttl=datetime.timedelta(days=settings.link_token_ttl_days),
+        )
+        link_url_cache.max_size = settings.link_url_cache_size
+        configure_request_log_writer(settings.request_log_flush_interval_seconds, settings.request_log_batch_size)
+    with profiler.phase("create_bot"):
+        from src.bot import bot, storage # Используем наш экземпляр бота и FSM-хранилище
+        instrument_bot(bot)
+    with profiler.phase("import_handlers"):
+        dp = create_dispatcher(storage)
+    logger.info("Middlewares and routers registered.")
+    if profiler.enabled:
+        # Внешний middleware отмечает время до первого обработанного обновления
+        dp.update.outer_middleware(profiler.first_update_middleware(_print_first_update))
 
     # Регистрируем обработчики жизненного цикла
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
 
     logger.info("Starting polling...")
-    
-    # Удаляем вебхук и пропускаем старые обновления
-    await bot.delete_webhook(drop_pending_updates=True)
-    # Запускаем поллинг
+    # Запускаем поллинг (вебхук удаляется в on_startup)
     await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Links bot")
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="вывести разбивку времени запуска по фазам и время до первого обновления",
+    )
+    args = parser.parse_args()
+    profiler.enabled = args.profile_startup
+
     logger.info("Starting bot...") # Лог перед запуском
     # Запускаем основной цикл событий asyncio
     with suppress(KeyboardInterrupt, SystemExit): # Обработка Ctrl+C и sys.exit
         asyncio.run(main())
-    logger.info("Bot stopped.") # Лог после остановки
\ No newline at end of file
+    logger.info("Bot stopped.") # Лог после остановки
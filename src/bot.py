@@ -1,22 +1,34 @@
 import logging
-from aiogram import Bot, Dispatcher
+from aiogram import Bot
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from src.config.config import settings
+from src.services.fsm_storage import DatabaseStorage
 
-# Инициализация хранилища FSM (в памяти)
-storage = MemoryStorage()
+# Инициализация хранилища FSM (в БД проекта, с LRU-кэшем и пакетной записью)
+# Состояния переживают перезапуск, а память ограничена размером кэша
+storage = DatabaseStorage(
+    ttl=settings.fsm_ttl_seconds or None,
+    cache_size=settings.fsm_cache_size,
+    flush_interval=settings.fsm_flush_interval_ms / 1000,
+)
+
+# Свой адрес Bot API (локальный сервер или фейковый сервер для нагрузочных тестов)
+session = None
+if settings.telegram_api_url:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+    logging.info(f"Using Bot API server at {settings.telegram_api_url}")
 
 # Инициализация бота с токеном из настроек
 # Указываем parse_mode по умолчанию для удобства
 bot = Bot(
     token=settings.bot_token.get_secret_value(), # Доступ напрямую, но нужен get_secret_value()
+    session=session,
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
 
-# Инициализация диспетчера
-dp = Dispatcher(storage=storage)
-
-logging.info("Bot and Dispatcher initialized successfully.")
\ No newline at end of file
+# Диспетчер создается в main.py (create_dispatcher) с этим же хранилищем
+logging.info("Bot initialized successfully.")
\ No newline at end of file
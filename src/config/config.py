@@ -1,10 +1,33 @@
 import logging
 import os
-# import json # Не используется
-from typing import Optional, Dict
+import json
+from typing import Any, Optional, Dict, List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import SecretStr, Field, ValidationError # Убрали BaseModel
+from pydantic import SecretStr, Field, ValidationError, field_validator # Убрали BaseModel
+
+
+def parse_target_chats(raw: Any) -> Dict[str, int]:
+    """Разбирает список чатов для анонсов в словарь {имя: id}.
+
+    Принимает JSON-строку или уже разобранный объект в одном из форматов:
+    {"Имя": -100...} или [{"id": -100..., "name": "Имя"}, ...].
+    """
+    if raw is None or raw == "":
+        return {}
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if isinstance(raw, dict):
+        return {str(name): int(chat_id) for name, chat_id in raw.items()}
+    if isinstance(raw, list):
+        return {str(item["name"]): int(item["id"]) for item in raw}
+    raise ValueError(f"Unsupported target chats format: {type(raw).__name__}")
+
+
+MESSAGE_CAPTURE_MODES = ("counters", "metadata", "hashed", "full")
+SEARCH_TOKENIZERS = ("unicode61", "trigram")
+LINK_EXPIRY_ANNOUNCEMENT_ACTIONS = ("none", "edit", "delete")
+LINK_TOKEN_MODES = ("off", "callback", "deeplink")
 
 
 class Settings(BaseSettings):
@@ -14,11 +37,146 @@ class Settings(BaseSettings):
     main_group_id: int = Field(..., alias='MAIN_GROUP_ID') # Оставляем для напоминаний и возможного дефолтного постинга
     main_topic_id: Optional[int] = Field(None, alias='MAIN_TOPIC_ID') # ID темы в main_group_id
 
+    # Адрес Bot API (по умолчанию api.telegram.org); для нагрузочных прогонов - локальный фейковый сервер
+    telegram_api_url: Optional[str] = Field(None, alias='TELEGRAM_API_URL')
+
     # Use Dict[str, int] directly, Pydantic handles JSON parsing
     announcement_target_chats: Dict[str, int] = Field(
         default_factory=dict, alias='ANNOUNCEMENT_TARGET_CHATS_JSON'
     )
 
+    # Метрики в формате Prometheus (эндпоинт /metrics на локальном aiohttp-сервере)
+    metrics_enabled: bool = Field(False, alias='METRICS_ENABLED')
+    metrics_host: str = Field('127.0.0.1', alias='METRICS_HOST')
+    metrics_port: int = Field(9100, alias='METRICS_PORT')
+
+    # Логирование: профиль dev (цветная консоль, DEBUG) или prod (JSON-файл, без diagnose)
+    log_profile: str = Field('dev', alias='LOG_PROFILE')
+    log_level: Optional[str] = Field(None, alias='LOG_LEVEL')
+    # Доли сэмплирования шумных DEBUG/INFO-строк по типу события, например {"group_message": 0.01}
+    log_sample_rates: Dict[str, float] = Field(
+        default_factory=dict, alias='LOG_SAMPLE_RATES_JSON'
+    )
+
+    # Трассировка: span на обновление, транзакцию БД, SQL-запрос и вызов Bot API
+    tracing_enabled: bool = Field(False, alias='TRACING_ENABLED')
+    tracing_exporter: str = Field('file', alias='TRACING_EXPORTER') # file | otlp
+    tracing_file: str = Field('logs/traces.jsonl', alias='TRACING_FILE')
+    tracing_otlp_endpoint: Optional[str] = Field(None, alias='TRACING_OTLP_ENDPOINT') # например http://127.0.0.1:4318/v1/traces
+
+    # Профилирование SQL: время каждого запроса, лог медленных запросов, запросы на обновление
+    sql_profiler_enabled: bool = Field(True, alias='SQL_PROFILER_ENABLED')
+    sql_slow_query_ms: float = Field(100.0, alias='SQL_SLOW_QUERY_MS')
+
+    # Мониторинг задержки event loop и поиск блокирующих вызовов
+    loop_monitor_enabled: bool = Field(True, alias='LOOP_MONITOR_ENABLED')
+    loop_monitor_interval_ms: float = Field(500.0, alias='LOOP_MONITOR_INTERVAL_MS')
+    loop_lag_threshold_ms: float = Field(100.0, alias='LOOP_LAG_THRESHOLD_MS')
+
+    # FSM-хранилище в БД: TTL ключа (0 - бессрочно), размер LRU-кэша, период пакетной записи
+    fsm_ttl_seconds: int = Field(7 * 24 * 3600, alias='FSM_TTL_SECONDS')
+    fsm_cache_size: int = Field(10000, alias='FSM_CACHE_SIZE')
+    fsm_flush_interval_ms: int = Field(1000, alias='FSM_FLUSH_INTERVAL_MS')
+
+    # Запись анонимных трасс обновлений (для воспроизведения через benchmarks.trace_replay)
+    update_recorder_enabled: bool = Field(False, alias='UPDATE_RECORDER_ENABLED')
+    update_recorder_path: str = Field('logs/updates.jsonl.gz', alias='UPDATE_RECORDER_PATH')
+    update_recorder_max_mb: float = Field(50.0, alias='UPDATE_RECORDER_MAX_MB')
+    update_recorder_backups: int = Field(5, alias='UPDATE_RECORDER_BACKUPS')
+    # Соль для хэшей id; без нее хэши разные в каждом запуске
+    update_recorder_salt: SecretStr = Field(SecretStr(''), alias='UPDATE_RECORDER_SALT')
+
+    # Живой счетчик "уже N" на кнопке анонса: не чаще одного editMessageReplyMarkup на сообщение за интервал
+    live_request_counter_enabled: bool = Field(False, alias='LIVE_REQUEST_COUNTER_ENABLED')
+    live_request_counter_interval_seconds: float = Field(10.0, alias='LIVE_REQUEST_COUNTER_INTERVAL_SECONDS')
+
+    # Импорт ссылок из файла: пауза между анонсами (Telegram ограничивает ~20 сообщений в минуту на группу)
+    link_import_send_interval_seconds: float = Field(3.0, alias='LINK_IMPORT_SEND_INTERVAL_SECONDS')
+
+    # Выключение ссылок после события: is_active=False через LINK_EXPIRY_GRACE_MINUTES после event_time_utc.
+    # Анонсы выключенных ссылок: none - не трогать, edit - убрать кнопку, delete - удалить (не старше 48 часов)
+    link_expiry_enabled: bool = Field(True, alias='LINK_EXPIRY_ENABLED')
+    link_expiry_interval_minutes: int = Field(10, alias='LINK_EXPIRY_INTERVAL_MINUTES')
+    link_expiry_grace_minutes: int = Field(120, alias='LINK_EXPIRY_GRACE_MINUTES')
+    link_expiry_batch_size: int = Field(500, alias='LINK_EXPIRY_BATCH_SIZE')
+    link_expiry_announcement_action: str = Field('none', alias='LINK_EXPIRY_ANNOUNCEMENT_ACTION')
+    link_expiry_edit_interval_seconds: float = Field(1.0, alias='LINK_EXPIRY_EDIT_INTERVAL_SECONDS')
+
+    # Подписанные токены ссылок в кнопке анонса: off - кнопка с id ссылки (запрос в БД на каждое нажатие);
+    # callback - токен в callback data; deeplink - кнопка-ссылка t.me/<бот>?start=<токен> (ссылка приходит в личку).
+    # Секрет по умолчанию выводится из BOT_TOKEN - задайте свой, чтобы кнопки пережили смену токена бота
+    link_token_mode: str = Field('off', alias='LINK_TOKEN_MODE')
+    link_token_secret: SecretStr = Field(SecretStr(''), alias='LINK_TOKEN_SECRET')
+    link_token_ttl_days: int = Field(30, alias='LINK_TOKEN_TTL_DAYS') # Срок токена ссылки без времени события
+    link_url_cache_size: int = Field(10000, alias='LINK_URL_CACHE_SIZE')
+    # Запросы по токенам пишутся в журнал пачками: раз в интервал или по набору пачки
+    request_log_flush_interval_seconds: float = Field(2.0, alias='REQUEST_LOG_FLUSH_INTERVAL_SECONDS')
+    request_log_batch_size: int = Field(200, alias='REQUEST_LOG_BATCH_SIZE')
+
+    # Дополнительные группы для сбора статистики (основная группа учитывается всегда), например [-100123, -100456]
+    stats_chat_ids: List[int] = Field(default_factory=list, alias='STATS_CHAT_IDS_JSON')
+
+    # Что сохранять из сообщений группы: counters - только счетчики UserStats, без строк;
+    # metadata - строка без текста; hashed - плюс хэш текста; full - текст, сжатый в BLOB
+    message_capture_mode: str = Field('full', alias='MESSAGE_CAPTURE_MODE')
+    message_compression: str = Field('zlib', alias='MESSAGE_COMPRESSION') # zlib | zstd (нужен пакет zstandard)
+
+    # Полнотекстовый поиск /search (FTS5) по сообщениям, сохраненным в режиме full
+    search_enabled: bool = Field(True, alias='SEARCH_ENABLED')
+    search_tokenizer: str = Field('unicode61', alias='SEARCH_TOKENIZER') # unicode61 (слова) | trigram (подстроки)
+    search_page_size: int = Field(5, alias='SEARCH_PAGE_SIZE')
+
+    # Тепловая карта активности /activity: окно в днях и число процессов для расчета
+    activity_days: int = Field(28, alias='ACTIVITY_DAYS')
+    activity_workers: int = Field(1, alias='ACTIVITY_WORKERS')
+
+    # Ретеншн group_messages: старые сообщения переносятся в сжатый архив по дням
+    retention_enabled: bool = Field(False, alias='RETENTION_ENABLED')
+    retention_days: int = Field(90, alias='RETENTION_DAYS')
+    retention_archive_dir: str = Field('archive/group_messages', alias='RETENTION_ARCHIVE_DIR')
+    retention_batch_size: int = Field(2000, alias='RETENTION_BATCH_SIZE')
+    retention_batch_pause_ms: int = Field(50, alias='RETENTION_BATCH_PAUSE_MS')
+    retention_hour: int = Field(4, alias='RETENTION_HOUR') # Час запуска по Москве
+
+    @field_validator('announcement_target_chats', mode='before')
+    @classmethod
+    def _parse_target_chats(cls, value):
+        # Поддерживаем и словарь {"Имя": id}, и список [{"id": ..., "name": ...}] из .env.example
+        return parse_target_chats(value)
+
+    @property
+    def stats_chats(self) -> frozenset:
+        """Группы, из которых собирается статистика: основная и STATS_CHAT_IDS_JSON."""
+        return frozenset({self.main_group_id, *self.stats_chat_ids})
+
+    @field_validator('message_capture_mode')
+    @classmethod
+    def _check_capture_mode(cls, value):
+        if value not in MESSAGE_CAPTURE_MODES:
+            raise ValueError(f"MESSAGE_CAPTURE_MODE must be one of {', '.join(MESSAGE_CAPTURE_MODES)}")
+        return value
+
+    @field_validator('search_tokenizer')
+    @classmethod
+    def _check_search_tokenizer(cls, value):
+        if value not in SEARCH_TOKENIZERS:
+            raise ValueError(f"SEARCH_TOKENIZER must be one of {', '.join(SEARCH_TOKENIZERS)}")
+        return value
+
+    @field_validator('link_expiry_announcement_action')
+    @classmethod
+    def _check_link_expiry_announcement_action(cls, value):
+        if value not in LINK_EXPIRY_ANNOUNCEMENT_ACTIONS:
+            raise ValueError(f"LINK_EXPIRY_ANNOUNCEMENT_ACTION must be one of {', '.join(LINK_EXPIRY_ANNOUNCEMENT_ACTIONS)}")
+        return value
+
+    @field_validator('link_token_mode')
+    @classmethod
+    def _check_link_token_mode(cls, value):
+        if value not in LINK_TOKEN_MODES:
+            raise ValueError(f"LINK_TOKEN_MODE must be one of {', '.join(LINK_TOKEN_MODES)}")
+        return value
+
     # Конфигурация для загрузки из .env файла
     model_config = SettingsConfigDict(env_file='.env', extra='ignore')
 
@@ -3,7 +3,7 @@ import datetime
 
 from sqlalchemy import (
     create_engine, MetaData, Table, Integer, String, Column, DateTime,
-    ForeignKey, BigInteger, Boolean, UniqueConstraint, Text # Используем BigInteger для chat_id/user_id
+    ForeignKey, BigInteger, Boolean, UniqueConstraint, Text, LargeBinary, Index # Используем BigInteger для chat_id/user_id
 )
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func # для CURRENT_TIMESTAMP
@@ -15,6 +15,14 @@ Base = declarative_base()
 class Link(Base):
     """Модель для хранения анонсов и ссылок."""
     __tablename__ = 'links'
+    __table_args__ = (
+        # Фильтры /showlinks: каждая страница - диапазон одного индекса
+        Index('ix_links_pending', 'pending'),
+        Index('ix_links_active', 'is_active'),
+        Index('ix_links_active_event', 'is_active', 'event_time_utc'),
+        # Проверка повторов при импорте ссылок из файла
+        Index('ix_links_url', 'link_url'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True) # PK
     posted_message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, index=True) # ID сообщения в целевом чате
@@ -34,6 +42,9 @@ class Link(Base):
     pending: Mapped[bool] = mapped_column(Boolean, default=True) # True - если ожидает публикации
     reminder_30_sent: Mapped[bool] = mapped_column(Boolean, default=False, index=True) # Флаг 30-минутного напоминания
     reminder_10_sent: Mapped[bool] = mapped_column(Boolean, default=False, index=True) # Флаг 10-минутного напоминания
+    # Счетчики запросов ссылки, обновляются атомарно вместе с записью в requests
+    request_count: Mapped[int] = mapped_column(default=0, server_default='0') # Всего запросов
+    unique_requesters: Mapped[int] = mapped_column(default=0, server_default='0') # Разных пользователей
 
     # Связь с запросами (если нужна)
     requests: Mapped[list["Request"]] = relationship(back_populates="link", foreign_keys="[Request.link_id]") # Указываем FK явно
@@ -44,6 +55,14 @@ class Link(Base):
 class Request(Base):
     """Модель для логирования запросов на получение ссылки."""
     __tablename__ = 'requests'
+    __table_args__ = (
+        # Проверка "запрашивал ли пользователь эту ссылку раньше" для unique_requesters
+        Index('ix_requests_link_user', 'link_id', 'user_id'),
+        # Выгрузка /showrequests: постраничное чтение по (requested_at, id), в том числе с фильтром
+        Index('ix_requests_requested_at', 'requested_at'),
+        Index('ix_requests_link_time', 'link_id', 'requested_at'),
+        Index('ix_requests_user_time', 'user_id', 'requested_at'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True) # PK
     user_id: Mapped[int] = mapped_column(BigInteger, index=True, nullable=False)
@@ -64,18 +83,40 @@ class Request(Base):
 
 class GroupMessage(Base):
     __tablename__ = 'group_messages'
+    __table_args__ = (
+        # Одно сообщение - одна строка: правки обновляют ее, а не добавляют новую
+        Index('uq_group_messages_chat_message', 'chat_id', 'message_id', unique=True),
+        # Запросы по одной группе (период, автор) не читают строки других групп
+        Index('ix_group_messages_chat_timestamp', 'chat_id', 'timestamp'),
+        Index('ix_group_messages_chat_user', 'chat_id', 'user_id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True) # PK
     message_id: Mapped[int] = mapped_column(BigInteger, index=True)
     chat_id: Mapped[int] = mapped_column(BigInteger, index=True)
     user_id: Mapped[int] = mapped_column(BigInteger, index=True)
     username: Mapped[Optional[str]] = mapped_column(String)
-    message_text: Mapped[Optional[str]] = mapped_column(String) # Text messages
+    message_text: Mapped[Optional[str]] = mapped_column(String) # Текст как есть (старые строки)
+    # Что из текста сохраняется, зависит от MESSAGE_CAPTURE_MODE
+    text_compressed: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True) # Режим full: сжатый текст
+    text_hash: Mapped[Optional[str]] = mapped_column(String(32), nullable=True) # Режим hashed: sha256 текста
+    text_length: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # Длина текста в символах
     # Добавить поля для других типов контента по необходимости (фото, документы и т.д.)
     timestamp: Mapped[datetime.datetime] = mapped_column(default=func.now(), index=True)
+    edit_count: Mapped[int] = mapped_column(default=0, server_default='0') # Сколько раз сообщение правили
+    edited_at: Mapped[Optional[datetime.datetime]] = mapped_column(nullable=True) # Время последней правки
+
+    @property
+    def text(self) -> Optional[str]:
+        """Текст сообщения: из message_text или распакованный из text_compressed."""
+        if self.message_text is not None:
+            return self.message_text
+        from src.utils.text_codec import decompress_text
+        return decompress_text(self.text_compressed)
 
     def __repr__(self):
-        text_preview = f"'{self.message_text[:30]}..." if self.message_text else "None"
+        text = self.text
+        text_preview = f"'{text[:30]}..." if text else "None"
         return f"<GroupMessage(id={self.id}, msg_id={self.message_id}, user_id={self.user_id}, text={text_preview})>"
 
 class UserStats(Base):
@@ -90,3 +131,64 @@ class UserStats(Base):
 
     def __repr__(self):
         return f"<UserStats(user_id={self.user_id}, interviews={self.interview_count}, messages={self.message_count})>"
+
+class ChatUserStats(Base):
+    """Статистика пользователя в конкретной группе (UserStats - сумма по всем группам)."""
+    __tablename__ = 'chat_user_stats'
+    __table_args__ = (
+        # Топ группы: читаем индекс чата уже в порядке message_count
+        Index('ix_chat_user_stats_chat_messages', 'chat_id', 'message_count'),
+        # WITHOUT ROWID: строки хранятся в порядке (chat_id, user_id), данные группы лежат рядом
+        {'sqlite_with_rowid': False},
+    )
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    username: Mapped[Optional[str]] = mapped_column(String)
+    message_count: Mapped[int] = mapped_column(default=0)
+    first_seen: Mapped[datetime.datetime] = mapped_column(default=func.now())
+    last_seen: Mapped[datetime.datetime] = mapped_column(default=func.now())
+
+    def __repr__(self):
+        return f"<ChatUserStats(chat_id={self.chat_id}, user_id={self.user_id}, messages={self.message_count})>"
+
+class UniqueSketch(Base):
+    """HyperLogLog-скетч уникальных пользователей (src/utils/hyperloglog.py).
+
+    kind - что считаем, key - по чему: 'link_requesters' / id ссылки,
+    'chat_daily' / '<chat_id>:<ГГГГ-ММ-ДД>' (день в UTC).
+    """
+    __tablename__ = 'unique_sketches'
+    __table_args__ = ({'sqlite_with_rowid': False},)
+
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    registers: Mapped[bytes] = mapped_column(LargeBinary)
+    updated_at: Mapped[datetime.datetime] = mapped_column(default=func.now())
+
+    def __repr__(self):
+        return f"<UniqueSketch(kind={self.kind}, key={self.key}, bytes={len(self.registers or b'')})>"
+
+class FsmRecord(Base):
+    """Состояние и данные FSM для одного ключа (чат/пользователь/бот)."""
+    __tablename__ = 'fsm_states'
+
+    key: Mapped[str] = mapped_column(String, primary_key=True) # Ключ из DefaultKeyBuilder
+    state: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    data: Mapped[Optional[str]] = mapped_column(Text, nullable=True) # JSON с данными FSM
+    expires_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True, index=True) # UTC, None - без срока
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<FsmRecord(key={self.key}, state={self.state}, expires_at={self.expires_at})>"
+
+class TargetChat(Base):
+    """Чат, куда можно публиковать анонсы (дополняет ANNOUNCEMENT_TARGET_CHATS_JSON)."""
+    __tablename__ = 'target_chats'
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+
+    def __repr__(self):
+        return f"<TargetChat(chat_id={self.chat_id}, name='{self.name}', active={self.is_active})>"
@@ -0,0 +1,41 @@
+# src/handlers/activity.py
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from src.config.config import settings
+from src.services.activity_service import get_activity_report
+from src.services.stats_service import find_chat_user
+
+router = Router()
+
+
+@router.message(Command("activity"))
+async def activity_command(message: Message, command: CommandObject):
+    """Обработчик команды /activity [@username]: тепловая карта активности группы или участника.
+
+    Участника можно указать через @username или ответом на его сообщение.
+    В личке показывается активность основной группы.
+    """
+    chat_id = message.chat.id if message.chat.id in settings.stats_chats else settings.main_group_id
+    user_id = None
+    title = f"Активность группы за {settings.activity_days} дн."
+
+    if command.args:
+        username = command.args.strip().lstrip("@")
+        member = await find_chat_user(chat_id, username)
+        if member is None:
+            await message.answer(f"Не найдено сообщений от @{username} в этой группе.")
+            return
+        user_id = member.user_id
+        title = f"Активность @{member.username} за {settings.activity_days} дн."
+    elif message.reply_to_message and message.reply_to_message.from_user:
+        author = message.reply_to_message.from_user
+        user_id = author.id
+        title = f"Активность {'@' + author.username if author.username else author.full_name} за {settings.activity_days} дн."
+
+    report = await get_activity_report(chat_id, settings.activity_days, user_id=user_id, title=title)
+    if report is None:
+        await message.answer("Нет сообщений за этот период.")
+        return
+    await message.answer(report)
@@ -2,7 +2,7 @@ import logging
 from aiogram import Router, F, Bot, types
 from aiogram.types import CallbackQuery
 from aiogram.exceptions import TelegramAPIError
-from src.config import settings
+from src.services.chat_registry import chat_registry
 from src.services.link_service import get_link_by_id, publish_link # Импортируем из link_service
 from src.utils.callback_data import ChatSelectCallback
 from src.utils.keyboards import format_link_message_with_button # Импортируем из keyboards
@@ -35,18 +35,13 @@ async def handle_publish_link(query: CallbackQuery, callback_data: ChatSelectCal
         await query.answer(text="Ссылка уже опубликована.")
         return
 
-    # Находим имя чата по ID из настроек
-    target_chats = settings.announcement_target_chats
-    chat_name = "Unknown Chat"
-    if target_chats and isinstance(target_chats, dict):
-        # Правильная итерация по словарю
-        for name, chat_id_in_settings in target_chats.items():
-            if chat_id_in_settings == target_chat_id:
-                chat_name = name
-                break
-    else:
-        logger.warning(f"Target chats dictionary is missing or invalid in settings.")
-        await query.answer("Ошибка конфигурации чатов.", show_alert=True)
+    # Находим имя чата по ID в реестре (O(1), список перечитывается при изменении .env)
+    chat_name = chat_registry.get_name(target_chat_id)
+    if chat_name is None:
+        logging.warning(f"User {user_id} tried to publish link {link_id} to unknown chat {target_chat_id}")
+        await query.message.edit_text("Ошибка: этот чат больше не входит в список чатов для анонсов.")
+        await query.answer("Чат не найден в настройках.", show_alert=True)
+        return
 
     # 2. Формируем сообщение для анонса
     message_text, reply_markup = format_link_message_with_button(link)
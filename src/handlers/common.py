@@ -28,6 +28,11 @@ async def help_command(message: Message):
         "/mystats - Показать вашу статистику сообщений\n"
         "/topmsg - Показать топ пользователей по сообщениям\n"
         "/topinterviews - Показать топ пользователей по запросам ссылок (интервью)\n"
-        # "/showlinks - Показать ваши активные ссылки (TODO)"
-        # "/dellink <id> - Удалить ссылку по ID (TODO)"
+        "/activity [@username] - Тепловая карта активности группы или участника по часам недели\n"
+        "/search &lt;слова&gt; - Поиск по истории группы (для администратора)\n"
+        "/showrequests [csv|jsonl] [gz] [link=ID] [user=ID] [from=ДД.ММ.ГГГГ] [to=ДД.ММ.ГГГГ] - Выгрузить журнал запросов ссылок (для администратора)\n"
+        "/showlinks [all|pending|published|inactive|upcoming] - Список ссылок с листанием (для администратора)\n"
+        "/deactivate &lt;id...&gt; - Выключить ссылки, например 5 7 10-15 (для администратора)\n"
+        "/dellink &lt;id...&gt; - Удалить ссылки вместе с журналом их запросов (для администратора)\n"
+        "Файл .csv или .json в личку - импорт ссылок пачкой (для администратора)\n"
     )
@@ -2,30 +2,32 @@
 import logging
 from aiogram import Router, F, types
 from ..config.config import settings 
-from ..services import log_group_message_stats
+from ..services import log_group_message_stats, log_group_message_edit
 
 router = Router()
 
-router.message.filter(F.chat.id == settings.main_group_id)
-router.edited_message.filter(F.chat.id == settings.main_group_id)
+# Сообщения собираются из основной группы и групп из STATS_CHAT_IDS_JSON
+router.message.filter(F.chat.id.in_(settings.stats_chats))
+router.edited_message.filter(F.chat.id.in_(settings.stats_chats))
 
 # --- Логирование входящих ТЕКСТОВЫХ сообщений ---
 @router.message(F.text)
 async def log_incoming_text_message(message: types.Message):
-    """Логирует новое текстовое сообщение в основном чате."""
+    """Логирует новое текстовое сообщение в группе."""
     user = message.from_user
 
     if not user: 
-        logging.debug(f"Ignoring message from non-user in group {settings.main_group_id}")
+        logging.debug("Ignoring message from non-user in group %s", message.chat.id)
         return
 
-    logging.debug(f"Received text message in group {settings.main_group_id} from user {user.id}.")
+    logging.debug("Received text message in group %s from user %s.", message.chat.id, user.id)
 
     try:
         await log_group_message_stats(
+            message_id=message.message_id,
+            chat_id=message.chat.id,
             user_id=user.id,
             username=user.username,
-            full_name=user.full_name,
             message_text=message.text, 
             timestamp=message.date 
         )
@@ -36,22 +38,25 @@ async def log_incoming_text_message(message: types.Message):
 # --- Логирование измененных ТЕКСТОВЫХ сообщений ---
 @router.edited_message(F.text)
 async def log_edited_text_message(message: types.Message):
-    """Логирует изменение текстового сообщения в основном чате."""
+    """Логирует изменение текстового сообщения в группе."""
     user = message.from_user
 
     if not user or not message.edit_date: 
-        logging.debug(f"Ignoring edited message without user or edit_date in group {settings.main_group_id}")
+        logging.debug("Ignoring edited message without user or edit_date in group %s", message.chat.id)
         return
 
-    logging.debug(f"Received edited text message in group {settings.main_group_id} from user {user.id}.")
+    logging.debug("Received edited text message in group %s from user %s.", message.chat.id, user.id)
 
     try:
-        await log_group_message_stats(
+        # Правка обновляет строку исходного сообщения и не увеличивает message_count
+        await log_group_message_edit(
+            message_id=message.message_id,
+            chat_id=message.chat.id,
             user_id=user.id,
             username=user.username,
-            full_name=user.full_name,
-            message_text=message.text, 
-            timestamp=message.edit_date 
+            message_text=message.text,
+            timestamp=message.date,
+            edited_at=message.edit_date
         )
     except Exception as e:
         logging.error(f"Failed to log edited group message from user {user.id}: {e}", exc_info=True)
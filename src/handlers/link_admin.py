@@ -0,0 +1,171 @@
+# src/handlers/link_admin.py
+import datetime
+import html
+import logging
+from typing import List, Optional
+
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, Message
+
+from src.config.config import settings
+from src.db.models import Link
+from src.exceptions import ArgumentParsingError
+from src.services.link_service import (
+    LINK_STATUSES, LinkCursor, delete_links, get_links_page, set_links_active
+)
+from src.utils.callback_data import LinkPageCallback, LinkToggleCallback
+from src.utils.constants import MOSCOW_TZ
+from src.utils.keyboards import LINK_STATUS_TITLES, create_links_keyboard
+
+router = Router()
+
+# Управление ссылками доступно только администратору
+router.message.filter(F.from_user.id == settings.admin_id)
+router.callback_query.filter(F.from_user.id == settings.admin_id)
+
+LINKS_PAGE_SIZE = 10
+MAX_BULK_IDS = 500 # Защита от опечатки вроде 1-100000
+
+
+def _cursor(event_ts: int, link_id: int) -> Optional[LinkCursor]:
+    """Курсор из callback data (0 - первая страница)."""
+    if not link_id:
+        return None
+    event_time = (
+        datetime.datetime.fromtimestamp(event_ts, datetime.timezone.utc).replace(tzinfo=None) if event_ts else None
+    )
+    return LinkCursor(event_time, link_id)
+
+
+def _format_link(link: Link) -> str:
+    if link.pending:
+        state = "⏳ ожидает публикации"
+    elif link.is_active:
+        state = "✅ опубликована"
+    else:
+        state = "⏸ выключена"
+    line = f"<b>#{link.id}</b> {state}"
+    if link.event_time_utc:
+        event_time = link.event_time_utc.replace(tzinfo=datetime.timezone.utc).astimezone(MOSCOW_TZ)
+        line += f", событие {event_time:%d.%m.%Y %H:%M} МСК"
+    line += f", запросов: {link.request_count} ({link.unique_requesters} польз.)"
+    return f"{line}\n{html.escape(link.link_url)}"
+
+
+async def _render_page(status: str, cursor: Optional[LinkCursor] = None, backward: bool = False,
+                       inclusive: bool = False):
+    page = await get_links_page(status, LINKS_PAGE_SIZE, cursor, backward=backward, inclusive=inclusive)
+    if not page.links and cursor is not None:
+        # Граница устарела (ссылки удалены или сменили статус) - показываем начало списка
+        page = await get_links_page(status, LINKS_PAGE_SIZE)
+    title = f"🔗 Ссылки: {LINK_STATUS_TITLES[status]}"
+    if page.links:
+        text = "\n\n".join([title, *(_format_link(link) for link in page.links)])
+    else:
+        text = f"{title}\n\nСсылок нет."
+    return text, create_links_keyboard(page.links, status, page.has_prev, page.has_next)
+
+
+def _parse_link_ids(args_str: Optional[str]) -> List[int]:
+    """Разбирает список id ссылок: "5 7 10-15" (через пробел или запятую)."""
+    ids = set()
+    for part in (args_str or "").replace(",", " ").split():
+        first, sep, last = part.partition("-")
+        try:
+            start = int(first)
+            end = int(last) if sep else start
+        except ValueError:
+            raise ArgumentParsingError(f"Неверный id ссылки: {part}")
+        if end < start:
+            raise ArgumentParsingError(f"Неверный диапазон: {part}")
+        ids.update(range(start, end + 1))
+        if len(ids) > MAX_BULK_IDS:
+            raise ArgumentParsingError(f"Слишком много ссылок за раз (больше {MAX_BULK_IDS}).")
+    if not ids:
+        raise ArgumentParsingError("Укажите id ссылок, например: 5 7 10-15")
+    return sorted(ids)
+
+
+def _cancel_reminders(link_ids: List[int]) -> None:
+    from src.scheduler import cancel_reminders_for_link
+    for link_id in link_ids:
+        cancel_reminders_for_link(link_id)
+
+
+@router.message(Command("showlinks"))
+async def show_links_command(message: Message, command: CommandObject):
+    """Обработчик команды /showlinks [статус]: список ссылок с листанием."""
+    status = (command.args or "all").strip().lower()
+    if status not in LINK_STATUSES:
+        await message.answer(f"Использование: /showlinks [{'|'.join(LINK_STATUSES)}]")
+        return
+    text, keyboard = await _render_page(status)
+    await message.answer(text, reply_markup=keyboard, disable_web_page_preview=True)
+
+
+@router.callback_query(LinkPageCallback.filter())
+async def links_page_callback(query: CallbackQuery, callback_data: LinkPageCallback):
+    """Листание /showlinks и смена фильтра."""
+    if callback_data.status not in LINK_STATUSES:
+        await query.answer()
+        return
+    text, keyboard = await _render_page(
+        callback_data.status, _cursor(callback_data.event_ts, callback_data.link_id), backward=callback_data.back
+    )
+    try:
+        await query.message.edit_text(text, reply_markup=keyboard, disable_web_page_preview=True)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+    await query.answer()
+
+
+@router.callback_query(LinkToggleCallback.filter())
+async def link_toggle_callback(query: CallbackQuery, callback_data: LinkToggleCallback):
+    """Включение/выключение ссылки кнопкой из /showlinks."""
+    changed = await set_links_active([callback_data.link_id], callback_data.active)
+    if changed and not callback_data.active:
+        _cancel_reminders([callback_data.link_id])
+    if callback_data.status in LINK_STATUSES:
+        text, keyboard = await _render_page(
+            callback_data.status, _cursor(callback_data.event_ts, callback_data.anchor_id), inclusive=True
+        )
+        try:
+            await query.message.edit_text(text, reply_markup=keyboard, disable_web_page_preview=True)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                raise
+    action = "включена" if callback_data.active else "выключена"
+    await query.answer(f"Ссылка #{callback_data.link_id} {action}." if changed else "Ничего не изменилось.")
+
+
+@router.message(Command("deactivate"))
+async def deactivate_links_command(message: Message, command: CommandObject):
+    """Обработчик команды /deactivate <id...>: выключает ссылки (кнопка перестает выдавать ссылку)."""
+    try:
+        link_ids = _parse_link_ids(command.args)
+    except ArgumentParsingError as e:
+        await message.answer(f"{e}\nИспользование: /deactivate 5 7 10-15")
+        return
+    changed = await set_links_active(link_ids, False)
+    _cancel_reminders(link_ids)
+    await message.answer(f"Выключено ссылок: {changed}.")
+
+
+@router.message(Command("dellink"))
+async def delete_links_command(message: Message, command: CommandObject):
+    """Обработчик команды /dellink <id...>: удаляет ссылки вместе с журналом их запросов."""
+    try:
+        link_ids = _parse_link_ids(command.args)
+    except ArgumentParsingError as e:
+        await message.answer(f"{e}\nИспользование: /dellink 5 7 10-15")
+        return
+    deleted = await delete_links(link_ids)
+    _cancel_reminders(deleted)
+    logging.info(f"Admin {message.from_user.id} deleted links {deleted}")
+    if deleted:
+        await message.answer(f"Удалено ссылок: {len(deleted)} ({', '.join(f'#{link_id}' for link_id in deleted)}).")
+    else:
+        await message.answer("Ссылки с такими id не найдены.")
@@ -7,6 +7,7 @@ from aiogram.types import CallbackQuery
 from src.utils.callback_data import LinkCallbackFactory
 from src.services.link_service import log_link_request as db_log_link_request, get_link_by_id as db_get_link_by_id, publish_link
 from src.services.stats_service import increment_interview_count as db_increment_interview_count
+from src.services import announcement_counter
 from src.utils.messaging import send_link_to_user # Импорт из нового файла
 
 router = Router() # Создаем новый роутер специально для этих колбэков
@@ -20,14 +21,22 @@ async def get_link(query: CallbackQuery, callback_data: LinkCallbackFactory, bot
 
     logging.info(f"User {user_id} ({username}) requested link_id {link_id}")
 
-    # Логируем запрос в БД и обновляем статистику
-    await db_log_link_request(user_id, username, link_id)
-    await db_increment_interview_count(user_id, username)
+    # Логируем запрос в БД и обновляем статистику (выключенные и удаленные ссылки не засчитываются)
+    counts = await db_log_link_request(user_id, username, link_id)
+    if counts is not None:
+        await db_increment_interview_count(user_id, username)
+
+    # Живой счетчик на кнопке анонса (редактирования схлопываются, см. announcement_counter)
+    if counts and announcement_counter.announcement_counter is not None and query.message is not None:
+        announcement_counter.announcement_counter.update(
+            bot, query.message.chat.id, query.message.message_id, link_id, counts.unique_requesters
+        )
 
     # Получаем ссылку из БД
     link_record = await db_get_link_by_id(link_id)
 
-    if link_record:
+    # Выключенные ссылки (вручную или после события) больше не выдаются
+    if link_record and link_record.is_active:
         # Используем функцию отправки из utils
         send_success, message_text = await send_link_to_user(bot, user_id, link_record.link_url, link_id)
 
@@ -35,5 +44,5 @@ async def get_link(query: CallbackQuery, callback_data: LinkCallbackFactory, bot
         await query.answer(text=message_text, show_alert=not send_success) # Показываем alert при ошибке
 
     else:
-        logging.warning(f"User {user_id} requested non-existent link_id {link_id}")
+        logging.warning(f"User {user_id} requested non-existent or inactive link_id {link_id}")
         await query.answer(text="Извините, эта ссылка больше не доступна.", show_alert=True)
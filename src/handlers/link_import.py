@@ -0,0 +1,92 @@
+# src/handlers/link_import.py
+import asyncio
+import html
+import logging
+from typing import List
+
+from aiogram import Bot, F, Router
+from aiogram.enums import ChatType
+from aiogram.types import Message
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.config.config import settings
+from src.services.link_import_service import (
+    ImportParseError, ImportReportRow, import_links, parse_import_file, publish_imported_links
+)
+
+router = Router()
+
+# Импорт ссылок - только администратор и только в личке с ботом
+router.message.filter(F.from_user.id == settings.admin_id, F.chat.type == ChatType.PRIVATE)
+
+IMPORT_EXTENSIONS = (".csv", ".json")
+MAX_IMPORT_FILE_SIZE = 1024 * 1024
+MAX_REPORT_LENGTH = 3500 # Запас до лимита Telegram в 4096 символов
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_background_tasks = set()
+
+
+def _format_report(title: str, rows: List[ImportReportRow]) -> str:
+    lines = [title]
+    for row in sorted(rows, key=lambda row: row.line):
+        prefix = f"Строка {row.line}: " if row.line else ""
+        lines.append(f"{'✅' if row.ok else '❌'} {prefix}{html.escape(row.message)}")
+    text = "\n".join(lines)
+    if len(text) > MAX_REPORT_LENGTH:
+        text = text[:MAX_REPORT_LENGTH].rsplit("\n", 1)[0] + "\n…"
+    return text
+
+
+async def _publish_in_background(bot: Bot, chat_id: int, rows, link_ids: List[int]) -> None:
+    try:
+        published, errors = await publish_imported_links(
+            bot, rows, link_ids, settings.link_import_send_interval_seconds
+        )
+        await bot.send_message(chat_id, _format_report(f"📣 Опубликовано анонсов для {published} ссылок.", errors))
+    except Exception as e:
+        logging.exception(f"Publishing imported links failed: {e}")
+        await bot.send_message(chat_id, "❌ Ошибка при публикации импортированных ссылок, подробности в логе.")
+
+
+@router.message(F.document)
+async def handle_import_document(message: Message, bot: Bot):
+    """Импорт ссылок из CSV/JSON: колонки url, date, time, text, chats."""
+    document = message.document
+    filename = document.file_name or ""
+    if not filename.lower().endswith(IMPORT_EXTENSIONS):
+        await message.answer("Для импорта ссылок пришлите файл .csv или .json.")
+        return
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        await message.answer("Файл слишком большой для импорта (больше 1 МБ).")
+        return
+
+    data = (await bot.download(document)).read()
+    try:
+        rows, errors = await parse_import_file(data, filename)
+    except ImportParseError as e:
+        await message.answer(f"❌ {e}")
+        return
+
+    try:
+        link_ids = await import_links(message.from_user.id, rows)
+    except SQLAlchemyError as e:
+        logging.error(f"Database error importing {len(rows)} links: {e}")
+        await message.answer("❌ Ошибка базы данных: ни одна ссылка не добавлена.")
+        return
+
+    report = errors + [
+        ImportReportRow(row.line, True, f"#{link_id}" + ("" if row.chat_ids else " (ожидает публикации)"))
+        for row, link_id in zip(rows, link_ids)
+    ]
+    logging.info(f"Admin {message.from_user.id} imported {len(link_ids)} links from {filename}, {len(errors)} rows rejected")
+    await message.answer(_format_report(f"📥 Добавлено ссылок: {len(link_ids)}, ошибок: {len(errors)}.", report))
+
+    to_publish = [(row, link_id) for row, link_id in zip(rows, link_ids) if row.chat_ids]
+    if to_publish:
+        await message.answer(f"Публикую анонсы для {len(to_publish)} ссылок, это займет некоторое время…")
+        task = asyncio.create_task(_publish_in_background(
+            bot, message.chat.id, [row for row, _ in to_publish], [link_id for _, link_id in to_publish]
+        ))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
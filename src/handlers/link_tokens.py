@@ -0,0 +1,89 @@
+# src/handlers/link_tokens.py
+import datetime
+import logging
+from typing import Optional, Tuple
+
+from aiogram import Bot, F, Router
+from aiogram.enums import ChatType
+from aiogram.filters import CommandObject, CommandStart
+from aiogram.types import CallbackQuery, Message, User
+
+from src.services import link_tokens, request_log_writer
+from src.services.link_tokens import TOKEN_PATTERN, LinkTokenError, url_tag
+from src.services.link_url_cache import link_url_cache
+from src.services.request_log_writer import PendingRequest
+from src.utils.callback_data import LinkTokenCallback
+from src.utils.messaging import send_link_to_user
+
+router = Router()
+
+# Нажатия кнопок с подписанными токенами (LINK_TOKEN_MODE): токен проверяется
+# без БД, URL берется из карты в памяти, запрос уходит в буфер журнала.
+# Кнопки со старым link_id по-прежнему обрабатывает link_callbacks.
+
+UNAVAILABLE_TEXT = "Извините, эта ссылка больше не доступна."
+
+
+async def _resolve_token(token: str, user_id: int) -> Optional[Tuple[int, str]]:
+    """(link_id, URL) по токену или None (подделан, просрочен, ссылка выключена)."""
+    if link_tokens.link_token_signer is None:
+        return None
+    try:
+        parsed = link_tokens.link_token_signer.verify(token)
+    except LinkTokenError as e:
+        logging.warning(f"User {user_id} sent a rejected link token: {e}")
+        return None
+    url = await link_url_cache.get_url(parsed.link_id)
+    if url is None or url_tag(url) != parsed.url_tag:
+        logging.warning(f"User {user_id} requested unavailable link_id {parsed.link_id} by token")
+        return None
+    return parsed.link_id, url
+
+
+def _log_request(user: User, link_id: int, chat_id: Optional[int] = None, message_id: Optional[int] = None,
+                 token: Optional[str] = None) -> None:
+    username = user.username or user.full_name
+    logging.info(f"User {user.id} ({username}) requested link_id {link_id} by token")
+    writer = request_log_writer.request_log_writer
+    if writer is None:
+        return
+    writer.submit(PendingRequest(
+        user_id=user.id,
+        username=username,
+        link_id=link_id,
+        requested_at=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None),
+        chat_id=chat_id,
+        message_id=message_id,
+        token=token,
+    ))
+
+
+@router.callback_query(LinkTokenCallback.filter())
+async def get_link_by_token(query: CallbackQuery, callback_data: LinkTokenCallback, bot: Bot):
+    """Обработчик кнопки 'Получить ссылку' с токеном: ссылка приходит в личку."""
+    resolved = await _resolve_token(callback_data.token, query.from_user.id)
+    if resolved is None:
+        await query.answer(text=UNAVAILABLE_TEXT, show_alert=True)
+        return
+    link_id, url = resolved
+    message = query.message
+    _log_request(
+        query.from_user, link_id,
+        message.chat.id if message else None, message.message_id if message else None, callback_data.token,
+    )
+    send_success, message_text = await send_link_to_user(bot, query.from_user.id, url, link_id)
+    await query.answer(text=message_text, show_alert=not send_success)
+
+
+@router.message(CommandStart(deep_link=True, magic=F.args.regexp(TOKEN_PATTERN)), F.chat.type == ChatType.PRIVATE)
+async def get_link_by_deep_link(message: Message, command: CommandObject, bot: Bot):
+    """Обработчик /start <токен> из кнопки-ссылки анонса (режим deeplink)."""
+    resolved = await _resolve_token(command.args, message.from_user.id)
+    if resolved is None:
+        await message.answer(UNAVAILABLE_TEXT)
+        return
+    link_id, url = resolved
+    _log_request(message.from_user, link_id)
+    send_success, message_text = await send_link_to_user(bot, message.from_user.id, url, link_id)
+    if not send_success:
+        await message.answer(message_text)
@@ -21,6 +21,7 @@ from src.utils.keyboards import get_link_keyboard, create_publish_keyboard # У
 from src.utils.misc import get_random_phrase
 from src.db.models import Link
 from src.services.link_service import add_link as db_add_link
+from src.services.link_tokens import issue_link_token
 from src.services.request_log_service import (
     log_link_request as db_log_link_request
 )
@@ -122,7 +123,7 @@ async def _send_announcement_to_group(bot: Bot, link: Link, target_chat_id: int)
         group_message_text = base_text
 
     # Создаем клавиатуру для сообщения в группе
-    keyboard = get_link_keyboard(link.id)
+    keyboard = get_link_keyboard(link.id, token=issue_link_token(link))
 
     send_kwargs = {
         "chat_id": target_chat_id,
@@ -0,0 +1,107 @@
+# src/handlers/request_logs.py
+import datetime
+import logging
+import os
+import tempfile
+from typing import NamedTuple, Optional
+
+from aiogram import F, Router
+from aiogram.enums import ChatAction
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.config.config import settings
+from src.exceptions import ArgumentParsingError
+from src.services.request_export_service import EXPORT_FORMATS, RequestExportFilter, export_requests
+
+router = Router()
+
+# Журнал запросов доступен только администратору
+router.message.filter(F.from_user.id == settings.admin_id)
+
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024 # Ограничение Bot API на отправку файла
+USAGE = (
+    "Использование: /showrequests [csv|jsonl] [gz] [link=ID] [user=ID] [from=ДД.ММ.ГГГГ] [to=ДД.ММ.ГГГГ]\n"
+    "Даты - по UTC, включительно."
+)
+
+
+class ShowRequestsArgs(NamedTuple):
+    fmt: str
+    compress: bool
+    filters: RequestExportFilter
+
+
+def _parse_date(value: str) -> datetime.date:
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ArgumentParsingError(f"Не удалось распознать дату: {value}. Используйте формат ДД.ММ.ГГГГ.")
+
+
+def _parse_showrequests_args(args_str: Optional[str]) -> ShowRequestsArgs:
+    """Парсит аргументы /showrequests: формат, gz и фильтры key=value в любом порядке."""
+    fmt = "csv"
+    compress = False
+    filters = {}
+    for part in (args_str or "").split():
+        key, sep, value = part.partition("=")
+        key = key.lower()
+        if not sep:
+            if key in EXPORT_FORMATS:
+                fmt = key
+            elif key in ("gz", "gzip"):
+                compress = True
+            else:
+                raise ArgumentParsingError(f"Неизвестный аргумент: {part}")
+        elif key in ("link", "user"):
+            try:
+                filters[f"{key}_id"] = int(value)
+            except ValueError:
+                raise ArgumentParsingError(f"{key} должен быть числовым ID: {value}")
+        elif key == "from":
+            filters["start"] = _parse_date(value)
+        elif key == "to":
+            filters["end"] = _parse_date(value)
+        else:
+            raise ArgumentParsingError(f"Неизвестный фильтр: {key}")
+    return ShowRequestsArgs(fmt=fmt, compress=compress, filters=RequestExportFilter(**filters))
+
+
+@router.message(Command("showrequests"))
+async def show_requests_command(message: Message, command: CommandObject):
+    """Обработчик команды /showrequests: выгрузка журнала запросов ссылок файлом."""
+    try:
+        args = _parse_showrequests_args(command.args)
+    except ArgumentParsingError as e:
+        await message.answer(f"{e}\n\n{USAGE}")
+        return
+
+    await message.bot.send_chat_action(message.chat.id, ChatAction.UPLOAD_DOCUMENT)
+    suffix = f".{args.fmt}" + (".gz" if args.compress else "")
+    fd, path = tempfile.mkstemp(prefix="requests_", suffix=suffix)
+    os.close(fd)
+    try:
+        try:
+            total = await export_requests(path, args.fmt, args.compress, args.filters)
+        except SQLAlchemyError as e:
+            logging.error(f"Database error exporting request log: {e}")
+            await message.answer("Ошибка при чтении журнала запросов.")
+            return
+        if total == 0:
+            await message.answer("Запросов по заданным фильтрам нет.")
+            return
+        size = os.path.getsize(path)
+        if size > MAX_DOCUMENT_SIZE:
+            await message.answer(
+                f"Выгрузка ({total} строк, {size // (1024 * 1024)} МБ) больше лимита Telegram в 50 МБ. "
+                f"Добавьте gz или сузьте фильтры."
+            )
+            return
+        filename = f"requests_{datetime.datetime.now(datetime.timezone.utc):%Y%m%d_%H%M}{suffix}"
+        await message.answer_document(FSInputFile(path, filename=filename), caption=f"Запросов: {total}")
+    finally:
+        os.unlink(path)
@@ -0,0 +1,111 @@
+# src/handlers/search.py
+import asyncio
+import html
+import logging
+from typing import List
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+
+from src.config.config import settings
+from src.db.models import GroupMessage
+from src.services.search_service import reindex_search, search_messages
+from src.utils.callback_data import SearchPageCallback
+from src.utils.keyboards import create_search_keyboard
+
+router = Router()
+
+# Поиск по истории группы доступен только администратору
+router.message.filter(F.from_user.id == settings.admin_id)
+router.callback_query.filter(F.from_user.id == settings.admin_id)
+
+PREVIEW_LENGTH = 300
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_background_tasks = set()
+
+
+def _message_url(message: GroupMessage) -> str:
+    """Ссылка на сообщение супергруппы: t.me/c/<id без -100>/<message_id>."""
+    internal_id = str(message.chat_id).removeprefix("-100")
+    return f"https://t.me/c/{internal_id}/{message.message_id}"
+
+
+def _format_results(query: str, page: int, messages: List[GroupMessage]) -> str:
+    lines = [f"🔎 <b>{html.escape(query)}</b> - страница {page + 1}\n"]
+    for number, message in enumerate(messages, page * settings.search_page_size + 1):
+        author = html.escape(f"@{message.username}" if message.username else f"User ID: {message.user_id}")
+        text = message.text or ""
+        if len(text) > PREVIEW_LENGTH:
+            text = text[:PREVIEW_LENGTH] + "…"
+        lines.append(
+            f"{number}. {author}, {message.timestamp:%d.%m.%Y %H:%M} UTC "
+            f"(<a href=\"{_message_url(message)}\">открыть</a>)\n{html.escape(text)}\n"
+        )
+    return "\n".join(lines)
+
+
+async def _search_page(query: str, page: int, chat_id: int):
+    # В группе ищем только по ее сообщениям, в личке - по всем группам
+    scope = chat_id if chat_id in settings.stats_chats else None
+    messages, has_next = await search_messages(
+        query, page=page, page_size=settings.search_page_size, chat_id=scope, tokenizer=settings.search_tokenizer
+    )
+    if not messages:
+        return None, None
+    return _format_results(query, page, messages), create_search_keyboard(page, has_next)
+
+
+@router.message(Command("search"))
+async def search_command(message: Message, command: CommandObject, state: FSMContext):
+    """Обработчик команды /search <слова> - поиск по истории группы."""
+    if not settings.search_enabled:
+        await message.answer("Поиск выключен (SEARCH_ENABLED=false).")
+        return
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("Укажите, что искать: /search &lt;слова&gt;")
+        return
+
+    text, keyboard = await _search_page(query, 0, message.chat.id)
+    if text is None:
+        await message.answer(f"По запросу «{html.escape(query)}» ничего не найдено.")
+        return
+    # Запрос не помещается в callback data (64 байта) - кнопки листания берут его из FSM
+    await state.update_data(search_query=query)
+    await message.answer(text, reply_markup=keyboard, disable_web_page_preview=True)
+
+
+@router.callback_query(SearchPageCallback.filter())
+async def search_page_callback(query: CallbackQuery, callback_data: SearchPageCallback, state: FSMContext):
+    """Листание результатов /search."""
+    search_query = (await state.get_data()).get("search_query")
+    if not search_query:
+        await query.answer("Поиск устарел, повторите /search.", show_alert=True)
+        return
+    text, keyboard = await _search_page(search_query, callback_data.page, query.message.chat.id)
+    if text is None:
+        await query.answer("Больше результатов нет.")
+        return
+    await query.message.edit_text(text, reply_markup=keyboard, disable_web_page_preview=True)
+    await query.answer()
+
+
+@router.message(Command("reindex_search"))
+async def reindex_search_command(message: Message):
+    """Обработчик команды /reindex_search - пересобирает индекс поиска в фоне."""
+    await message.answer("Пересобираю индекс поиска, это может занять время...")
+
+    async def run():
+        try:
+            total = await reindex_search()
+            await message.answer(f"Индекс поиска пересобран: {total} сообщений.")
+        except Exception as e:
+            logging.exception(f"Search reindex failed: {e}")
+            await message.answer("Не удалось пересобрать индекс поиска, подробности в логах.")
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
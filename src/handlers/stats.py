@@ -1,43 +1,63 @@
 # src/handlers/stats.py
 # import logging 
+import datetime
+
 from aiogram import Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 
 # Сервисы БД
+from src.config.config import settings
 from src.services.stats_service import (
     get_user_stats as db_get_user_stats,
+    get_chat_user_stats,
     get_top_users_by_messages,
     get_top_users_by_interviews
 )
+from src.services.sketch_service import count_active_users, count_link_requesters
 
 router = Router()
 
+
+def _format_time(value) -> str:
+    return value.strftime('%Y-%m-%d %H:%M') if value else 'Нет данных'
+
 # --- Обработчики команд статистики --- #
 
 @router.message(Command("mystats"))
 async def my_stats_command(message: Message):
-    """Обработчик команды /mystats."""
+    """Обработчик команды /mystats (в группе - еще и статистика в этой группе)."""
     user_id = message.from_user.id
     user_stats = await db_get_user_stats(user_id)
 
     if user_stats:
-        await message.answer(
+        response_text = (
             f"Ваша статистика:\n"
-            f" - Сообщений в группе: {user_stats.message_count}\n"
+            f" - Сообщений во всех группах: {user_stats.message_count}\n"
             f" - Запросов ссылок (собеседований): {user_stats.interview_count}\n"
-            f" - Первое сообщение: {user_stats.first_message_timestamp.strftime('%Y-%m-%d %H:%M') if user_stats.first_message_timestamp else 'Нет данных'}\n"
-            f" - Последняя активность: {user_stats.last_message_timestamp.strftime('%Y-%m-%d %H:%M') if user_stats.last_message_timestamp else 'Нет данных'}"
+            f" - Первое сообщение: {_format_time(user_stats.first_seen)}\n"
+            f" - Последняя активность: {_format_time(user_stats.last_seen)}"
         )
+        if message.chat.id in settings.stats_chats:
+            chat_stats = await get_chat_user_stats(message.chat.id, user_id)
+            if chat_stats:
+                response_text += (
+                    f"\n\nВ этой группе:\n"
+                    f" - Сообщений: {chat_stats.message_count}\n"
+                    f" - Первое сообщение: {_format_time(chat_stats.first_seen)}"
+                )
+        await message.answer(response_text)
     else:
         await message.answer("Не найдено статистики для вас. Возможно, вы еще не писали в группе или не запрашивали ссылки.")
 
 @router.message(Command("topmsg"))
 async def top_messages_command(message: Message):
-    """Обработчик команды /topmsg."""
-    top_users = await get_top_users_by_messages(limit=10) # Возьмем топ-10
+    """Обработчик команды /topmsg: в группе - топ этой группы, в личке - по всем группам."""
+    chat_id = message.chat.id if message.chat.id in settings.stats_chats else None
+    top_users = await get_top_users_by_messages(limit=10, chat_id=chat_id) # Возьмем топ-10
     if top_users:
-        response_text = "Топ пользователей по количеству сообщений:\n\n"
+        scope = "в этой группе" if chat_id is not None else "во всех группах"
+        response_text = f"Топ пользователей по количеству сообщений {scope}:\n\n"
         for i, user in enumerate(top_users, 1):
             username = user.username or f"User ID: {user.user_id}"
             response_text += f"{i}. {username}: {user.message_count}\n"
@@ -57,3 +77,27 @@ async def top_interviews_command(message: Message):
         await message.answer(response_text)
     else:
         await message.answer("Пока нет данных для статистики.")
+
+@router.message(Command("uniques"))
+async def uniques_command(message: Message, command: CommandObject):
+    """Обработчик команды /uniques [id ссылки] - уникальные пользователи (приближенно, HyperLogLog)."""
+    if message.from_user.id != settings.admin_id:
+        return
+
+    if command.args:
+        try:
+            link_id = int(command.args.strip())
+        except ValueError:
+            await message.answer("Использование: /uniques [id ссылки]")
+            return
+        requesters = await count_link_requesters(link_id)
+        await message.answer(f"Ссылку #{link_id} запросили ~{requesters} уникальных пользователей.")
+        return
+
+    chat_id = message.chat.id if message.chat.id in settings.stats_chats else settings.main_group_id
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    lines = ["Уникальные авторы сообщений (UTC, точность ~3%):"]
+    for title, days in (("Сегодня", 1), ("За 7 дней", 7), ("За 30 дней", 30)):
+        count = await count_active_users(chat_id, today - datetime.timedelta(days=days - 1), today)
+        lines.append(f" - {title}: {count}")
+    await message.answer("\n".join(lines))
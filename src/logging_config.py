@@ -1,11 +1,122 @@
 # src/logging_config.py
 import sys
 import logging
+import itertools
 from pathlib import Path
+from typing import Dict, Optional
 from loguru import logger
 
-def setup_logging():
-    """Настраивает Loguru для красивого логирования."""
+# --- Состояние, вычисляемое при настройке логирования ---
+# Минимальный уровень среди всех sink'ов: все, что ниже, никуда не попадет,
+# поэтому горячий путь может не тратить время на форматирование.
+_min_level_no: int = logging.DEBUG
+# Доли сэмплирования по типу события: {"group_message": 0.01} -> логируем 1 из 100
+_sample_every: Dict[str, int] = {}
+_sample_counters: Dict[str, "itertools.count[int]"] = {}
+
+
+def is_level_enabled(level: int) -> bool:
+    """Проверяет, попадет ли запись уровня level хотя бы в один sink."""
+    return level >= _min_level_no
+
+
+def sample(event_type: str) -> bool:
+    """Решает, логировать ли очередную запись для данного типа события.
+
+    Для типов без настроенной доли всегда возвращает True. Сэмплирование
+    детерминированное (каждая N-я запись), чтобы не тратить время на random.
+    """
+    every = _sample_every.get(event_type)
+    if every is None:
+        return True
+    if every <= 0:
+        return False
+    return next(_sample_counters[event_type]) % every == 0
+
+
+def _configure_sampling(sample_rates: Optional[Dict[str, float]]) -> None:
+    """Переводит доли сэмплирования (0..1) в шаг 'каждая N-я запись'."""
+    _sample_every.clear()
+    _sample_counters.clear()
+    for event_type, rate in (sample_rates or {}).items():
+        _sample_every[event_type] = 0 if rate <= 0 else max(1, round(1 / min(rate, 1.0)))
+        _sample_counters[event_type] = itertools.count()
+
+
+class InterceptHandler(logging.Handler):
+    """Перенаправляет записи стандартного logging в Loguru (профиль dev).
+
+    Проходит по стеку вызовов, чтобы в логе были реальные файл и строка.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Получаем соответствующий уровень Loguru
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        # Находим вызывающий кадр для корректного отображения имени файла и строки
+        frame, depth = logging.currentframe(), 2
+        # Итерируемся, пока не выйдем из модуля logging
+        while frame is not None and frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+        # Если frame стал None, используем стандартную глубину
+        if frame is None:
+             depth = 2
+
+        logger.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def _patch_stdlib_origin(record) -> None:
+    """Подставляет в запись Loguru имя/функцию/строку из исходного LogRecord."""
+    origin = record["extra"].pop("_stdlib_record", None)
+    if origin is not None:
+        record["name"] = origin.name
+        record["function"] = origin.funcName
+        record["line"] = origin.lineno
+
+
+class FastInterceptHandler(logging.Handler):
+    """Перехватчик для профиля prod: без прохода по стеку.
+
+    Место вызова берется прямо из LogRecord, уровень - из заранее
+    построенной таблицы.
+    """
+
+    _levels = {
+        logging.CRITICAL: "CRITICAL",
+        logging.ERROR: "ERROR",
+        logging.WARNING: "WARNING",
+        logging.INFO: "INFO",
+        logging.DEBUG: "DEBUG",
+    }
+    _logger = logger.patch(_patch_stdlib_origin)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        level = self._levels.get(record.levelno, record.levelno)
+        self._logger.bind(_stdlib_record=record).opt(exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def setup_logging(profile: str = "dev", level: Optional[str] = None,
+                  sample_rates: Optional[Dict[str, float]] = None):
+    """Настраивает Loguru.
+
+    Args:
+        profile: "dev" - цветной вывод в консоль с DEBUG и расширенной диагностикой;
+            "prod" - без цветов и diagnose, JSON-файл, сэмплирование шумных логов.
+        level: Уровень для консоли (по умолчанию DEBUG для dev и INFO для prod).
+        sample_rates: Доли сэмплирования по типу события, например {"group_message": 0.01}.
+    """
+    global _min_level_no
+
+    is_prod = profile == "prod"
+    console_level = (level or ("INFO" if is_prod else "DEBUG")).upper()
 
     # Определяем базовую директорию проекта, чтобы логи лежали в корне
     BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,18 +128,44 @@ def setup_logging():
     # Удаляем стандартный обработчик, чтобы настроить свой
     logger.remove()
 
-    # Настраиваем вывод в консоль (stderr)
-    # Добавляем цвета и красивый формат
-    logger.add(
-        sys.stderr,
-        level="DEBUG", # Уровень логирования для консоли (можно изменить на INFO для прода)
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-               "<level>{level: <8}</level> | "
-               "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        colorize=True, # Включаем цвета
-        backtrace=True, # Улучшенный трейсбек
-        diagnose=True # Расширенная диагностика ошибок
-    )
+    if is_prod:
+        # Консоль без цветов и без diagnose: diagnose сериализует локальные
+        # переменные каждого кадра трейсбека, это дорого и может утечь в логи.
+        logger.add(
+            sys.stderr,
+            level=console_level,
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
+            colorize=False,
+            backtrace=False,
+            diagnose=False,
+            enqueue=True
+        )
+        # Структурированный JSON-лог для машинной обработки
+        logger.add(
+            LOGS_DIR / "bot.json",
+            level="INFO",
+            rotation="50 MB",
+            retention="7 days",
+            compression="zip",
+            encoding="utf-8",
+            serialize=True, # Каждая запись - одна строка JSON
+            backtrace=False,
+            diagnose=False,
+            enqueue=True
+        )
+    else:
+        # Настраиваем вывод в консоль (stderr)
+        # Добавляем цвета и красивый формат
+        logger.add(
+            sys.stderr,
+            level=console_level,
+            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+                   "<level>{level: <8}</level> | "
+                   "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+            colorize=True, # Включаем цвета
+            backtrace=True, # Улучшенный трейсбек
+            diagnose=True # Расширенная диагностика ошибок
+        )
 
     # Настраиваем вывод в файл
     # Будет создан файл logs/bot.log, ротирующийся при достижении 10 MB
@@ -41,40 +178,21 @@ def setup_logging():
         compression="zip", # Сжимать старые логи в zip
         encoding="utf-8",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        backtrace=True,
-        diagnose=True,
+        backtrace=not is_prod,
+        diagnose=not is_prod,
         enqueue=True # Асинхронная запись в файл для производительности
     )
 
+    _min_level_no = min(logger.level(console_level).no, logger.level("INFO").no)
+    _configure_sampling(sample_rates)
+
     # --- Перехват стандартного logging ---
     # Это нужно, чтобы логгеры из других библиотек (aiogram, sqlalchemy)
     # тоже направлялись в Loguru.
-
-    class InterceptHandler(logging.Handler):
-        def emit(self, record: logging.LogRecord) -> None:
-            # Получаем соответствующий уровень Loguru
-            try:
-                level = logger.level(record.levelname).name
-            except ValueError:
-                level = record.levelno
-
-            # Находим вызывающий кадр для корректного отображения имени файла и строки
-            frame, depth = logging.currentframe(), 2
-            # Итерируемся, пока не выйдем из модуля logging
-            while frame is not None and frame.f_code.co_filename == logging.__file__:
-                frame = frame.f_back
-                depth += 1
-            # Если frame стал None, используем стандартную глубину
-            if frame is None:
-                 depth = 2
-
-            logger.opt(depth=depth, exception=record.exc_info).log(
-                level, record.getMessage()
-            )
-
-    # Убираем стандартные обработчики logging и добавляем наш перехватчик
-    # Устанавливаем уровень 0 для корневого логгера, чтобы перехватывать все
-    logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+    # В prod уровень корневого логгера равен минимальному уровню sink'ов:
+    # отфильтрованные записи отсекаются в logging еще до создания LogRecord.
+    handler = FastInterceptHandler() if is_prod else InterceptHandler()
+    logging.basicConfig(handlers=[handler], level=_min_level_no if is_prod else 0, force=True)
 
     # Настраиваем уровни для некоторых шумных логгеров библиотек (опционально)
     # Уровень DEBUG для aiogram event полезен для отладки, но может быть слишком шумным
@@ -82,6 +200,6 @@ def setup_logging():
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING) # Делаем SQLAlchemy менее многословным
     # logging.getLogger("httpx").setLevel(logging.WARNING) # Если используется httpx
 
-    logger.info("Logging setup complete using Loguru.")
+    logger.info("Logging setup complete using Loguru (profile={}, console_level={}).", profile, console_level)
 
 # Не вызываем setup_logging() здесь, чтобы это делалось явно в main.py
@@ -1,14 +1,52 @@
 # src/middlewares/logging_middleware.py
+import logging
 import time
-from typing import Callable, Dict, Any, Awaitable
+from typing import Callable, Dict, Any, Awaitable, Optional
 
 from aiogram import BaseMiddleware
+from aiogram.enums import ChatType
 from aiogram.types import TelegramObject, Update, Message, CallbackQuery
+from aiogram.types.update import UpdateTypeLookupError
 
 from loguru import logger
 
+from src.logging_config import is_level_enabled, sample
+from src.services.metrics import UPDATES_TOTAL, UPDATE_LATENCY, UPDATES_IN_FLIGHT, UPDATE_ERRORS
+from src.services import sql_profiler
+
+_GROUP_CHAT_TYPES = (ChatType.GROUP, ChatType.SUPERGROUP)
+
+
+def _describe_update(event: Update) -> tuple[str, str]:
+    """Возвращает (тип события, подробности) для строки лога.
+
+    Вызывается только если DEBUG-строка действительно будет записана.
+    """
+    if event.message:
+        details = f" msg_id={event.message.message_id} type={event.message.content_type}"
+        if event.message.text:
+            text_preview = event.message.text[:30].replace('\n', ' ')
+            details += f" text='{text_preview}...'"
+        return "Message", details
+    if event.edited_message:
+        return "EditedMessage", f" msg_id={event.edited_message.message_id}"
+    if event.callback_query:
+        message = event.callback_query.message
+        return "CallbackQuery", f" data='{event.callback_query.data}' msg_id={message.message_id if message else 'N/A'}"
+    # Добавьте другие типы событий по мере необходимости (inline_query, chat_member, etc.)
+    return "Unknown", ""
+
+
 class LoggingMiddleware(BaseMiddleware):
-    """Middleware для логирования входящих обновлений и времени их обработки."""
+    """Middleware для логирования входящих обновлений и времени их обработки.
+
+    Помимо логов, отдает длительность обработки, число обновлений в работе
+    и ошибки в метрики (см. src/services/metrics.py), а также число SQL-запросов
+    и время БД на обновление (см. src/services/sql_profiler.py; объект со
+    счетчиками доступен обработчикам как data["db_stats"]). Строки лога собираются
+    только если DEBUG включен и запись прошла сэмплирование по типу события,
+    поэтому при отфильтрованных логах накладные расходы сводятся к паре проверок.
+    """
 
     async def __call__(
         self,
@@ -18,45 +56,65 @@ class LoggingMiddleware(BaseMiddleware):
     ) -> Any:
         # Проверяем, что это действительно объект Update
         if not isinstance(event, Update):
-            logger.warning(f"Middleware received non-Update event: {type(event)}")
+            logger.warning("Middleware received non-Update event: {}", type(event))
             return await handler(event, data)
 
-        # Извлекаем пользователя и чат, если возможно
-        user = data.get('event_from_user')
-        chat = data.get('event_chat')
+        # Тип события для меток метрик (message, callback_query, ...)
+        try:
+            metric_event_type = event.event_type
+        except UpdateTypeLookupError:
+            metric_event_type = "unknown"
 
-        # Формируем базовую строку лога
-        log_prefix = f"Update[{event.update_id}]"
-        user_info = f"User[{user.id} @{user.username or ''}]" if user else "User[Unknown]"
-        chat_info = f"Chat[{chat.id} {chat.type}]" if chat else "Chat[Unknown]"
-
-        # Определяем тип события
-        event_type = "Unknown"
-        details = ""
-        if event.message:
-            event_type = "Message"
-            details = f" msg_id={event.message.message_id} type={event.message.content_type}"
-            if event.message.text:
-                details += f" text='{event.message.text[:30].replace('\n', ' ')}...'"
-        elif event.edited_message:
-            event_type = "EditedMessage"
-            details = f" msg_id={event.edited_message.message_id}"
-        elif event.callback_query:
-            event_type = "CallbackQuery"
-            details = f" data='{event.callback_query.data}' msg_id={event.callback_query.message.message_id if event.callback_query.message else 'N/A'}"
-        # Добавьте другие типы событий по мере необходимости (inline_query, chat_member, etc.)
-
-        logger.debug(f"{log_prefix} Received {event_type} from {user_info} in {chat_info}.{details}")
+        # Решаем один раз на обновление, будем ли писать DEBUG-строки
+        log_line: Optional[tuple[str, str, str]] = None
+        if is_level_enabled(logging.DEBUG) and sample(self._sample_key(metric_event_type, data)):
+            log_line = self._format_context(event, data)
+            logger.debug("{} Received {}.{}", *log_line)
 
         # Засекаем время начала обработки
         start_time = time.monotonic()
+        UPDATES_IN_FLIGHT.inc()
+        db_stats, db_stats_token = sql_profiler.begin_update()
+        data["db_stats"] = db_stats
 
-        # Выполняем следующий обработчик в цепочке
-        result = await handler(event, data)
+        try:
+            # Выполняем следующий обработчик в цепочке
+            result = await handler(event, data)
+        except Exception as e:
+            UPDATE_ERRORS.inc(metric_event_type, type(e).__name__)
+            raise
+        finally:
+            UPDATES_IN_FLIGHT.dec()
+            # Засекаем время окончания и отдаем длительность в метрики
+            end_time = time.monotonic()
+            UPDATE_LATENCY.observe(end_time - start_time, metric_event_type)
+            UPDATES_TOTAL.inc(metric_event_type)
+            sql_profiler.end_update(db_stats_token, db_stats, metric_event_type)
 
-        # Засекаем время окончания и логируем длительность
-        end_time = time.monotonic()
-        duration = (end_time - start_time) * 1000 # в миллисекундах
-        logger.debug(f"{log_prefix} Processed {event_type} from {user_info} in {chat_info} in {duration:.2f} ms")
+        if log_line is not None:
+            duration = (end_time - start_time) * 1000 # в миллисекундах
+            logger.debug(
+                "{} Processed {} in {:.2f} ms (db: {} queries, {:.2f} ms)",
+                log_line[0], log_line[1], duration, db_stats.queries, db_stats.db_time * 1000
+            )
 
         return result
+
+    @staticmethod
+    def _sample_key(metric_event_type: str, data: Dict[str, Any]) -> str:
+        """Ключ сэмплирования: сообщения из групп выделяем в отдельный поток."""
+        chat = data.get('event_chat')
+        if metric_event_type in ("message", "edited_message") and chat and chat.type in _GROUP_CHAT_TYPES:
+            return "group_message"
+        return metric_event_type
+
+    @staticmethod
+    def _format_context(event: Update, data: Dict[str, Any]) -> tuple[str, str, str]:
+        """Собирает префикс строки лога, описание и подробности события."""
+        # Извлекаем пользователя и чат, если возможно
+        user = data.get('event_from_user')
+        chat = data.get('event_chat')
+        user_info = f"User[{user.id} @{user.username or ''}]" if user else "User[Unknown]"
+        chat_info = f"Chat[{chat.id} {chat.type}]" if chat else "Chat[Unknown]"
+        event_type, details = _describe_update(event)
+        return f"Update[{event.update_id}]", f"{event_type} from {user_info} in {chat_info}", details
@@ -0,0 +1,73 @@
+# src/middlewares/metrics_middleware.py
+import time
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+
+from src.services.metrics import (
+    HANDLER_LATENCY, HANDLER_ERRORS, API_CALLS_TOTAL, API_CALL_LATENCY
+)
+
+
+def get_handler_name(handler: Any) -> str:
+    """Возвращает имя функции-обработчика вида module.function."""
+    if isinstance(handler, HandlerObject):
+        callback = handler.callback
+        module = getattr(callback, "__module__", "") or ""
+        name = getattr(callback, "__qualname__", None) or getattr(callback, "__name__", repr(callback))
+        return f"{module.rsplit('.', 1)[-1]}.{name}" if module else name
+    return "unknown"
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: измеряет время работы конкретного обработчика.
+
+    Регистрируется как inner middleware на наблюдателях диспетчера
+    (message, callback_query и т.д.), поэтому в data уже есть выбранный handler.
+    """
+
+    def __init__(self, event_type: str):
+        self.event_type = event_type
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_name = get_handler_name(data.get("handler"))
+        start_time = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(self.event_type, handler_name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - start_time, self.event_type, handler_name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: считает исходящие вызовы Bot API и их длительность."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = method.__api_method__
+        start_time = time.perf_counter()
+        status = "ok"
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            API_CALL_LATENCY.observe(time.perf_counter() - start_time, api_method)
+            API_CALLS_TOTAL.inc(api_method, status)
@@ -0,0 +1,31 @@
+# src/middlewares/recorder_middleware.py
+import time
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+
+from src.services import update_recorder
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """Внешний middleware: пишет анонимную запись трассы на каждое обновление."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        recorder = update_recorder.update_recorder
+        if recorder is None or not isinstance(event, Update):
+            return await handler(event, data)
+        arrived_at = time.time()
+        start = time.perf_counter()
+        result = UNHANDLED
+        try:
+            result = await handler(event, data)
+            return result
+        finally:
+            recorder.record(event, arrived_at, time.perf_counter() - start, result is not UNHANDLED)
@@ -0,0 +1,63 @@
+# src/middlewares/tracing_middleware.py
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from aiogram.types.update import UpdateTypeLookupError
+
+from src.middlewares.metrics_middleware import get_handler_name
+from src.services.tracing import start_span
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Внешний middleware: открывает корневой span на каждое обновление."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        try:
+            event_type = event.event_type
+        except UpdateTypeLookupError:
+            event_type = "unknown"
+        chat = data.get('event_chat')
+        with start_span("update", root=True, update_id=event.update_id, event_type=event_type,
+                        chat_id=chat.id if chat else 0) as span:
+            result = await handler(event, data)
+            if span is not None:
+                span.set_attribute("handled", result is not UNHANDLED)
+            return result
+
+
+class HandlerTracingMiddleware(BaseMiddleware):
+    """Внутренний middleware: span на выбранный обработчик (отделяет его от работы диспетчера)."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        with start_span("handler", handler=get_handler_name(data.get("handler"))):
+            return await handler(event, data)
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: span на каждый вызов Bot API."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with start_span("telegram.api", method=method.__api_method__):
+            return await make_request(bot, method)
@@ -144,6 +144,22 @@ async def schedule_reminders_for_link(link: Link):
             logging.info(f"10-min reminder time for link id={link_id} is in the past, skipping scheduling.")
 
 
+async def schedule_reminders_for_links(links: list[Link]) -> None:
+    """Планирует напоминания для пачки опубликованных ссылок (например, после импорта)."""
+    for link in links:
+        await schedule_reminders_for_link(link)
+    logging.info(f"Scheduled reminders for a batch of {len(links)} links.")
+
+
+def cancel_reminders_for_link(link_id: int) -> None:
+    """Снимает запланированные напоминания ссылки (при выключении или удалении)."""
+    for suffix in ("30min", "10min"):
+        try:
+            scheduler.remove_job(f"reminder_link_{link_id}_{suffix}")
+        except JobLookupError:
+            pass
+
+
 async def load_scheduled_jobs():
     """Загружает и планирует напоминания для активных ссылок при старте бота."""
     logging.info("Loading scheduled jobs for PUBLISHED links...")
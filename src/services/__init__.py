@@ -1,8 +1,10 @@
 from .request_log_service import log_link_request
 from .stats_service import (
     log_group_message as log_group_message_stats,
+    log_group_message_edit,
     increment_interview_count,
     get_user_stats,
+    get_chat_user_stats,
     get_top_users_by_messages,
     get_top_users_by_interviews
 )
@@ -23,8 +25,10 @@ __all__ = [
     "get_pending_reminder_links",
     # --- Stats Service --- #
     "log_group_message_stats",
+    "log_group_message_edit",
     "increment_interview_count",
     "get_user_stats",
+    "get_chat_user_stats",
     "get_top_users_by_messages",
     "get_top_users_by_interviews",
     # Request Log Service
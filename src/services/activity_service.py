@@ -0,0 +1,122 @@
+# src/services/activity_service.py
+import asyncio
+import datetime
+import html
+import logging
+import multiprocessing
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import pytz
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.models import GroupMessage
+from src.services.database import get_session
+from src.utils.activity_math import compute_activity
+
+# --- Аналитика активности /activity ---
+# Метки времени сообщений за окно читаются из group_messages одним запросом
+# (по индексу (chat_id, timestamp)) сразу как Unix-время, упаковываются в
+# array('q') и считаются в отдельном процессе (ProcessPoolExecutor):
+# большая выборка не блокирует event loop. Готовый текст кэшируется на
+# (группа, пользователь, день) - повторные команды в течение дня бесплатны.
+
+ACTIVITY_TZ = pytz.timezone('Europe/Moscow') # Как у планировщика напоминаний
+WEEKDAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+SHADES = " ·░▒▓█"
+SPARKS = "▁▂▃▄▅▆▇█"
+CACHE_SIZE = 256
+
+CacheKey = Tuple[int, Optional[int], datetime.date]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_cache: "OrderedDict[CacheKey, str]" = OrderedDict()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        from src.config.config import settings
+        # spawn: fork процесса с event loop и потоками aiosqlite небезопасен
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.activity_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_activity_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _load_timestamps(chat_id: int, user_id: Optional[int], since: datetime.datetime) -> bytes:
+    """Unix-время сообщений группы (и пользователя) начиная с since, упакованное в array('q')."""
+    stmt = select(cast(func.strftime('%s', GroupMessage.timestamp), Integer)).where(
+        GroupMessage.chat_id == chat_id,
+        GroupMessage.timestamp >= since,
+    )
+    if user_id is not None:
+        stmt = stmt.where(GroupMessage.user_id == user_id)
+    async with get_session() as session:
+        result = await session.execute(stmt)
+        return array("q", result.scalars()).tobytes()
+
+
+def _render(result: Dict[str, Any], title: str, start: datetime.date) -> str:
+    """Текстовая тепловая карта и тренд (моноширинный блок)."""
+    heatmap = result["heatmap"]
+    peak = max(max(row) for row in heatmap)
+    lines = [f"<b>{html.escape(title)}</b>", f"Сообщений: {result['total']} с {start:%d.%m} (время московское)", "<pre>"]
+    lines.append("   " + "".join(f"{hour:<3}" for hour in range(0, 24, 3)))
+    for weekday, row in zip(WEEKDAYS, heatmap):
+        cells = "".join(SHADES[max(1, value * (len(SHADES) - 1) // peak)] if value else " " for value in row)
+        lines.append(f"{weekday} {cells}")
+    daily = result["daily"]
+    top = max(daily) or 1
+    lines.append("")
+    lines.append("По дням: " + "".join(SPARKS[value * (len(SPARKS) - 1) // top] for value in daily))
+    lines.append("</pre>")
+    average = result["total"] / len(daily)
+    lines.append(f"В среднем {average:.1f} в день, тренд {result['slope']:+.2f} в день за день.")
+    return "\n".join(lines)
+
+
+async def get_activity_report(chat_id: int, days: int, user_id: Optional[int] = None,
+                              title: str = "Активность") -> Optional[str]:
+    """Отчет об активности за последние days дней (None - сообщений нет или ошибка)."""
+    today = datetime.datetime.now(ACTIVITY_TZ).date()
+    key: CacheKey = (chat_id, user_id, today)
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        return cached
+
+    start = today - datetime.timedelta(days=days - 1)
+    # Начало окна в местном времени -> наивное UTC, как хранится в таблице
+    since = ACTIVITY_TZ.localize(datetime.datetime.combine(start, datetime.time())).astimezone(pytz.utc).replace(tzinfo=None)
+    utc_offset = int(datetime.datetime.now(ACTIVITY_TZ).utcoffset().total_seconds())
+    start_day = (datetime.datetime.combine(start, datetime.time()) - datetime.datetime(1970, 1, 1)).days
+    try:
+        timestamps = await _load_timestamps(chat_id, user_id, since)
+    except SQLAlchemyError as e:
+        logging.error(f"Database error loading activity for chat {chat_id}, user {user_id}: {e}")
+        return None
+    if not timestamps:
+        return None
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_get_executor(), compute_activity, timestamps, utc_offset, start_day, days)
+    report = _render(result, title, start)
+
+    # Отчеты прошлых дней больше не понадобятся
+    for stale in [stale for stale in _cache if stale[2] != today]:
+        del _cache[stale]
+    _cache[key] = report
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return report
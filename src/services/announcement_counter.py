@@ -0,0 +1,125 @@
+# src/services/announcement_counter.py
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from src.utils.keyboards import get_link_keyboard
+
+# --- Живой счетчик "уже N" на кнопке анонса ---
+# Каждое нажатие "Получить ссылку" сообщает сюда новое число запросивших, а
+# editMessageReplyMarkup выполняется не чаще раза в interval секунд на
+# сообщение: первое нажатие после паузы обновляет кнопку сразу, нажатия
+# внутри интервала схлопываются в одно отложенное редактирование с последним
+# значением. Так шквал нажатий не превращается в шквал редактирований.
+
+MessageKey = Tuple[int, int] # (chat_id, message_id)
+MAX_TRACKED_MESSAGES = 1000
+
+
+class AnnouncementCounter:
+    """Отложенное и схлопнутое обновление счетчика на кнопке анонса."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._latest: Dict[MessageKey, Tuple[int, int, Optional[str]]] = {} # Еще не показанное значение: (link_id, count, token)
+        self._shown: Dict[MessageKey, int] = {}
+        self._last_edit: Dict[MessageKey, float] = {}
+        self._tasks: Dict[MessageKey, asyncio.Task] = {}
+
+    def update(self, bot: Bot, chat_id: int, message_id: int, link_id: int, count: int,
+               token: Optional[str] = None) -> None:
+        """Запоминает новое значение счетчика; редактирование запланирует само.
+
+        token - токен ссылки из нажатой кнопки: кнопка с ним же остается на анонсе.
+        """
+        key = (chat_id, message_id)
+        # Нажатия могут сообщить счетчики не по порядку (10 после 11): меньшее или уже
+        # показанное значение не должно вернуть кнопку назад
+        if count <= self._shown.get(key, -1):
+            return
+        pending = self._latest.get(key)
+        if pending is not None and count <= pending[1]:
+            return
+        self._latest[key] = (link_id, count, token)
+        if key not in self._tasks:
+            self._schedule(bot, key)
+
+    def _schedule(self, bot: Bot, key: MessageKey) -> None:
+        delay = max(0.0, self._last_edit.get(key, float("-inf")) + self.interval - time.monotonic())
+        self._tasks[key] = asyncio.create_task(self._edit_later(bot, key, delay), name=f"announcement-counter-{key[1]}")
+
+    async def _edit_later(self, bot: Bot, key: MessageKey, delay: float) -> None:
+        cancelled = False
+        try:
+            await asyncio.sleep(delay)
+            link_id, count, token = self._latest.pop(key)
+            # Меньшее значение могло прийти, пока шло редактирование с большим
+            if count <= self._shown.get(key, -1):
+                return
+            self._last_edit[key] = time.monotonic()
+            try:
+                await bot.edit_message_reply_markup(
+                    chat_id=key[0], message_id=key[1], reply_markup=get_link_keyboard(link_id, count, token)
+                )
+                self._shown[key] = count
+            except TelegramRetryAfter as e:
+                # Вернем значение (если пока не пришло большее) и попробуем после паузы, которую попросил Telegram
+                pending = self._latest.get(key)
+                if pending is None or pending[1] < count:
+                    self._latest[key] = (link_id, count, token)
+                self._last_edit[key] = time.monotonic() + e.retry_after - self.interval
+                logging.warning(f"Flood control on announcement {key}, retrying in {e.retry_after} s")
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    self._shown[key] = count
+                else:
+                    logging.warning(f"Failed to update request counter on announcement {key}: {e}")
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            logging.exception(f"Unexpected error updating request counter on announcement {key}: {e}")
+        finally:
+            self._tasks.pop(key, None)
+            if key in self._latest and not cancelled:
+                # Нажатия во время редактирования - еще одно отложенное редактирование
+                self._schedule(bot, key)
+            self._prune()
+
+    def _prune(self) -> None:
+        """Забывает сообщения, которые давно не редактировались."""
+        if len(self._last_edit) <= MAX_TRACKED_MESSAGES:
+            return
+        cutoff = time.monotonic() - self.interval
+        for key in [key for key, edited in self._last_edit.items() if edited < cutoff and key not in self._tasks]:
+            self._last_edit.pop(key, None)
+            self._shown.pop(key, None)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        """Забывает анонс (ссылка выключена или анонс удален): отложенное редактирование отменяется."""
+        key = (chat_id, message_id)
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+        self._latest.pop(key, None)
+        self._shown.pop(key, None)
+        self._last_edit.pop(key, None)
+
+    async def stop(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+
+
+announcement_counter: Optional[AnnouncementCounter] = None
+
+
+def configure_announcement_counter(interval: float) -> AnnouncementCounter:
+    """Создает глобальный счетчик (включается настройкой LIVE_REQUEST_COUNTER_ENABLED)."""
+    global announcement_counter
+    announcement_counter = AnnouncementCounter(interval)
+    return announcement_counter
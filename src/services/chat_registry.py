@@ -0,0 +1,121 @@
+# src/services/chat_registry.py
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import dotenv_values
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.config.config import settings, parse_target_chats
+from src.db.models import TargetChat
+from src.services.database import get_session
+
+ENV_KEY = "ANNOUNCEMENT_TARGET_CHATS_JSON"
+
+
+class ChatRegistry:
+    """Реестр чатов для публикации анонсов с прямым и обратным индексом.
+
+    Источники: переменная ANNOUNCEMENT_TARGET_CHATS_JSON из .env (файл
+    перечитывается, когда меняется его mtime) и таблица target_chats.
+    Чаты из БД дополняют и переопределяют чаты из .env. Поиск имени
+    по id и id по имени - O(1).
+    """
+
+    def __init__(self, env_path: Path = Path(".env"), stat_interval: float = 2.0):
+        self.env_path = Path(env_path)
+        self.stat_interval = stat_interval
+        self._env_chats: Dict[str, int] = dict(settings.announcement_target_chats)
+        self._db_chats: Dict[str, int] = {}
+        self._env_mtime: Optional[float] = self._stat_mtime()
+        self._next_stat = 0.0
+        self._name_to_id: Dict[str, int] = {}
+        self._id_to_name: Dict[int, str] = {}
+        self._rebuild()
+
+    # --- Индексы --- #
+
+    def _rebuild(self) -> None:
+        merged = {**self._env_chats, **self._db_chats}
+        # Один id может встретиться под разными именами - в обратном индексе побеждает последнее
+        self._name_to_id = merged
+        self._id_to_name = {chat_id: name for name, chat_id in merged.items()}
+
+    def get_name(self, chat_id: int) -> Optional[str]:
+        self.maybe_reload()
+        return self._id_to_name.get(chat_id)
+
+    def get_id(self, name: str) -> Optional[int]:
+        self.maybe_reload()
+        return self._name_to_id.get(name)
+
+    def contains(self, chat_id: int) -> bool:
+        self.maybe_reload()
+        return chat_id in self._id_to_name
+
+    def items(self) -> List[Tuple[str, int]]:
+        """Пары (имя, id) в порядке объявления."""
+        self.maybe_reload()
+        return list(self._name_to_id.items())
+
+    def __len__(self) -> int:
+        return len(self._name_to_id)
+
+    # --- Перезагрузка из .env --- #
+
+    def _stat_mtime(self) -> Optional[float]:
+        try:
+            return self.env_path.stat().st_mtime
+        except OSError:
+            return None
+
+    def maybe_reload(self) -> None:
+        """Перечитывает .env, если файл изменился (stat не чаще раза в stat_interval)."""
+        now = time.monotonic()
+        if now < self._next_stat:
+            return
+        self._next_stat = now + self.stat_interval
+        mtime = self._stat_mtime()
+        if mtime is None or mtime == self._env_mtime:
+            return
+        self._env_mtime = mtime
+        self.reload_env()
+
+    def reload_env(self) -> None:
+        """Перечитывает список чатов из .env (переменная окружения процесса важнее файла)."""
+        raw = os.environ.get(ENV_KEY)
+        if raw is None:
+            raw = dotenv_values(self.env_path).get(ENV_KEY)
+        try:
+            chats = parse_target_chats(raw)
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error(f"Invalid {ENV_KEY} in {self.env_path}, keeping previous chats: {e}")
+            return
+        if chats != self._env_chats:
+            self._env_chats = chats
+            self._rebuild()
+            logging.info(f"Target chats reloaded from {self.env_path}: {len(self)} chats")
+
+    # --- Перезагрузка из БД --- #
+
+    async def refresh_from_db(self) -> None:
+        """Перечитывает активные чаты из таблицы target_chats."""
+        try:
+            async with get_session() as session:
+                result = await session.execute(
+                    select(TargetChat.name, TargetChat.chat_id).where(TargetChat.is_active == True)
+                )
+                chats = {name: chat_id for name, chat_id in result.all()}
+        except SQLAlchemyError as e:
+            logging.error(f"Database error loading target chats: {e}")
+            return
+        if chats != self._db_chats:
+            self._db_chats = chats
+            self._rebuild()
+            logging.info(f"Target chats reloaded from database: {len(self)} chats")
+
+
+chat_registry = ChatRegistry()
@@ -1,12 +1,16 @@
 # src/services/database.py
 import logging
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from typing import Any, AsyncGenerator
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
 # Импортируем Base для async_init_db
 from src.db.models import Base
+from src.services.tracing import instrument_engine, start_span
+from src.services import sql_profiler
+from src.utils import hyperloglog
 # Импортируем загрузчик конфигурации - БОЛЬШЕ НЕ НУЖЕН ДЛЯ URL
 # from src.config import load_config # Не нужен для URL, но может понадобиться для других настроек БД
 
@@ -16,10 +20,164 @@ from src.db.models import Base
 # --- Настройка SQLAlchemy ---
 # Используем фиксированный путь к SQLite базе данных
 DATABASE_URL = "sqlite+aiosqlite:///links_bot.db"
-engine = create_async_engine(DATABASE_URL, echo=False)
+
+
+def _register_sql_functions(dbapi_connection, connection_record) -> None:
+    """Функции для атомарного обновления HyperLogLog-скетчей в UPSERT."""
+    dbapi_connection.create_function("hll_get", 2, hyperloglog.sql_get_register, deterministic=True)
+    dbapi_connection.create_function("hll_set", 3, hyperloglog.sql_set_register, deterministic=True)
+
+
+def _create_engine(url: str, **engine_kwargs: Any) -> AsyncEngine:
+    new_engine = create_async_engine(url, echo=False, **engine_kwargs)
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", _register_sql_functions)
+    # Span на каждый SQL-запрос (обработчики ничего не делают, пока трассировка выключена)
+    instrument_engine(new_engine)
+    # Время каждого запроса, медленные запросы и счетчики запросов на обновление
+    sql_profiler.instrument_engine(new_engine)
+    return new_engine
+
+
+engine = _create_engine(DATABASE_URL)
 async_session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+
+async def configure_database(url: str, **engine_kwargs: Any) -> AsyncEngine:
+    """Переключает движок и фабрику сессий на другую базу (бенчмарки, временные БД).
+
+    Старый движок закрывается; get_session() сразу начинает работать с новой базой.
+    """
+    global engine, async_session_factory
+    old_engine = engine
+    engine = _create_engine(url, **engine_kwargs)
+    async_session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await old_engine.dispose()
+    logging.info(f"Database switched to {engine.url.render_as_string(hide_password=True)}")
+    return engine
+
 # --- Функции для инициализации и сессий ---
+def _dedupe_group_messages(sync_conn) -> None:
+    """Схлопывает повторные строки одного сообщения перед созданием уникального индекса.
+
+    Раньше каждая правка добавляла новую строку. Остается самая поздняя версия,
+    число лишних строк переносится в edit_count.
+    """
+    result = sync_conn.exec_driver_sql(
+        "UPDATE group_messages SET edit_count = ("
+        " SELECT COUNT(*) - 1 FROM group_messages AS g"
+        " WHERE g.chat_id = group_messages.chat_id AND g.message_id = group_messages.message_id)"
+        " WHERE id IN (SELECT MAX(id) FROM group_messages GROUP BY chat_id, message_id HAVING COUNT(*) > 1)"
+    )
+    if not result.rowcount:
+        return
+    deleted = sync_conn.exec_driver_sql(
+        "DELETE FROM group_messages WHERE id NOT IN (SELECT MAX(id) FROM group_messages GROUP BY chat_id, message_id)"
+    )
+    logging.info(f"Merged {deleted.rowcount} duplicate group_messages rows into {result.rowcount} messages")
+
+
+# Подготовка данных перед созданием индекса, который на старых данных может не создаться
+_BEFORE_INDEX = {
+    "uq_group_messages_chat_message": _dedupe_group_messages,
+}
+
+
+def _backfill_chat_user_stats(sync_conn) -> None:
+    """Заполняет статистику по группам из уже сохраненных сообщений."""
+    result = sync_conn.exec_driver_sql(
+        "INSERT INTO chat_user_stats (chat_id, user_id, username, message_count, first_seen, last_seen)"
+        " SELECT chat_id, user_id, MAX(username), COUNT(*), MIN(timestamp), MAX(timestamp)"
+        " FROM group_messages GROUP BY chat_id, user_id"
+    )
+    if result.rowcount:
+        logging.info(f"Backfilled chat_user_stats with {result.rowcount} rows from group_messages")
+
+
+def _backfill_unique_sketches(sync_conn) -> None:
+    from src.services.sketch_service import backfill_sketches
+    backfill_sketches(sync_conn)
+
+
+# Заполнение только что созданных таблиц данными из существующих
+_AFTER_CREATE = {
+    "chat_user_stats": _backfill_chat_user_stats,
+    "unique_sketches": _backfill_unique_sketches,
+}
+
+
+def _backfill_link_counters(sync_conn) -> None:
+    """Считает request_count и unique_requesters для существующих ссылок по таблице requests."""
+    sync_conn.exec_driver_sql(
+        "UPDATE links SET"
+        " request_count = (SELECT COUNT(*) FROM requests WHERE requests.link_id = links.id),"
+        " unique_requesters = (SELECT COUNT(DISTINCT user_id) FROM requests WHERE requests.link_id = links.id)"
+    )
+    logging.info("Backfilled links.request_count and links.unique_requesters")
+
+
+# Заполнение колонок, только что добавленных в существующую таблицу
+_AFTER_ADD_COLUMN = {
+    ("links", "unique_requesters"): _backfill_link_counters,
+}
+
+
+def _create_tables(sync_conn) -> None:
+    """create_all, догоняющее обновление старых таблиц и заполнение новых."""
+    existing_tables = set(inspect(sync_conn).get_table_names())
+    Base.metadata.create_all(sync_conn)
+    _upgrade_schema(sync_conn)
+    for table_name, backfill in _AFTER_CREATE.items():
+        if table_name not in existing_tables and "group_messages" in existing_tables:
+            backfill(sync_conn)
+
+
+def _upgrade_schema(sync_conn) -> None:
+    """Добавляет в существующие таблицы новые колонки и индексы моделей.
+
+    create_all не меняет уже созданные таблицы, а миграций в проекте нет.
+    Добавляются только nullable-колонки (или с серверным default), поэтому
+    ALTER TABLE ADD COLUMN безопасен и для SQLite.
+    """
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                logging.warning(f"Cannot add NOT NULL column {table.name}.{column.name} without a server default")
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            sync_conn.exec_driver_sql(ddl)
+            existing_columns.add(column.name)
+            logging.info(f"Added column {table.name}.{column.name}")
+            backfill = _AFTER_ADD_COLUMN.get((table.name, column.name))
+            if backfill is not None:
+                try:
+                    backfill(sync_conn)
+                except Exception as e:
+                    logging.error(f"Error backfilling {table.name}.{column.name}: {e}")
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            if any(column.name not in existing_columns for column in index.columns):
+                continue
+            try:
+                if index.name in _BEFORE_INDEX:
+                    _BEFORE_INDEX[index.name](sync_conn)
+                index.create(sync_conn)
+            except Exception as e:
+                logging.error(f"Error creating index {index.name}: {e}")
+
+
 async def async_init_db():
     """Инициализирует базу данных, создает таблицы, если их нет."""
     async with engine.begin() as conn:
@@ -28,25 +186,33 @@ async def async_init_db():
             # Обычно это делается в __init__.py пакета models или импортом всех сервисов/хендлеров,
             # которые в свою очередь импортируют модели.
             # В данном случае Base импортирован выше.
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_create_tables)
+            # Индекс полнотекстового поиска (виртуальная таблица FTS5, не входит в Base.metadata)
+            from src.config.config import settings
+            from src.services.search_service import create_search_table
+            await conn.run_sync(create_search_table, settings.search_tokenizer)
             logging.info("Database tables created or already exist.")
         except Exception as e:
             logging.error(f"Error creating database tables: {e}")
 
 @asynccontextmanager
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    """Контекстный менеджер для получения асинхронной сессии."""
-    async with async_session_factory() as session:
-        try:
-            yield session
-            await session.commit()
-        except SQLAlchemyError as e:
-            await session.rollback()
-            logging.error(f"Database session error: {e}. Rolled back transaction.")
-            raise
-        except Exception as e:
-            await session.rollback()
-            logging.error(f"An unexpected error occurred in DB session: {e}. Rolled back transaction.")
-            raise
-        # finally:
-            # await session.close() # async_sessionmaker handles closing
+    """Контекстный менеджер для получения асинхронной сессии.
+
+    Каждая сессия (транзакция) оборачивается в span "db.session" для трассировки.
+    """
+    with start_span("db.session"):
+        async with async_session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logging.error(f"Database session error: {e}. Rolled back transaction.")
+                raise
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"An unexpected error occurred in DB session: {e}. Rolled back transaction.")
+                raise
+            # finally:
+                # await session.close() # async_sessionmaker handles closing
@@ -0,0 +1,240 @@
+# src/services/fsm_storage.py
+import asyncio
+import datetime
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import and_, case, delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.models import FsmRecord
+from src.services.database import get_session
+
+# Значение-маркер: поле еще не читалось из БД
+_MISSING = object()
+
+
+class _Entry:
+    """Запись горячего кэша: то, что известно о ключе, и срок жизни."""
+    __slots__ = ("state", "data", "expires_at")
+
+    def __init__(self):
+        self.state: Any = _MISSING
+        self.data: Any = _MISSING
+        self.expires_at: Optional[datetime.datetime] = None
+
+
+def _utcnow() -> datetime.datetime:
+    # В БД храним наивное UTC-время, как и event_time_utc у ссылок
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class DatabaseStorage(BaseStorage):
+    """FSM-хранилище в базе данных проекта.
+
+    Чтения обслуживаются LRU-кэшем в памяти, промахи читаются из таблицы
+    fsm_states. Записи попадают в кэш и помечаются "грязными"; фоновая
+    задача раз в flush_interval секунд сбрасывает их в БД одной транзакцией.
+    У каждого ключа есть TTL: просроченные записи не читаются и
+    периодически удаляются из таблицы. Размер кэша ограничен cache_size,
+    поэтому память не растет с числом пользователей.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        cache_size: int = 10000,
+        flush_interval: float = 1.0,
+        purge_interval: float = 600.0,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.purge_interval = purge_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Ключ -> набор измененных полей ("state", "data")
+        self._dirty: Dict[str, Set[str]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    # --- Кэш --- #
+
+    def _entry(self, key: str) -> _Entry:
+        entry = self._cache.get(key)
+        if entry is None:
+            entry = self._cache[key] = _Entry()
+        else:
+            self._cache.move_to_end(key)
+        return entry
+
+    def _entry_for_write(self, key: str, field: str) -> _Entry:
+        """Запись кэша для изменения поля field; просроченная запись сначала очищается.
+
+        Иначе новое значение продлило бы срок и старому значению второго поля.
+        Второе поле тоже помечается измененным, чтобы затереть его в строке БД.
+        """
+        entry = self._entry(key)
+        if self._is_expired(entry):
+            entry.state, entry.data = None, {}
+            self._mark_dirty(key, "data" if field == "state" else "state")
+        return entry
+
+    def _evict(self) -> None:
+        """Выкидывает самые старые записи, которые уже сохранены в БД."""
+        if len(self._cache) <= self.cache_size:
+            return
+        for key in list(self._cache.keys()):
+            if len(self._cache) <= self.cache_size:
+                break
+            if key not in self._dirty:
+                del self._cache[key]
+
+    def _expires_at(self) -> Optional[datetime.datetime]:
+        return _utcnow() + datetime.timedelta(seconds=self.ttl) if self.ttl else None
+
+    def _is_expired(self, entry: _Entry) -> bool:
+        return entry.expires_at is not None and entry.expires_at <= _utcnow()
+
+    async def _load(self, key: str) -> _Entry:
+        """Возвращает запись кэша, при необходимости дочитывая ее из БД."""
+        entry = self._cache.get(key)
+        if entry is not None and self._is_expired(entry):
+            entry.state, entry.data, entry.expires_at = None, {}, None
+        if entry is not None and entry.state is not _MISSING and entry.data is not _MISSING:
+            self._cache.move_to_end(key)
+            return entry
+
+        record = None
+        try:
+            async with get_session() as session:
+                result = await session.execute(select(FsmRecord).where(FsmRecord.key == key))
+                record = result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logging.error(f"Database error loading FSM record {key}: {e}")
+
+        if record is not None and record.expires_at is not None and record.expires_at <= _utcnow():
+            record = None
+
+        entry = self._entry(key)
+        # Поля, измененные после последнего сброса, важнее сохраненных в БД
+        if entry.state is _MISSING:
+            entry.state = record.state if record else None
+        if entry.data is _MISSING:
+            entry.data = json.loads(record.data) if record and record.data else {}
+        if entry.expires_at is None and record is not None:
+            entry.expires_at = record.expires_at
+        self._evict()
+        return entry
+
+    def _mark_dirty(self, key: str, field: str) -> None:
+        self._dirty.setdefault(key, set()).add(field)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    # --- API BaseStorage --- #
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        entry = self._entry_for_write(storage_key, "state")
+        entry.state = state.state if isinstance(state, State) else state
+        entry.expires_at = self._expires_at()
+        self._mark_dirty(storage_key, "state")
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = await self._load(self.key_builder.build(key))
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        entry = self._entry_for_write(storage_key, "data")
+        entry.data = dict(data)
+        entry.expires_at = self._expires_at()
+        self._mark_dirty(storage_key, "data")
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = await self._load(self.key_builder.build(key))
+        return dict(entry.data)
+
+    async def close(self) -> None:
+        """Сбрасывает все несохраненные изменения (вызывается при остановке диспетчера)."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        logging.info("FSM storage flushed and closed.")
+
+    # --- Пакетная запись --- #
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Пишет все грязные ключи в БД одной транзакцией."""
+        async with self._flush_lock:
+            if not self._dirty:
+                await self._maybe_purge()
+                return
+            dirty, self._dirty = self._dirty, {}
+            try:
+                async with get_session() as session:
+                    for key, fields in dirty.items():
+                        entry = self._cache.get(key)
+                        if entry is None:
+                            continue
+                        # Пустое состояние и пустые данные - запись больше не нужна
+                        if entry.state is None and entry.data == {}:
+                            await session.execute(delete(FsmRecord).where(FsmRecord.key == key))
+                            continue
+                        values: Dict[str, Any] = {"key": key, "expires_at": entry.expires_at, "updated_at": _utcnow()}
+                        if "state" in fields:
+                            values["state"] = entry.state
+                        if "data" in fields:
+                            values["data"] = json.dumps(entry.data, ensure_ascii=False, default=str)
+                        stmt = sqlite_insert(FsmRecord).values(**values)
+                        set_ = {column: stmt.excluded[column] for column in values if column != "key"}
+                        # Поле, которое не менялось (и могло быть еще не прочитано), не должно
+                        # пережить просроченную строку вместе с новым сроком
+                        expired = and_(FsmRecord.expires_at.is_not(None), FsmRecord.expires_at <= values["updated_at"])
+                        for column in ("state", "data"):
+                            if column not in values:
+                                set_[column] = case((expired, None), else_=getattr(FsmRecord, column))
+                        stmt = stmt.on_conflict_do_update(index_elements=[FsmRecord.key], set_=set_)
+                        await session.execute(stmt)
+                logging.debug("Flushed %s FSM records", len(dirty))
+            except SQLAlchemyError as e:
+                logging.error(f"Database error flushing {len(dirty)} FSM records: {e}")
+                # Возвращаем ключи в очередь, чтобы не потерять изменения
+                self._requeue(dirty)
+            except asyncio.CancelledError:
+                self._requeue(dirty)
+                raise
+            self._evict()
+            await self._maybe_purge()
+
+    def _requeue(self, dirty: Dict[str, Set[str]]) -> None:
+        for key, fields in dirty.items():
+            self._dirty.setdefault(key, set()).update(fields)
+
+    async def _maybe_purge(self) -> None:
+        """Время от времени удаляет просроченные записи из таблицы."""
+        loop_time = asyncio.get_running_loop().time()
+        if loop_time - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = loop_time
+        try:
+            async with get_session() as session:
+                result = await session.execute(
+                    delete(FsmRecord).where(FsmRecord.expires_at != None, FsmRecord.expires_at <= _utcnow())
+                )
+            if result.rowcount:
+                logging.info(f"Purged {result.rowcount} expired FSM records")
+        except SQLAlchemyError as e:
+            logging.error(f"Database error purging expired FSM records: {e}")
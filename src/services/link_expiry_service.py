@@ -0,0 +1,119 @@
+# src/services/link_expiry_service.py
+import asyncio
+import datetime
+import logging
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.config.config import LINK_EXPIRY_ANNOUNCEMENT_ACTIONS
+from src.db.models import Link
+from src.services import announcement_counter
+from src.services.database import get_session
+from src.services.link_url_cache import link_url_cache
+from src.utils.messaging import call_with_flood_control
+
+# --- Выключение прошедших ссылок ---
+# Периодическая задача: ссылки, у которых event_time_utc + grace уже
+# прошло, получают is_active=False. UPDATE идет пачками по индексу
+# (is_active, event_time_utc) - каждая пачка короткая транзакция, между
+# пачками база свободна для обработчиков. Так запросы с фильтром is_active
+# (напоминания, /showlinks, выдача ссылки) не перебирают старые события.
+# Анонсы выключенных ссылок по настройке можно отредактировать (убрать
+# кнопку) или удалить - по одному запросу с паузой и ожиданием при flood
+# control. Живой счетчик на кнопке и карта URL для токенов о них тоже забывают.
+
+Announcement = Tuple[int, int, int] # (link_id, chat_id, message_id)
+
+
+async def deactivate_expired_links(grace: datetime.timedelta, batch_size: int = 500,
+                                   batch_pause: float = 0.05) -> List[Announcement]:
+    """Выключает ссылки, событие которых прошло больше grace назад.
+
+    Возвращает анонсы выключенных ссылок (у неопубликованных анонса нет).
+    """
+    # В таблице хранится наивное UTC-время
+    cutoff = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - grace
+    expired = (
+        select(Link.id)
+        .where(Link.is_active == True, Link.event_time_utc < cutoff)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Link)
+        .where(Link.id.in_(expired))
+        .values(is_active=False, updated_at=datetime.datetime.now(datetime.timezone.utc))
+        .returning(Link.id, Link.posted_chat_id, Link.posted_message_id)
+        .execution_options(synchronize_session=False)
+    )
+    announcements: List[Announcement] = []
+    total = 0
+    while True:
+        try:
+            async with get_session() as session:
+                rows = (await session.execute(stmt)).all()
+        except SQLAlchemyError as e:
+            logging.error(f"Link expiry: failed to deactivate a batch of links: {e}")
+            break
+        total += len(rows)
+        link_url_cache.discard(link_id for link_id, _, _ in rows)
+        announcements.extend(
+            (link_id, chat_id, message_id) for link_id, chat_id, message_id in rows
+            if chat_id is not None and message_id is not None
+        )
+        if len(rows) < batch_size:
+            break
+        await asyncio.sleep(batch_pause)
+    if total:
+        logging.info(f"Link expiry: deactivated {total} links with events before {cutoff:%Y-%m-%d %H:%M} UTC")
+    return announcements
+
+
+async def clean_up_announcements(bot: Bot, announcements: List[Announcement], action: str,
+                                 interval: float) -> int:
+    """Убирает кнопку с анонсов (edit) или удаляет их (delete). Возвращает число обработанных."""
+    if action not in LINK_EXPIRY_ANNOUNCEMENT_ACTIONS:
+        raise ValueError(f"Unknown announcement action {action!r}, expected one of {LINK_EXPIRY_ANNOUNCEMENT_ACTIONS}")
+    done = 0
+    for number, (link_id, chat_id, message_id) in enumerate(announcements):
+        if announcement_counter.announcement_counter is not None:
+            announcement_counter.announcement_counter.forget(chat_id, message_id)
+        if action == "none":
+            continue
+        if number:
+            await asyncio.sleep(interval)
+        try:
+            if action == "edit":
+                await call_with_flood_control(
+                    lambda: bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=None)
+                )
+            else:
+                await call_with_flood_control(lambda: bot.delete_message(chat_id=chat_id, message_id=message_id))
+            done += 1
+        except TelegramAPIError as e:
+            # Например, анонс уже удален или старше 48 часов (такие бот удалить не может)
+            logging.warning(f"Link expiry: failed to {action} announcement {message_id} of link {link_id} in chat {chat_id}: {e}")
+    return done
+
+
+async def run_link_expiry(bot: Optional[Bot] = None) -> None:
+    """Задача планировщика: выключение прошедших ссылок с параметрами из настроек."""
+    from src.config.config import settings
+
+    announcements = await deactivate_expired_links(
+        datetime.timedelta(minutes=settings.link_expiry_grace_minutes),
+        batch_size=settings.link_expiry_batch_size,
+    )
+    if not announcements:
+        return
+    if bot is None:
+        from src.bot import bot
+    done = await clean_up_announcements(
+        bot, announcements, settings.link_expiry_announcement_action, settings.link_expiry_edit_interval_seconds
+    )
+    if settings.link_expiry_announcement_action != "none":
+        logging.info(f"Link expiry: {settings.link_expiry_announcement_action} applied to {done} of {len(announcements)} announcements")
@@ -0,0 +1,240 @@
+# src/services/link_import_service.py
+import asyncio
+import csv
+import io
+import json
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from sqlalchemy import select
+
+from src.db.models import Link
+from src.services.chat_registry import chat_registry
+from src.services.database import get_session
+from src.services.link_service import add_links_bulk, mark_links_published
+from src.utils.constants import URL_REGEX
+from src.utils.date_parser import DateTimeParseError, parse_datetime_string
+from src.utils.keyboards import format_link_message_with_button
+from src.utils.messaging import call_with_flood_control
+
+# --- Импорт ссылок из документа (CSV/JSON) ---
+# Файл разбирается и проверяется целиком за один проход: ссылка, дата и
+# время (как в /addlink), чаты для анонса по имени из реестра или по id,
+# повторы внутри файла и с уже добавленными ссылками (запрос по индексу URL).
+# Все корректные строки добавляются одним INSERT в одной транзакции.
+# Анонсы затем отправляются по очереди с паузой (лимиты Telegram на
+# сообщения в группу), после чего ссылки одним UPDATE отмечаются
+# опубликованными и им пачкой планируются напоминания.
+
+MAX_IMPORT_ROWS = 1000
+CHAT_SEPARATORS = (";", "|")
+
+# Допустимые названия колонок
+FIELD_ALIASES = {
+    "url": ("url", "link", "link_url"),
+    "date": ("date",),
+    "time": ("time",),
+    "text": ("text", "announcement_text"),
+    "chats": ("chats", "chat", "target_chats"),
+}
+
+
+class ImportRow(NamedTuple):
+    line: int # Номер строки в файле (для CSV - с учетом заголовка), для JSON - номер элемента
+    link: Dict[str, Any] # Поля для add_links_bulk
+    chat_ids: Tuple[int, ...]
+
+
+class ImportReportRow(NamedTuple):
+    line: int
+    ok: bool
+    message: str
+
+
+class ImportParseError(ValueError):
+    """Файл импорта не удалось разобрать целиком (формат, кодировка, размер)."""
+    pass
+
+
+def _read_records(data: bytes, filename: str) -> List[Tuple[int, Dict[str, Any]]]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ImportParseError("Файл должен быть в кодировке UTF-8.")
+    if filename.lower().endswith(".json"):
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ImportParseError(f"Некорректный JSON: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get("links")
+        if not isinstance(payload, list) or not all(isinstance(item, dict) for item in payload):
+            raise ImportParseError('JSON должен быть списком объектов или {"links": [...]}.')
+        return [(number, item) for number, item in enumerate(payload, 1)]
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames:
+        raise ImportParseError("В CSV нет строки заголовка.")
+    return [(reader.line_num, record) for record in reader]
+
+
+def _field(record: Dict[str, Any], name: str) -> Any:
+    for alias in FIELD_ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ""):
+            return value.strip() if isinstance(value, str) else value
+    return None
+
+
+def _resolve_chats(value: Any) -> Tuple[int, ...]:
+    """Чаты строки: список (JSON) или строка через ; или | (CSV); имя из реестра или id."""
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        for separator in CHAT_SEPARATORS:
+            value = value.replace(separator, ",")
+        tokens = [token.strip() for token in value.split(",")]
+    elif isinstance(value, list):
+        tokens = [str(token).strip() for token in value]
+    else:
+        tokens = [str(value).strip()]
+    chat_ids = []
+    for token in filter(None, tokens):
+        chat_id = chat_registry.get_id(token)
+        if chat_id is None and token.lstrip("-").isdigit() and chat_registry.contains(int(token)):
+            chat_id = int(token)
+        if chat_id is None:
+            raise ValueError(f"неизвестный чат {token!r}")
+        if chat_id not in chat_ids:
+            chat_ids.append(chat_id)
+    return tuple(chat_ids)
+
+
+def _validate(line: int, record: Dict[str, Any]) -> ImportRow:
+    record = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    url = _field(record, "url")
+    if not isinstance(url, str) or not URL_REGEX.fullmatch(url):
+        raise ValueError("ссылка должна начинаться с http:// или https://")
+    date_str, time_str = _field(record, "date"), _field(record, "time")
+    if (date_str is None) != (time_str is None):
+        raise ValueError("дату и время нужно указать вместе или не указывать")
+    event_time_str = event_time_utc = None
+    if date_str is not None:
+        event_time_utc = parse_datetime_string(str(date_str), str(time_str)).replace(tzinfo=None)
+        event_time_str = f"{date_str} {time_str}"
+    text = _field(record, "text")
+    return ImportRow(
+        line=line,
+        link={
+            "link_url": url,
+            "announcement_text": str(text) if text is not None else "Анонс",
+            "event_time_str": event_time_str,
+            "event_time_utc": event_time_utc,
+        },
+        chat_ids=_resolve_chats(_field(record, "chats")),
+    )
+
+
+async def _existing_keys(urls: List[str]) -> set:
+    """(ссылка, время события) уже добавленных ссылок с этими URL (запрос на каждые 500 URL)."""
+    keys = set()
+    async with get_session() as session:
+        for offset in range(0, len(urls), 500): # Ограничение SQLite на число параметров
+            result = await session.execute(
+                select(Link.link_url, Link.event_time_utc).where(Link.link_url.in_(urls[offset:offset + 500]))
+            )
+            keys.update((url, event_time) for url, event_time in result)
+    return keys
+
+
+async def parse_import_file(data: bytes, filename: str) -> Tuple[List[ImportRow], List[ImportReportRow]]:
+    """Разбирает и проверяет файл. Возвращает корректные строки и ошибки по строкам."""
+    records = _read_records(data, filename)
+    if not records:
+        raise ImportParseError("В файле нет строк.")
+    if len(records) > MAX_IMPORT_ROWS:
+        raise ImportParseError(f"Слишком много строк: {len(records)} (не больше {MAX_IMPORT_ROWS}).")
+
+    rows: List[ImportRow] = []
+    errors: List[ImportReportRow] = []
+    seen = {}
+    for line, record in records:
+        try:
+            row = _validate(line, record)
+        except (ValueError, DateTimeParseError) as e:
+            errors.append(ImportReportRow(line, False, str(e)))
+            continue
+        key = (row.link["link_url"], row.link["event_time_utc"])
+        if key in seen:
+            errors.append(ImportReportRow(line, False, f"повтор строки {seen[key]}"))
+            continue
+        seen[key] = line
+        rows.append(row)
+
+    existing = await _existing_keys(sorted({row.link["link_url"] for row in rows})) if rows else set()
+    if existing:
+        errors.extend(
+            ImportReportRow(row.line, False, "такая ссылка с этим временем уже добавлена")
+            for row in rows if (row.link["link_url"], row.link["event_time_utc"]) in existing
+        )
+        rows = [row for row in rows if (row.link["link_url"], row.link["event_time_utc"]) not in existing]
+    return rows, errors
+
+
+async def import_links(user_id: int, rows: List[ImportRow]) -> List[int]:
+    """Добавляет проверенные строки одной транзакцией. Возвращает id ссылок по порядку строк."""
+    return await add_links_bulk(user_id, [row.link for row in rows])
+
+
+async def _send_announcement(bot: Bot, link: Link, chat_id: int) -> Optional[int]:
+    """Отправляет анонс (при flood control ждет и повторяет). Возвращает message_id."""
+    message_text, reply_markup = format_link_message_with_button(link)
+    try:
+        sent = await call_with_flood_control(lambda: bot.send_message(
+            chat_id=chat_id, text=message_text, reply_markup=reply_markup, disable_web_page_preview=True
+        ))
+        return sent.message_id
+    except TelegramAPIError as e:
+        logging.error(f"Failed to announce imported link {link.id} in chat {chat_id}: {e}")
+        return None
+
+
+async def publish_imported_links(bot: Bot, rows: List[ImportRow], link_ids: List[int],
+                                 send_interval: float) -> Tuple[int, List[ImportReportRow]]:
+    """Публикует анонсы импортированных ссылок, у которых указаны чаты.
+
+    Отмечает ссылки опубликованными одним UPDATE и пачкой планирует
+    напоминания. Возвращает число опубликованных ссылок и ошибки по строкам.
+    """
+    from src.scheduler import schedule_reminders_for_links
+
+    published: List[tuple] = []
+    errors: List[ImportReportRow] = []
+    links = []
+    first_send = True
+    for row, link_id in zip(rows, link_ids):
+        if not row.chat_ids:
+            continue
+        link = Link(id=link_id, **row.link)
+        posted = None
+        for chat_id in row.chat_ids:
+            if not first_send:
+                await asyncio.sleep(send_interval)
+            first_send = False
+            message_id = await _send_announcement(bot, link, chat_id)
+            if message_id is None:
+                errors.append(ImportReportRow(row.line, False, f"#{link_id}: не удалось отправить анонс в чат {chat_id}"))
+            elif posted is None:
+                # В ссылке хранится первый анонс, кнопки остальных ведут на ту же ссылку
+                posted = (link_id, chat_id, message_id)
+        if posted is not None:
+            published.append(posted)
+            link.pending, link.posted_chat_id, link.posted_message_id = False, posted[1], posted[2]
+            link.reminder_30_sent = link.reminder_10_sent = False
+            links.append(link)
+
+    if not await mark_links_published(published):
+        return 0, errors + [ImportReportRow(0, False, "анонсы отправлены, но статус ссылок не обновлен в БД")]
+    await schedule_reminders_for_links([link for link in links if link.event_time_utc is not None])
+    return len(published), errors
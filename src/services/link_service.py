@@ -1,17 +1,20 @@
 # src/services/link_service.py
 import logging
 import datetime
-from typing import Optional, List
+from typing import NamedTuple, Optional, List
 import pytz # Добавим pytz для get_pending_reminder_links
 
-from sqlalchemy import update, delete, select
+from sqlalchemy import String, and_, case, exists, insert, tuple_, type_coerce, update, delete, select
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Модели и сессия
-from src.db.models import Link, Request # Добавили импорт Request
+from src.db.models import Link, Request, UniqueSketch # Добавили импорт Request
 from src.services.database import get_session
 from src.services.stats_service import increment_interview_count # Импорт для статистики
+from src.services.sketch_service import LINK_REQUESTERS, track_link_requester
+from src.services.link_url_cache import link_url_cache
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +51,8 @@ async def add_link(user_id: int, username: Optional[str], first_name: Optional[s
             await session.flush()  # Получаем ID до коммита
             link_id = new_link.id
             await session.commit()
+            # SQLite может выдать id удаленной ссылки - старая запись карты URL не должна к ней относиться
+            link_url_cache.discard([link_id])
             logger.info(f"Создана ожидающая ссылка ID {link_id}: {link_url} от пользователя {user_id}")
             return new_link
         except IntegrityError as e:
@@ -231,32 +236,240 @@ async def mark_link_published(link_id: int, message_id: int, chat_id: int) -> bo
         logger.exception(f"Unexpected error marking link {link_id} as published: {e}")
         return False
 
+async def add_links_bulk(user_id: int, links: List[dict]) -> List[int]:
+    """Добавляет пачку ссылок в статусе 'pending' одним INSERT в одной транзакции.
+
+    links - словари с полями link_url, announcement_text, event_time_str,
+    event_time_utc. Возвращает id в порядке входного списка; при ошибке
+    не добавляется ни одна ссылка (исключение пробрасывается).
+    """
+    if not links:
+        return []
+    rows = [{**link, "added_by_user_id": user_id, "is_active": True, "pending": True} for link in links]
+    async with get_session() as session:
+        result = await session.execute(
+            insert(Link).returning(Link.id, sort_by_parameter_order=True), rows
+        )
+        link_ids = list(result.scalars())
+    link_url_cache.discard(link_ids)
+    logger.info(f"Bulk-added {len(link_ids)} pending links from user {user_id}")
+    return link_ids
+
+async def mark_links_published(published: List[tuple]) -> bool:
+    """Отмечает пачку ссылок опубликованными одним UPDATE по первичному ключу.
+
+    published - кортежи (link_id, chat_id, message_id).
+    """
+    if not published:
+        return True
+    now = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        async with get_session() as session:
+            await session.execute(update(Link), [
+                {"id": link_id, "pending": False, "posted_chat_id": chat_id, "posted_message_id": message_id,
+                 "updated_at": now}
+                for link_id, chat_id, message_id in published
+            ])
+        logger.info(f"Marked {len(published)} links as published")
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"Database error marking {len(published)} links as published: {e}")
+        return False
+
+# --- Просмотр и управление ссылками (/showlinks) --- #
+
+# Фильтры /showlinks. upcoming - по времени события, остальные - от новых к старым
+LINK_STATUSES = ("all", "pending", "published", "inactive", "upcoming")
+
+
+class LinkCursor(NamedTuple):
+    """Позиция в списке ссылок: (время события, id) для upcoming, иначе только id."""
+    event_time: Optional[datetime.datetime]
+    link_id: int
+
+
+class LinkPage(NamedTuple):
+    links: List[Link]
+    has_prev: bool
+    has_next: bool
+
+
+def _status_condition(status: str, now: datetime.datetime):
+    if status == "pending":
+        return Link.pending == True
+    if status == "published":
+        return and_(Link.is_active == True, Link.pending == False)
+    if status == "inactive":
+        return Link.is_active == False
+    if status == "upcoming":
+        return and_(Link.is_active == True, Link.event_time_utc > now)
+    return None
+
+
+def link_cursor(status: str, link: Link) -> LinkCursor:
+    return LinkCursor(link.event_time_utc if status == "upcoming" else None, link.id)
+
+
+async def get_links_page(status: str, page_size: int, cursor: Optional[LinkCursor] = None,
+                         backward: bool = False, inclusive: bool = False) -> LinkPage:
+    """Страница ссылок по ключу, без OFFSET: один индексный запрос на страницу.
+
+    cursor - граница страницы: вперед - последняя ссылка предыдущей страницы
+    (или первая ссылка текущей при inclusive=True), назад - первая ссылка
+    следующей. Запрашивается на одну строку больше, чтобы знать, есть ли
+    еще страницы в этом направлении.
+    """
+    if status not in LINK_STATUSES:
+        raise ValueError(f"Unknown link status {status!r}, expected one of {LINK_STATUSES}")
+    # В таблице хранится наивное UTC-время
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    if status == "upcoming":
+        # Ближайшие события первыми: вперед - к большим (event_time_utc, id)
+        key = tuple_(Link.event_time_utc, Link.id)
+        forward_order = [Link.event_time_utc.asc(), Link.id.asc()]
+        backward_order = [Link.event_time_utc.desc(), Link.id.desc()]
+        after = not backward
+    else:
+        # Новые ссылки первыми: вперед - к меньшим id
+        key = Link.id
+        forward_order = [Link.id.desc()]
+        backward_order = [Link.id.asc()]
+        after = backward
+
+    stmt = select(Link)
+    condition = _status_condition(status, now)
+    if condition is not None:
+        stmt = stmt.where(condition)
+    if cursor is not None:
+        value = tuple_(cursor.event_time, cursor.link_id) if status == "upcoming" else cursor.link_id
+        if after:
+            stmt = stmt.where(key >= value if inclusive else key > value)
+        else:
+            stmt = stmt.where(key <= value if inclusive else key < value)
+    stmt = stmt.order_by(*(backward_order if backward else forward_order)).limit(page_size + 1)
+
+    try:
+        async with get_session() as session:
+            links = list((await session.execute(stmt)).scalars())
+    except SQLAlchemyError as e:
+        logger.error(f"Database error listing {status} links: {e}")
+        return LinkPage([], False, False)
+
+    has_more = len(links) > page_size
+    links = links[:page_size]
+    if backward:
+        links.reverse()
+        return LinkPage(links, has_more, True)
+    return LinkPage(links, cursor is not None, has_more)
+
+
+async def set_links_active(link_ids: List[int], is_active: bool) -> int:
+    """Включает или выключает ссылки одним UPDATE. Возвращает число измененных ссылок."""
+    try:
+        async with get_session() as session:
+            result = await session.execute(
+                update(Link)
+                .where(Link.id.in_(link_ids), Link.is_active != is_active)
+                .values(is_active=is_active, updated_at=datetime.datetime.now(datetime.timezone.utc))
+                .execution_options(synchronize_session=False)
+            )
+        link_url_cache.discard(link_ids)
+        logger.info(f"Set is_active={is_active} for {result.rowcount} of links {link_ids}")
+        return result.rowcount
+    except SQLAlchemyError as e:
+        logger.error(f"Database error setting is_active={is_active} for links {link_ids}: {e}")
+        return 0
+
+
+async def delete_links(link_ids: List[int]) -> List[int]:
+    """Удаляет ссылки вместе с их журналом запросов и скетчами уникальных. Возвращает id удаленных."""
+    try:
+        async with get_session() as session:
+            # Сначала зависимые строки: requests.link_id ссылается на links.id
+            await session.execute(delete(Request).where(Request.link_id.in_(link_ids)))
+            await session.execute(delete(UniqueSketch).where(
+                UniqueSketch.kind == LINK_REQUESTERS, UniqueSketch.key.in_([str(link_id) for link_id in link_ids])
+            ))
+            result = await session.execute(delete(Link).where(Link.id.in_(link_ids)).returning(Link.id))
+            deleted = sorted(result.scalars())
+        link_url_cache.discard(deleted)
+        logger.info(f"Deleted links {deleted}")
+        return deleted
+    except SQLAlchemyError as e:
+        logger.error(f"Database error deleting links {link_ids}: {e}")
+        return []
+
 # --- Функции для работы с Request (логирование) --- #
 
-async def log_link_request(user_id: int, username: Optional[str], link_id: int) -> bool:
-    """Логирует запрос на получение ссылки в таблицу requests."""
-    new_request = Request(
-        user_id=user_id,
-        username=username,
-        link_id=link_id # Используем поле link_id, которое мы добавили в модель
-        # link_message_id остается None по умолчанию
+REQUESTED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class LinkRequestCounts(NamedTuple):
+    """Счетчики ссылки после записи запроса."""
+    request_count: int
+    unique_requesters: int
+
+
+async def record_link_request(session: AsyncSession, user_id: int, username: Optional[str],
+                              link_id: int,
+                              requested_at: Optional[datetime.datetime] = None) -> Optional[LinkRequestCounts]:
+    """Пишет запрос ссылки и обновляет ее счетчики в транзакции вызывающего.
+
+    Счетчики меняются одним UPDATE до вставки строки в requests: UPDATE
+    берет блокировку записи, поэтому проверка "запрашивал ли пользователь
+    раньше" и инкременты не гоняются с параллельными запросами.
+    requested_at - время нажатия для отложенной записи (наивное UTC, по умолчанию время записи).
+    Возвращает None, если ссылки нет или она выключена.
+    """
+    requested_before = exists().where(Request.link_id == link_id, Request.user_id == user_id)
+    result = await session.execute(
+        update(Link)
+        .where(Link.id == link_id, Link.is_active == True)
+        .values(
+            request_count=Link.request_count + 1,
+            unique_requesters=Link.unique_requesters + case((requested_before, 0), else_=1),
+        )
+        .returning(Link.request_count, Link.unique_requesters)
+        .execution_options(synchronize_session=False)
     )
+    row = result.first()
+    if row is None:
+        return None
+    request = Request(user_id=user_id, username=username, link_id=link_id)
+    if requested_at is not None:
+        # В формате CURRENT_TIMESTAMP (без микросекунд): выгрузка журнала сортирует и листает
+        # по строке requested_at, тип DateTime записал бы "... 04:00:00.000000"
+        request.requested_at = type_coerce(requested_at.strftime(REQUESTED_AT_FORMAT), String)
+    session.add(request)
+    # Уникальные запросившие ссылку (HyperLogLog) - в той же транзакции
+    await track_link_requester(session, link_id, user_id)
+    return LinkRequestCounts(*row)
+
+
+async def log_link_request(user_id: int, username: Optional[str], link_id: int) -> Optional[LinkRequestCounts]:
+    """Логирует запрос на получение ссылки в таблицу requests.
+
+    Возвращает счетчики ссылки после запроса или None (ссылки нет или ошибка БД).
+    """
     async with get_session() as session:
         try:
-            session.add(new_request)
+            counts = await record_link_request(session, user_id, username, link_id)
+            if counts is None:
+                logger.warning(f"User {user_id} requested non-existent or inactive link_id {link_id}, request not logged")
+                return None
             await session.commit()
-            logger.info(f"Logged link request: User {user_id} requested link_id {link_id}")
-            return True
+            logger.info(f"Logged link request: User {user_id} requested link_id {link_id} ({counts.request_count} total, {counts.unique_requesters} unique)")
+            return counts
         except IntegrityError as e:
             await session.rollback()
             # Может возникнуть, если link_id не существует (хотя проверка должна быть раньше)
             logger.error(f"Integrity error logging link request for user {user_id}, link_id {link_id}: {e}")
-            return False
+            return None
         except SQLAlchemyError as e:
             await session.rollback()
             logger.error(f"Database error logging link request for user {user_id}, link_id {link_id}: {e}")
-            return False
+            return None
         except Exception as e:
             await session.rollback()
             logger.exception(f"Unexpected error logging link request for user {user_id}, link_id {link_id}: {e}")
-            return False
+            return None
@@ -0,0 +1,126 @@
+# src/services/link_tokens.py
+import base64
+import binascii
+import datetime
+import hashlib
+import hmac
+import logging
+import re
+import struct
+import time
+import zlib
+from typing import NamedTuple, Optional
+
+from src.db.models import Link
+
+# --- Подписанные токены ссылок ---
+# Кнопка анонса (или deep link t.me/<бот>?start=<токен>) несет не голый
+# link_id, а компактный токен: id ссылки, срок действия, 16-битная метка
+# URL и усеченный HMAC-SHA256. Обработчик нажатия проверяет подпись и срок
+# без БД, поддельные и просроченные токены отбрасываются сразу, а URL берется
+# из карты в памяти (link_url_cache). Метка URL защищает от повторного
+# использования id: SQLite может выдать id удаленной ссылки новой ссылке.
+#
+# Формат: base64url без '=' от 20 байт (id, срок, метка - 10 байт, подпись
+# - 10 байт) = 27 символов; влезает и в callback data (64 байта), и в
+# параметр start (64 символа из [A-Za-z0-9_-]).
+
+PAYLOAD_FORMAT = ">IIH" # link_id, срок (unix-время UTC), метка URL
+PAYLOAD_SIZE = struct.calcsize(PAYLOAD_FORMAT)
+SIGNATURE_SIZE = 10
+TOKEN_LENGTH = 27
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_-]{%d}" % TOKEN_LENGTH)
+
+
+class LinkToken(NamedTuple):
+    link_id: int
+    expires_at: int # unix-время UTC
+    url_tag: int
+
+
+class LinkTokenError(ValueError):
+    """Токен не прошел проверку (испорчен, подделан или просрочен)."""
+    pass
+
+
+def url_tag(link_url: str) -> int:
+    """16-битная метка URL: токен ссылки с переиспользованным id не подходит к новой ссылке."""
+    return zlib.crc32(link_url.encode()) & 0xFFFF
+
+
+class LinkTokenSigner:
+    """Выпуск и проверка токенов ссылок одним секретом."""
+
+    def __init__(self, secret: bytes, mode: str, grace: datetime.timedelta, ttl: datetime.timedelta):
+        self._secret = secret
+        self.mode = mode # off | callback | deeplink - каким будет выпуск, проверка работает всегда
+        self.grace = grace
+        self.ttl = ttl
+        self.bot_username: Optional[str] = None # Для deeplink, известно после getMe
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+    def sign(self, link_id: int, expires_at: int, tag: int) -> str:
+        payload = struct.pack(PAYLOAD_FORMAT, link_id, expires_at, tag)
+        return base64.urlsafe_b64encode(payload + self._sign(payload)).rstrip(b"=").decode()
+
+    def verify(self, token: str, now: Optional[float] = None) -> LinkToken:
+        """Разбирает токен и проверяет подпись и срок. Бросает LinkTokenError."""
+        if not TOKEN_PATTERN.fullmatch(token):
+            raise LinkTokenError("malformed token")
+        try:
+            raw = base64.urlsafe_b64decode(token + "=")
+        except (binascii.Error, ValueError):
+            raise LinkTokenError("malformed token")
+        payload, signature = raw[:PAYLOAD_SIZE], raw[PAYLOAD_SIZE:]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            raise LinkTokenError("bad signature")
+        parsed = LinkToken(*struct.unpack(PAYLOAD_FORMAT, payload))
+        if parsed.expires_at < (time.time() if now is None else now):
+            raise LinkTokenError("token expired")
+        return parsed
+
+    def expires_at(self, link: Link) -> int:
+        """Срок токена: событие плюс LINK_EXPIRY_GRACE_MINUTES, без события - LINK_TOKEN_TTL_DAYS от выпуска."""
+        if link.event_time_utc is not None:
+            expires = link.event_time_utc.replace(tzinfo=datetime.timezone.utc) + self.grace
+        else:
+            expires = datetime.datetime.now(datetime.timezone.utc) + self.ttl
+        return int(expires.timestamp())
+
+    def issue(self, link: Link) -> Optional[str]:
+        """Токен для кнопки анонса или None, если токены выключены (кнопка со старым link_id)."""
+        if self.mode == "off" or (self.mode == "deeplink" and not self.bot_username):
+            return None
+        return self.sign(link.id, self.expires_at(link), url_tag(link.link_url))
+
+    def deep_link(self, token: str) -> Optional[str]:
+        """t.me-ссылка с токеном для режима deeplink (None в режиме callback)."""
+        if self.mode != "deeplink" or not self.bot_username:
+            return None
+        return f"https://t.me/{self.bot_username}?start={token}"
+
+
+link_token_signer: Optional[LinkTokenSigner] = None
+
+
+def configure_link_tokens(mode: str, secret: str, bot_token: str, grace: datetime.timedelta,
+                          ttl: datetime.timedelta) -> LinkTokenSigner:
+    """Создает глобальный подписчик; без LINK_TOKEN_SECRET ключ выводится из токена бота."""
+    global link_token_signer
+    if secret:
+        key = secret.encode()
+    else:
+        key = hmac.new(bot_token.encode(), b"link-tokens", hashlib.sha256).digest()
+    link_token_signer = LinkTokenSigner(key, mode, grace, ttl)
+    if mode != "off":
+        logging.info(f"Link tokens enabled in {mode} mode")
+    return link_token_signer
+
+
+def issue_link_token(link: Link) -> Optional[str]:
+    """Токен для кнопки анонса ссылки (None - токены не настроены или выключены)."""
+    if link_token_signer is None:
+        return None
+    return link_token_signer.issue(link)
@@ -0,0 +1,84 @@
+# src/services/link_url_cache.py
+import logging
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.models import Link
+from src.services.database import get_session
+
+# --- Карта id ссылки -> URL в памяти ---
+# Для нажатий по токенам (link_tokens): URL активных ссылок лежат в LRU,
+# при старте карта заполняется опубликованными активными ссылками, промах
+# читает одну ссылку из БД. Выключенные и удаленные ссылки тоже кэшируются
+# (как None), чтобы нажатия по старому анонсу не ходили в БД. Все изменения
+# ссылок в link_service и выключение по времени сбрасывают их записи.
+
+_MISSING = object()
+
+
+class LinkUrlCache:
+    """LRU-карта URL активных ссылок (None - ссылки нет или она выключена)."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._urls: "OrderedDict[int, Optional[str]]" = OrderedDict()
+        # Растет при каждом сбросе: значение из БД, прочитанное до сброса, в карту не попадет
+        self._generation = 0
+
+    def _store(self, link_id: int, url: Optional[str]) -> None:
+        self._urls[link_id] = url
+        self._urls.move_to_end(link_id)
+        while len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+
+    async def warm(self) -> int:
+        """Заполняет карту самыми новыми опубликованными активными ссылками."""
+        generation = self._generation
+        async with get_session() as session:
+            result = await session.execute(
+                select(Link.id, Link.link_url)
+                .where(Link.is_active == True, Link.pending == False)
+                .order_by(Link.id.desc())
+                .limit(self.max_size)
+            )
+            rows = result.all()
+        if generation != self._generation:
+            return 0
+        for link_id, url in reversed(rows):
+            self._urls.setdefault(link_id, url)
+        logging.info(f"Link URL cache warmed with {len(rows)} links")
+        return len(rows)
+
+    async def get_url(self, link_id: int) -> Optional[str]:
+        """URL активной ссылки из памяти; при промахе - одна выборка из БД."""
+        url = self._urls.get(link_id, _MISSING)
+        if url is not _MISSING:
+            self._urls.move_to_end(link_id)
+            return url
+        generation = self._generation
+        try:
+            async with get_session() as session:
+                url = (await session.execute(
+                    select(Link.link_url).where(Link.id == link_id, Link.is_active == True)
+                )).scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logging.error(f"Database error loading URL of link {link_id}: {e}")
+            return None
+        if generation == self._generation:
+            self._store(link_id, url)
+        return url
+
+    def discard(self, link_ids: Iterable[int]) -> None:
+        """Сбрасывает записи ссылок (изменены, выключены или удалены)."""
+        self._generation += 1
+        for link_id in link_ids:
+            self._urls.pop(link_id, None)
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+
+link_url_cache = LinkUrlCache()
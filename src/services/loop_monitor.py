@@ -0,0 +1,130 @@
+# src/services/loop_monitor.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from src.services.metrics import registry
+
+# --- Мониторинг задержки event loop ---
+# Корутина-"пульс" просыпается каждые interval секунд и измеряет, насколько
+# позже запланированного она проснулась - это и есть задержка цикла.
+# Отдельный поток-сторож следит за пульсом: если цикл не отвечает дольше
+# порога, значит прямо сейчас выполняется блокирующий вызов, и сторож
+# снимает стек потока event loop, чтобы было видно виновника.
+
+LOOP_LAG = registry.gauge(
+    "bot_event_loop_lag_seconds", "Event loop lag measured on the last monitor tick."
+)
+LOOP_LAG_HISTOGRAM = registry.histogram(
+    "bot_event_loop_lag_distribution_seconds", "Distribution of event loop lag.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_STALLS_TOTAL = registry.counter(
+    "bot_event_loop_stalls_total", "Times the event loop was blocked longer than the threshold."
+)
+
+
+class LoopMonitor:
+    """Измеряет задержку event loop и ловит блокирующие вызовы."""
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        # Время последнего пульса (time.monotonic), пишется из event loop, читается сторожем
+        self._heartbeat = 0.0
+        self._stall_reported_for = 0.0
+
+    def start(self) -> None:
+        """Запускает пульс в текущем event loop и поток-сторож."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        logging.info(
+            f"Event loop monitor started (interval={self.interval * 1000:.0f} ms, threshold={self.threshold * 1000:.0f} ms)"
+        )
+
+    async def stop(self) -> None:
+        """Останавливает пульс и сторожа."""
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._watchdog = None
+        logging.info("Event loop monitor stopped.")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            LOOP_LAG.set(lag)
+            LOOP_LAG_HISTOGRAM.observe(lag)
+            if lag >= self.threshold:
+                LOOP_STALLS_TOTAL.inc()
+                logging.warning(f"Event loop lag {lag * 1000:.1f} ms (threshold {self.threshold * 1000:.0f} ms)")
+
+    def _watch(self) -> None:
+        """Поток-сторож: снимает стек event loop, пока тот заблокирован."""
+        check_every = max(self.threshold / 2, 0.01)
+        while not self._stop_event.wait(check_every):
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat - self.interval
+            # Один сэмпл на одну остановку цикла
+            if stalled_for >= self.threshold and self._stall_reported_for != heartbeat:
+                self._stall_reported_for = heartbeat
+                self._report_stall(stalled_for)
+
+    def _report_stall(self, stalled_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        task_name = "unknown"
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = f"{task.get_name()} ({task.get_coro()!r})"
+        except RuntimeError:
+            pass
+        logging.warning(
+            f"Event loop blocked for {stalled_for * 1000:.0f}+ ms, current task: {task_name}\n"
+            f"Stack of the event loop thread:\n{stack}"
+        )
+
+
+loop_monitor: Optional[LoopMonitor] = None
+
+
+def start_loop_monitor(interval: float, threshold: float) -> LoopMonitor:
+    """Создает и запускает глобальный монитор event loop."""
+    global loop_monitor
+    if loop_monitor is None:
+        loop_monitor = LoopMonitor(interval=interval, threshold=threshold)
+    loop_monitor.start()
+    return loop_monitor
+
+
+async def stop_loop_monitor() -> None:
+    if loop_monitor is not None:
+        await loop_monitor.stop()
@@ -0,0 +1,261 @@
+# src/services/metrics.py
+import logging
+import math
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    # aiohttp.web импортируется ~0.3 с, поэтому грузим его только при запуске сервера
+    from aiohttp import web
+
+# --- Примитивы метрик в формате Prometheus --- #
+# Бот работает в одном event loop, поэтому блокировки не нужны:
+# все обновления метрик происходят из корутин одного потока.
+
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape_label_value(value: str) -> str:
+    """Экранирует значение метки по правилам текстового формата Prometheus."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """Собирает блок меток вида {a="1",b="2"}."""
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Форматирует число так, как его ожидает Prometheus."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Базовый класс метрики с набором меток."""
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(label) for label in labels)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик."""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Значение, которое может как расти, так и уменьшаться."""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами корзин (для p50/p95/p99 через histogram_quantile)."""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # Для каждого набора меток: (счетчики по корзинам, сумма, количество)
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # [корзина_0, ..., корзина_n, сумма, количество]
+            state = [0.0] * (len(self.buckets) + 2)
+            self._values[key] = state
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[index] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def count(self, *labels: str) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0.0
+
+    def samples(self) -> Iterable[str]:
+        for key, state in self._values.items():
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets):
+                cumulative += state[index]
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+            yield f"{self.name}_bucket{labels} {_format_value(state[-1])}"
+            plain_labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{plain_labels} {_format_value(state[-2])}"
+            yield f"{self.name}_count{plain_labels} {_format_value(state[-1])}"
+
+
+class MetricsRegistry:
+    """Реестр метрик, который умеет отдавать их в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+# --- Глобальный реестр и метрики бота --- #
+
+registry = MetricsRegistry()
+
+UPDATES_TOTAL = registry.counter(
+    "bot_updates_total", "Total number of processed updates.", ("event_type",)
+)
+UPDATE_LATENCY = registry.histogram(
+    "bot_update_duration_seconds", "Update processing time in the outer middleware.", ("event_type",)
+)
+UPDATES_IN_FLIGHT = registry.gauge(
+    "bot_updates_in_flight", "Number of updates currently being processed."
+)
+UPDATES_IN_FLIGHT.set(0)
+UPDATE_ERRORS = registry.counter(
+    "bot_update_errors_total", "Updates whose processing raised an exception.", ("event_type", "exception")
+)
+HANDLER_LATENCY = registry.histogram(
+    "bot_handler_duration_seconds", "Handler execution time.", ("event_type", "handler")
+)
+HANDLER_ERRORS = registry.counter(
+    "bot_handler_errors_total", "Exceptions raised by handlers.", ("event_type", "handler", "exception")
+)
+API_CALLS_TOTAL = registry.counter(
+    "bot_api_calls_total", "Outbound Telegram Bot API calls.", ("method", "status")
+)
+API_CALL_LATENCY = registry.histogram(
+    "bot_api_call_duration_seconds", "Outbound Telegram Bot API call latency.", ("method",)
+)
+
+
+# --- HTTP-эндпоинт /metrics --- #
+
+_runner: Optional["web.AppRunner"] = None
+
+
+async def _metrics_handler(request: "web.Request") -> "web.Response":
+    """Отдает все метрики в текстовом формате Prometheus."""
+    from aiohttp import web
+    return web.Response(
+        text=registry.render(),
+        content_type="text/plain",
+        headers={"X-Content-Type-Options": "nosniff"},
+        charset="utf-8",
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> None:
+    """Запускает небольшой aiohttp-сервер с эндпоинтом /metrics."""
+    global _runner
+    if _runner is not None:
+        logging.info("Metrics server already running.")
+        return
+    from aiohttp import web
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    _runner = runner
+    logging.info(f"Metrics server listening on http://{host}:{port}/metrics")
+
+
+async def stop_metrics_server() -> None:
+    """Останавливает сервер метрик, если он запущен."""
+    global _runner
+    if _runner is None:
+        return
+    try:
+        await _runner.cleanup()
+        logging.info("Metrics server stopped.")
+    except Exception as e:
+        logging.error(f"Error stopping metrics server: {e}")
+    finally:
+        _runner = None
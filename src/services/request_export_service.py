@@ -0,0 +1,121 @@
+# src/services/request_export_service.py
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import json
+import logging
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+from sqlalchemy import String, select, tuple_, type_coerce
+from sqlalchemy.engine import Row
+
+from src.db.models import Link, Request
+from src.services.database import get_session
+
+# --- Выгрузка журнала запросов ссылок (/showrequests) ---
+# Строки requests (с данными ссылки) читаются пачками по ключу
+# (requested_at, id): каждая следующая пачка начинается строго после
+# последней строки предыдущей, без OFFSET, и каждая читается в своей
+# короткой транзакции. Пачка сразу кодируется в CSV или JSONL (с gzip)
+# и дописывается в файл, поэтому память не зависит от размера журнала.
+#
+# requested_at сравнивается как строка в том виде, в каком ее хранит SQLite
+# (server_default CURRENT_TIMESTAMP пишет без микросекунд): параметр,
+# прошедший через DateTime, получил бы микросекунды и не совпал бы со
+# значением в таблице.
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_COLUMNS = ("id", "requested_at", "user_id", "username", "link_id", "link_url", "event_time_utc")
+
+_requested_at = type_coerce(Request.requested_at, String)
+
+
+class RequestExportFilter(NamedTuple):
+    link_id: Optional[int] = None
+    user_id: Optional[int] = None
+    start: Optional[datetime.date] = None # Включительно, UTC
+    end: Optional[datetime.date] = None # Включительно, UTC
+
+
+async def iter_request_batches(
+    filters: RequestExportFilter = RequestExportFilter(), batch_size: int = 1000
+) -> AsyncIterator[List[Row]]:
+    """Строки журнала запросов по возрастанию (requested_at, id), пачками по batch_size."""
+    stmt = (
+        select(
+            Request.id,
+            _requested_at.label("requested_at"),
+            Request.user_id,
+            Request.username,
+            Request.link_id,
+            Link.link_url,
+            type_coerce(Link.event_time_utc, String).label("event_time_utc"),
+        )
+        .outerjoin(Link, Link.id == Request.link_id)
+        .order_by(_requested_at, Request.id)
+        .limit(batch_size)
+    )
+    if filters.link_id is not None:
+        stmt = stmt.where(Request.link_id == filters.link_id)
+    if filters.user_id is not None:
+        stmt = stmt.where(Request.user_id == filters.user_id)
+    if filters.start is not None:
+        stmt = stmt.where(_requested_at >= filters.start.isoformat())
+    if filters.end is not None:
+        stmt = stmt.where(_requested_at < (filters.end + datetime.timedelta(days=1)).isoformat())
+
+    page = stmt
+    while True:
+        async with get_session() as session:
+            rows = (await session.execute(page)).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        # Сравнение пар (row value), а не OR: SQLite ищет по индексу с границы страницы
+        # (SEARCH ... requested_at>?), а не перечитывает индекс с начала на каждой странице
+        page = stmt.where(tuple_(_requested_at, Request.id) > tuple_(last.requested_at, last.id))
+
+
+def _open_output(path: str, fmt: str, compress: bool) -> io.TextIOBase:
+    if compress:
+        out = gzip.open(path, "wt", encoding="utf-8", newline="")
+    else:
+        out = open(path, "w", encoding="utf-8", newline="")
+    if fmt == "csv":
+        csv.writer(out).writerow(EXPORT_COLUMNS)
+    return out
+
+
+def _write_batch(out: io.TextIOBase, fmt: str, rows: List[Row]) -> None:
+    """Кодирует пачку и дописывает в файл. Вызывается в отдельном потоке."""
+    if fmt == "csv":
+        csv.writer(out).writerows(rows)
+    else:
+        out.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+async def export_requests(
+    path: str,
+    fmt: str = "csv",
+    compress: bool = False,
+    filters: RequestExportFilter = RequestExportFilter(),
+    batch_size: int = 1000,
+) -> int:
+    """Выгружает журнал запросов в файл path. Возвращает число строк."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {EXPORT_FORMATS}")
+    total = 0
+    out = await asyncio.to_thread(_open_output, path, fmt, compress)
+    try:
+        async for rows in iter_request_batches(filters, batch_size):
+            await asyncio.to_thread(_write_batch, out, fmt, rows)
+            total += len(rows)
+    finally:
+        await asyncio.to_thread(out.close)
+    logging.info(f"Exported {total} request log rows to {path} ({fmt}{', gzip' if compress else ''})")
+    return total
@@ -5,22 +5,20 @@ from typing import Optional, List
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 
-# Модели и сессия
-from src.db.models import Request
+# Сессия и общая запись запроса (счетчики ссылки, скетч уникальных)
 from src.services.database import get_session
+from src.services.link_service import record_link_request
 
 # --- Функции для работы с запросами --- #
 
 async def log_link_request(user_id: int, username: Optional[str], link_id: int) -> bool:
-    """Логирует запрос пользователя на получение ссылки."""
+    """Логирует запрос пользователя на получение ссылки (и обновляет счетчики ссылки)."""
     try:
         async with get_session() as session:
-            new_request = Request(
-                user_id=user_id,
-                username=username,
-                link_id=link_id # Связываем с конкретной ссылкой
-            )
-            session.add(new_request)
+            counts = await record_link_request(session, user_id, username, link_id)
+        if counts is None:
+            logging.warning(f"Link request for non-existent or inactive link_id {link_id} from user {user_id} not logged")
+            return False
         logging.info(f"Logged link request for user {user_id} ({username}) for link_id {link_id}")
         return True
     except SQLAlchemyError as e:
@@ -0,0 +1,136 @@
+# src/services/request_log_writer.py
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from aiogram import Bot
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.services import announcement_counter
+from src.services.database import get_session
+from src.services.link_service import LinkRequestCounts, record_link_request
+from src.services.stats_service import add_interview_counts
+
+# --- Отложенная запись журнала запросов ---
+# Нажатия по токенам (link_tokens) не ждут БД: обработчик кладет запрос в
+# буфер, а фоновая задача пишет пачку одной транзакцией - раз в
+# REQUEST_LOG_FLUSH_INTERVAL_SECONDS или сразу, когда набралось
+# REQUEST_LOG_BATCH_SIZE. Время запроса - время нажатия, а не записи.
+# После записи счетчики пачки передаются живому счетчику на анонсах.
+# При ошибке БД пачка остается в буфере и пишется следующим проходом.
+
+MAX_BUFFERED_REQUESTS = 50000
+
+
+class PendingRequest(NamedTuple):
+    user_id: int
+    username: Optional[str]
+    link_id: int
+    requested_at: datetime.datetime # Наивное UTC (пишется в формате CURRENT_TIMESTAMP)
+    chat_id: Optional[int] = None   # Анонс, на котором нажали кнопку (для живого счетчика)
+    message_id: Optional[int] = None
+    token: Optional[str] = None
+
+
+class RequestLogWriter:
+    """Буфер запросов ссылок с записью пачками в фоне."""
+
+    def __init__(self, flush_interval: float, batch_size: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer: List[PendingRequest] = []
+        self._dropped = 0
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+
+    def submit(self, request: PendingRequest) -> None:
+        if len(self._buffer) >= MAX_BUFFERED_REQUESTS:
+            self._dropped += 1
+            return
+        self._buffer.append(request)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _write(self, batch: List[PendingRequest]) -> Dict[Tuple[int, int], Tuple[PendingRequest, LinkRequestCounts]]:
+        """Пишет пачку одной транзакцией. Возвращает последние счетчики по анонсам."""
+        announcements = {}
+        interviews: Dict[int, Tuple[Optional[str], int]] = {}
+        async with get_session() as session:
+            for request in batch:
+                counts = await record_link_request(
+                    session, request.user_id, request.username, request.link_id, requested_at=request.requested_at
+                )
+                if counts is None:
+                    # Ссылку выключили или удалили, пока запрос ждал в буфере - не засчитываем
+                    continue
+                username, count = interviews.get(request.user_id, (None, 0))
+                interviews[request.user_id] = (request.username or username, count + 1)
+                if request.chat_id is not None and request.message_id is not None:
+                    announcements[(request.chat_id, request.message_id)] = (request, counts)
+            await add_interview_counts(session, interviews)
+        return announcements
+
+    async def flush(self) -> int:
+        """Записывает накопленные запросы. Возвращает число записанных."""
+        async with self._lock:
+            written = 0
+            while self._buffer:
+                # Пачка уходит из буфера только после коммита: при ошибке или отмене
+                # задачи на остановке она будет записана следующим проходом
+                batch = self._buffer[:self.batch_size]
+                try:
+                    announcements = await self._write(batch)
+                except SQLAlchemyError as e:
+                    logging.error(f"Failed to write {len(batch)} buffered link requests, will retry: {e}")
+                    break
+                except Exception as e:
+                    # Не ошибка БД - повтор не поможет, пачка иначе застрянет в начале буфера
+                    logging.exception(f"Unexpected error writing {len(batch)} buffered link requests, dropped: {e}")
+                    del self._buffer[:len(batch)]
+                    continue
+                del self._buffer[:len(batch)]
+                written += len(batch)
+                counter = announcement_counter.announcement_counter
+                if counter is not None and self._bot is not None:
+                    for (chat_id, message_id), (request, counts) in announcements.items():
+                        counter.update(self._bot, chat_id, message_id, request.link_id,
+                                       counts.unique_requesters, token=request.token)
+            if written:
+                logging.info(f"Wrote {written} buffered link requests")
+            if self._dropped:
+                logging.warning(f"Request log buffer overflow, dropped {self._dropped} link requests")
+                self._dropped = 0
+            return written
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self, bot: Optional[Bot] = None) -> None:
+        self._bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop(), name="request-log-writer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+request_log_writer: Optional[RequestLogWriter] = None
+
+
+def configure_request_log_writer(flush_interval: float, batch_size: int) -> RequestLogWriter:
+    """Создает глобальный буфер журнала запросов (для нажатий по токенам ссылок)."""
+    global request_log_writer
+    request_log_writer = RequestLogWriter(flush_interval, batch_size)
+    return request_log_writer
@@ -0,0 +1,240 @@
+# src/services/retention_service.py
+import asyncio
+import datetime
+import gzip
+import io
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.models import GroupMessage
+from src.services.database import get_session
+from src.services.metrics import registry
+from src.services.search_service import unindex_messages
+from src.utils.text_codec import decompress_text
+
+try:
+    import zstandard
+except ImportError: # zstandard - необязательная зависимость, без нее архив пишется в gzip
+    zstandard = None
+
+# --- Ретеншн group_messages ---
+# Задача планировщика переносит сообщения старше retention_days в холодный
+# архив и удаляет их из таблицы. Архив разбит по дням (дата сообщения в UTC):
+#   <archive_dir>/2025/04/group_messages-2025-04-29.jsonl.zst  (или .jsonl.gz)
+# Одна строка JSONL - одна запись таблицы со всеми колонками.
+# Строки переносятся пачками: чтение пачки, дозапись в файлы архива (в
+# отдельном потоке), удаление пачки короткой транзакцией и пауза, чтобы
+# обработчики сообщений успевали писать между пачками.
+# Сначала архив, потом удаление: если процесс упадет между ними, пачка
+# попадет в архив повторно, поэтому читатель отбрасывает повторы по id.
+
+ARCHIVED_ROWS_TOTAL = registry.counter(
+    "bot_retention_archived_rows_total", "group_messages rows moved to the cold archive."
+)
+
+ARCHIVE_PREFIX = "group_messages-"
+
+
+class _Codec:
+    """Сжатие файлов архива. Каждая дозапись - отдельный кадр/member, склейка читается как один поток."""
+    suffix = ""
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def open_text(self, path: Path) -> io.TextIOBase:
+        raise NotImplementedError
+
+
+class _ZstdCodec(_Codec):
+    suffix = ".jsonl.zst"
+
+    def __init__(self, level: int = 10):
+        self._compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def open_text(self, path: Path) -> io.TextIOBase:
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+
+
+class _GzipCodec(_Codec):
+    suffix = ".jsonl.gz"
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=9)
+
+    def open_text(self, path: Path) -> io.TextIOBase:
+        return gzip.open(path, "rt", encoding="utf-8")
+
+
+def _default_codec() -> _Codec:
+    return _ZstdCodec() if zstandard is not None else _GzipCodec()
+
+
+def _codec_for(path: Path) -> Optional[_Codec]:
+    if path.name.endswith(_ZstdCodec.suffix):
+        if zstandard is None:
+            logging.error(f"Archive {path} is zstd-compressed, but the zstandard package is not installed")
+            return None
+        return _ZstdCodec()
+    if path.name.endswith(_GzipCodec.suffix):
+        return _GzipCodec()
+    return None
+
+
+def _partition_path(archive_dir: Path, day: datetime.date, codec: _Codec) -> Path:
+    return archive_dir / f"{day:%Y}" / f"{day:%m}" / f"{ARCHIVE_PREFIX}{day.isoformat()}{codec.suffix}"
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _archive_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка для архива: сжатый текст распаковывается в message_text, байты в JSON не пишем."""
+    blob = row.pop("text_compressed", None)
+    if blob is not None and row.get("message_text") is None:
+        row["message_text"] = decompress_text(blob)
+    return {k: _json_value(v) for k, v in row.items()}
+
+
+def _write_partitions(archive_dir: Path, codec: _Codec, rows: List[Dict[str, Any]]) -> int:
+    """Дописывает строки в файлы архива по дням. Вызывается в отдельном потоке."""
+    by_day: Dict[datetime.date, List[str]] = defaultdict(list)
+    for row in rows:
+        day = row["timestamp"].date() if row.get("timestamp") else datetime.date(1970, 1, 1)
+        by_day[day].append(json.dumps(_archive_row(row), ensure_ascii=False) + "\n")
+    for day, lines in by_day.items():
+        path = _partition_path(archive_dir, day, codec)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as f:
+            f.write(codec.compress("".join(lines).encode("utf-8")))
+    return len(by_day)
+
+
+async def archive_old_messages(
+    archive_dir: Path,
+    retention_days: int,
+    batch_size: int = 2000,
+    batch_pause: float = 0.05,
+    max_batches: Optional[int] = None,
+    search_enabled: bool = False,
+) -> int:
+    """Переносит сообщения старше retention_days в архив. Возвращает число перенесенных строк."""
+    archive_dir = Path(archive_dir)
+    codec = _default_codec()
+    # В таблице хранится наивное UTC-время
+    cutoff = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(days=retention_days)
+    table = GroupMessage.__table__
+    total = 0
+    batches = 0
+
+    logging.info(f"Retention: archiving group_messages older than {cutoff:%Y-%m-%d %H:%M} UTC to {archive_dir}")
+    while max_batches is None or batches < max_batches:
+        try:
+            async with get_session() as session:
+                result = await session.execute(
+                    select(table).where(table.c.timestamp < cutoff).order_by(table.c.timestamp).limit(batch_size)
+                )
+                rows = [dict(row) for row in result.mappings()]
+        except SQLAlchemyError as e:
+            logging.error(f"Retention: failed to read a batch of old messages: {e}")
+            break
+        if not rows:
+            break
+
+        try:
+            await asyncio.to_thread(_write_partitions, archive_dir, codec, rows)
+        except OSError as e:
+            # Без архива не удаляем: строки останутся в таблице до следующего запуска
+            logging.error(f"Retention: failed to write archive, nothing deleted: {e}")
+            break
+
+        ids = [row["id"] for row in rows]
+        try:
+            async with get_session() as session:
+                if search_enabled:
+                    # _write_partitions уже распаковал текст в message_text - по нему строка убирается из индекса /search
+                    await unindex_messages(session, [(row["id"], row.get("message_text")) for row in rows])
+                await session.execute(delete(GroupMessage).where(GroupMessage.id.in_(ids)))
+        except SQLAlchemyError as e:
+            logging.error(f"Retention: archived {len(ids)} rows but failed to delete them: {e}")
+            break
+
+        total += len(ids)
+        batches += 1
+        ARCHIVED_ROWS_TOTAL.inc(amount=len(ids))
+        if len(rows) < batch_size:
+            break
+        # Отдаем базу обработчикам между пачками
+        await asyncio.sleep(batch_pause)
+
+    logging.info(f"Retention: archived {total} group_messages rows in {batches} batches")
+    return total
+
+
+def iter_archived_messages(
+    archive_dir: Path,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    chat_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Читает архив сообщений за дни [start, end] по порядку, с фильтром по чату и пользователю.
+
+    Файлы вне диапазона дат не открываются. Поле timestamp возвращается строкой ISO 8601.
+    """
+    archive_dir = Path(archive_dir)
+    partitions = []
+    for path in archive_dir.glob(f"*/*/{ARCHIVE_PREFIX}*"):
+        day_str = path.name[len(ARCHIVE_PREFIX):len(ARCHIVE_PREFIX) + 10]
+        try:
+            day = datetime.date.fromisoformat(day_str)
+        except ValueError:
+            continue
+        if (start and day < start) or (end and day > end):
+            continue
+        partitions.append((day, path))
+
+    for day, path in sorted(partitions):
+        codec = _codec_for(path)
+        if codec is None:
+            continue
+        seen_ids = set()
+        with codec.open_text(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row["id"] in seen_ids:
+                    continue
+                seen_ids.add(row["id"])
+                if chat_id is not None and row.get("chat_id") != chat_id:
+                    continue
+                if user_id is not None and row.get("user_id") != user_id:
+                    continue
+                yield row
+
+
+async def run_retention() -> None:
+    """Задача планировщика: ретеншн с параметрами из настроек."""
+    from src.config.config import settings
+
+    await archive_old_messages(
+        Path(settings.retention_archive_dir),
+        settings.retention_days,
+        batch_size=settings.retention_batch_size,
+        batch_pause=settings.retention_batch_pause_ms / 1000,
+        search_enabled=settings.search_enabled,
+    )
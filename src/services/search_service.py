@@ -0,0 +1,174 @@
+# src/services/search_service.py
+import logging
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import GroupMessage
+from src.services.database import get_session
+
+# --- Полнотекстовый поиск по сообщениям группы ---
+# Индекс - contentless-таблица FTS5 (content=''): хранит только термы, а
+# rowid совпадает с group_messages.id. Второй несжатой копии текста нет,
+# за текстом для выдачи идем в group_messages (GroupMessage.text).
+# Индекс пополняется в той же транзакции, что и запись сообщения. Удалить
+# строку из contentless-таблицы можно только передав ее прежний текст
+# (команда 'delete'), поэтому правки и ретеншн сначала читают старый текст.
+# Сообщения без текста (режимы counters/metadata/hashed) не индексируются.
+
+SEARCH_TABLE = "group_messages_fts"
+
+# SEARCH_TOKENIZER -> параметр tokenize FTS5. unicode61 понимает кириллицу и
+# регистр, ищет по словам и префиксам; trigram ищет по любой подстроке от 3 символов.
+TOKENIZERS = {
+    "unicode61": "unicode61 remove_diacritics 2",
+    "trigram": "trigram",
+}
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def create_search_table(sync_conn, tokenizer: str = "unicode61") -> bool:
+    """Создает таблицу индекса; при смене токенизатора пересоздает ее пустой.
+
+    Возвращает True, если таблица создана заново (индекс нужно заполнить).
+    """
+    tokenize = TOKENIZERS[tokenizer]
+    row = sync_conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+    ).first()
+    if row is not None:
+        if f"tokenize='{tokenize}'" in row[0]:
+            return False
+        logging.warning(f"Search tokenizer changed to {tokenizer}, recreating {SEARCH_TABLE}")
+        sync_conn.exec_driver_sql(f"DROP TABLE {SEARCH_TABLE}")
+    sync_conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(text, content='', tokenize='{tokenize}')"
+    )
+    logging.info(f"Created search index {SEARCH_TABLE} (tokenizer: {tokenizer})")
+    return True
+
+
+def build_match_query(raw: str, tokenizer: str = "unicode61") -> Optional[str]:
+    """Превращает ввод пользователя в безопасный запрос MATCH (все слова должны встретиться).
+
+    Синтаксис FTS5 (кавычки, NEAR, OR, *) из ввода не пропускаем - только слова.
+    Для unicode61 каждое слово ищется как префикс ("компан" найдет "компании").
+    """
+    terms = _TERM_RE.findall(raw)
+    if tokenizer == "trigram":
+        # Триграммный индекс не находит подстроки короче 3 символов
+        terms = [term for term in terms if len(term) >= 3]
+        return " ".join(f'"{term}"' for term in terms) or None
+    return " ".join(f'"{term}"*' for term in terms) or None
+
+
+async def index_messages(session: AsyncSession, rows: Iterable[Tuple[int, Optional[str]]]) -> None:
+    """Добавляет сообщения (id, текст) в индекс в транзакции вызывающего."""
+    params = [{"rowid": row_id, "text": message_text} for row_id, message_text in rows if message_text]
+    if not params:
+        return
+    await session.execute(text(f"INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (:rowid, :text)"), params)
+
+
+async def unindex_messages(session: AsyncSession, rows: Iterable[Tuple[int, Optional[str]]]) -> None:
+    """Убирает сообщения из индекса. Нужен текст, с которым сообщение индексировалось."""
+    params = [{"rowid": row_id, "text": message_text} for row_id, message_text in rows if message_text]
+    if not params:
+        return
+    await session.execute(
+        text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text) VALUES ('delete', :rowid, :text)"),
+        params,
+    )
+
+
+async def search_messages(
+    query: str,
+    page: int = 0,
+    page_size: int = 5,
+    chat_id: Optional[int] = None,
+    tokenizer: str = "unicode61"
+) -> Tuple[List[GroupMessage], bool]:
+    """Ищет сообщения по релевантности (bm25). Возвращает страницу и признак следующей страницы."""
+    match = build_match_query(query, tokenizer)
+    if match is None:
+        return [], False
+    # JOIN отсекает строки, которые уже удалены из group_messages
+    sql = (
+        f"SELECT f.rowid FROM {SEARCH_TABLE} AS f JOIN group_messages AS g ON g.id = f.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH :match"
+    )
+    params = {"match": match, "limit": page_size + 1, "offset": page * page_size}
+    if chat_id is not None:
+        sql += " AND g.chat_id = :chat_id"
+        params["chat_id"] = chat_id
+    sql += " ORDER BY f.rank LIMIT :limit OFFSET :offset"
+    try:
+        async with get_session() as session:
+            ids = [row[0] for row in await session.execute(text(sql), params)]
+            has_next = len(ids) > page_size
+            ids = ids[:page_size]
+            if not ids:
+                return [], False
+            result = await session.execute(select(GroupMessage).where(GroupMessage.id.in_(ids)))
+            by_id = {message.id: message for message in result.scalars()}
+            return [by_id[row_id] for row_id in ids if row_id in by_id], has_next
+    except SQLAlchemyError as e:
+        logging.error(f"Database error searching group messages for {query!r}: {e}")
+        return [], False
+
+
+async def search_index_is_empty() -> bool:
+    """True, если индекс пуст, а сообщения с текстом в базе есть."""
+    async with get_session() as session:
+        indexed = await session.execute(text(f"SELECT 1 FROM {SEARCH_TABLE}_docsize LIMIT 1"))
+        if indexed.first() is not None:
+            return False
+        has_text = await session.execute(
+            select(GroupMessage.id).where(
+                (GroupMessage.message_text.is_not(None)) | (GroupMessage.text_compressed.is_not(None))
+            ).limit(1)
+        )
+        return has_text.first() is not None
+
+
+async def reindex_search(batch_size: int = 2000) -> int:
+    """Разовая задача: строит индекс заново по всем сообщениям с текстом. Возвращает число строк."""
+    from src.config.config import settings
+    from src.services import database
+
+    # Пересоздание и граница по id - в одной пишущей транзакции: сообщения с id
+    # больше границы уже попадут в новый индекс через log_group_message
+    async with database.engine.begin() as conn:
+        # pysqlite не открывает транзакцию перед DDL - берем блокировку записи явно
+        await conn.exec_driver_sql("BEGIN IMMEDIATE")
+        await conn.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        await conn.run_sync(create_search_table, settings.search_tokenizer)
+        max_id = (await conn.execute(select(func.max(GroupMessage.id)))).scalar() or 0
+
+    total = 0
+    last_id = 0
+    while last_id < max_id:
+        try:
+            async with get_session() as session:
+                result = await session.execute(
+                    select(GroupMessage)
+                    .where(GroupMessage.id > last_id, GroupMessage.id <= max_id)
+                    .order_by(GroupMessage.id)
+                    .limit(batch_size)
+                )
+                messages = result.scalars().all()
+                if not messages:
+                    break
+                rows = [(message.id, message.text) for message in messages if message.text]
+                await index_messages(session, rows)
+                total += len(rows)
+                last_id = messages[-1].id
+        except SQLAlchemyError as e:
+            logging.error(f"Search reindex stopped after id {last_id}: {e}")
+            break
+    logging.info(f"Search index rebuilt: {total} messages indexed")
+    return total
@@ -0,0 +1,117 @@
+# src/services/sketch_service.py
+import datetime
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import UniqueSketch
+from src.services.database import get_session
+from src.utils.hyperloglog import HyperLogLog, merge_blobs, register_position
+
+# --- Приближенные счетчики уникальных пользователей ---
+# Вместо COUNT(DISTINCT user_id) по requests и group_messages храним
+# HyperLogLog-скетчи: по ссылке (кто запрашивал) и по группе за день (кто
+# писал). Обновление - один UPSERT в транзакции вызывающего: регистр меняется
+# SQL-функцией hll_set прямо в базе, а если он уже не меньше нового ранга,
+# строка не перезаписывается (повторные пользователи ничего не пишут).
+# Отчет за период сливает дневные скетчи - цена не зависит от объема таблиц.
+
+LINK_REQUESTERS = "link_requesters"
+CHAT_DAILY = "chat_daily"
+
+
+def chat_day_key(chat_id: int, day: datetime.date) -> str:
+    return f"{chat_id}:{day.isoformat()}"
+
+
+def _utc_day(timestamp: Optional[datetime.datetime]) -> datetime.date:
+    if timestamp is None:
+        return datetime.datetime.now(datetime.timezone.utc).date()
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc)
+    return timestamp.date()
+
+
+async def add_to_sketch(session: AsyncSession, kind: str, key: str, user_id: int) -> None:
+    """Добавляет пользователя в скетч (создает скетч при первом обращении)."""
+    index, rank = register_position(user_id)
+    initial = HyperLogLog()
+    initial.registers[index] = rank
+    stmt = sqlite_insert(UniqueSketch).values(
+        kind=kind, key=key, registers=initial.to_bytes(), updated_at=func.now()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UniqueSketch.kind, UniqueSketch.key],
+        set_={
+            "registers": func.hll_set(UniqueSketch.registers, index, rank),
+            "updated_at": func.now(),
+        },
+        where=func.hll_get(UniqueSketch.registers, index) < rank,
+    )
+    await session.execute(stmt)
+
+
+async def track_link_requester(session: AsyncSession, link_id: int, user_id: int) -> None:
+    await add_to_sketch(session, LINK_REQUESTERS, str(link_id), user_id)
+
+
+async def track_chat_activity(
+    session: AsyncSession, chat_id: int, user_id: int, timestamp: Optional[datetime.datetime] = None
+) -> None:
+    await add_to_sketch(session, CHAT_DAILY, chat_day_key(chat_id, _utc_day(timestamp)), user_id)
+
+
+async def _count(kind: str, keys: Iterable[str]) -> int:
+    keys = list(keys)
+    try:
+        async with get_session() as session:
+            result = await session.execute(
+                select(UniqueSketch.registers).where(UniqueSketch.kind == kind, UniqueSketch.key.in_(keys))
+            )
+            merged = merge_blobs(result.scalars())
+    except SQLAlchemyError as e:
+        logging.error(f"Database error reading {kind} sketches: {e}")
+        return 0
+    return merged.count() if merged is not None else 0
+
+
+async def count_link_requesters(link_id: int) -> int:
+    """Приближенное число уникальных пользователей, запросивших ссылку."""
+    return await _count(LINK_REQUESTERS, [str(link_id)])
+
+
+async def count_active_users(chat_id: int, start: datetime.date, end: Optional[datetime.date] = None) -> int:
+    """Приближенное число уникальных авторов сообщений в группе за дни [start, end] (UTC)."""
+    end = end or start
+    days = (end - start).days + 1
+    return await _count(CHAT_DAILY, (chat_day_key(chat_id, start + datetime.timedelta(days=n)) for n in range(days)))
+
+
+def backfill_sketches(sync_conn) -> None:
+    """Строит скетчи по уже сохраненным запросам ссылок и сообщениям (разово, при создании таблицы)."""
+    sketches: Dict[Tuple[str, str], HyperLogLog] = {}
+
+    def add(kind: str, key: str, user_id: int) -> None:
+        sketches.setdefault((kind, key), HyperLogLog()).add(user_id)
+
+    request_columns = {column["name"] for column in inspect(sync_conn).get_columns("requests")}
+    if "link_id" in request_columns: # В очень старых базах запросы не привязаны к ссылкам
+        for link_id, user_id in sync_conn.exec_driver_sql("SELECT DISTINCT link_id, user_id FROM requests"):
+            if link_id is not None:
+                add(LINK_REQUESTERS, str(link_id), user_id)
+    for chat_id, day, user_id in sync_conn.exec_driver_sql(
+        "SELECT DISTINCT chat_id, date(timestamp), user_id FROM group_messages"
+    ):
+        if day is not None:
+            add(CHAT_DAILY, f"{chat_id}:{day}", user_id)
+    if not sketches:
+        return
+    sync_conn.execute(
+        UniqueSketch.__table__.insert(),
+        [{"kind": kind, "key": key, "registers": sketch.to_bytes()} for (kind, key), sketch in sketches.items()],
+    )
+    logging.info(f"Backfilled {len(sketches)} unique-user sketches")
@@ -0,0 +1,154 @@
+# src/services/sql_profiler.py
+import contextvars
+import logging
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.services.metrics import registry
+
+# --- Профилирование SQL ---
+# Обработчики before/after_cursor_execute замеряют каждый запрос,
+# копят гистограмму по нормализованному тексту запроса, пишут в лог
+# медленные запросы и суммируют "запросов на обновление" и "время БД на
+# обновление" в объект, который внешний middleware кладет в contextvars.
+
+DB_STATEMENT_LATENCY = registry.histogram(
+    "bot_db_statement_duration_seconds", "SQL statement execution time by normalized statement.",
+    ("statement",), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+DB_QUERIES_PER_UPDATE = registry.histogram(
+    "bot_db_queries_per_update", "Number of SQL statements executed while processing one update.",
+    ("event_type",), buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+)
+DB_TIME_PER_UPDATE = registry.histogram(
+    "bot_db_time_per_update_seconds", "Total SQL time spent while processing one update.", ("event_type",)
+)
+
+_enabled: bool = True
+_slow_query_threshold: float = 0.1 # секунды
+STATEMENT_LABEL_MAX_LENGTH = 160
+
+_LITERAL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class UpdateDbStats:
+    """Счетчики SQL в рамках одного обновления."""
+    __slots__ = ("queries", "db_time", "slow_queries")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0 # секунды
+        self.slow_queries = 0
+
+
+_update_stats: contextvars.ContextVar[Optional[UpdateDbStats]] = contextvars.ContextVar("update_db_stats", default=None)
+
+
+class StatementStats:
+    """Агрегированная статистика по одному нормализованному запросу."""
+    __slots__ = ("count", "total_time", "max_time")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+
+_statements: Dict[str, StatementStats] = {}
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement: str) -> str:
+    """Приводит SQL к виду без литералов: одинаковые по форме запросы дают одну строку."""
+    normalized = _LITERAL_STRING_RE.sub("?", statement)
+    normalized = _LITERAL_NUMBER_RE.sub("?", normalized)
+    # IN-списки разной длины (expanding-параметры) схлопываем в один вид
+    normalized = _IN_LIST_RE.sub("(?)", normalized)
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip()
+    return normalized
+
+
+def configure_sql_profiler(enabled: bool, slow_query_ms: float) -> None:
+    """Включает профилирование и задает порог медленного запроса."""
+    global _enabled, _slow_query_threshold
+    _enabled = enabled
+    _slow_query_threshold = slow_query_ms / 1000
+
+
+def begin_update() -> Tuple[UpdateDbStats, contextvars.Token]:
+    """Начинает подсчет запросов для обновления; вызывается внешним middleware."""
+    stats = UpdateDbStats()
+    return stats, _update_stats.set(stats)
+
+
+def end_update(token: contextvars.Token, stats: UpdateDbStats, event_type: str) -> None:
+    """Завершает подсчет и отдает итоги обновления в метрики."""
+    _update_stats.reset(token)
+    if _enabled:
+        DB_QUERIES_PER_UPDATE.observe(stats.queries, event_type)
+        DB_TIME_PER_UPDATE.observe(stats.db_time, event_type)
+
+
+def current_update_stats() -> Optional[UpdateDbStats]:
+    return _update_stats.get()
+
+
+def top_statements(limit: int = 10, by: str = "total_time") -> List[Tuple[str, StatementStats]]:
+    """Возвращает самые тяжелые запросы (по суммарному времени или количеству)."""
+    return sorted(_statements.items(), key=lambda item: getattr(item[1], by), reverse=True)[:limit]
+
+
+def _record(statement: str, duration: float) -> None:
+    normalized = normalize_statement(statement)
+    stats = _statements.get(normalized)
+    if stats is None:
+        stats = _statements[normalized] = StatementStats()
+    stats.count += 1
+    stats.total_time += duration
+    if duration > stats.max_time:
+        stats.max_time = duration
+    DB_STATEMENT_LATENCY.observe(duration, normalized[:STATEMENT_LABEL_MAX_LENGTH])
+
+    update_stats = _update_stats.get()
+    if update_stats is not None:
+        update_stats.queries += 1
+        update_stats.db_time += duration
+
+    if duration >= _slow_query_threshold:
+        if update_stats is not None:
+            update_stats.slow_queries += 1
+        logging.warning(
+            "Slow SQL query (%.1f ms, threshold %.0f ms): %s",
+            duration * 1000, _slow_query_threshold * 1000, normalized
+        )
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Вешает на движок обработчики, замеряющие каждый SQL-запрос."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _enabled:
+            conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("profiler_start")
+        if starts:
+            _record(statement, time.perf_counter() - starts.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("profiler_start") if conn is not None else None
+        if starts:
+            _record(exception_context.statement or "", time.perf_counter() - starts.pop())
@@ -1,18 +1,49 @@
 # src/services/stats_service.py
 import logging
 import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 import pytz # Добавим pytz для increment_interview_count
 
 from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Модели и сессия
-from src.db.models import GroupMessage, UserStats
+from src.config.config import settings
+from src.db.models import ChatUserStats, GroupMessage, UserStats
 from src.services.database import get_session
+from src.services.search_service import index_messages, unindex_messages
+from src.services.sketch_service import track_chat_activity
+from src.utils.text_codec import compress_text, hash_text
 
 # --- Функции для логирования сообщений и статистики --- #
 
+def _text_values(message_text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Колонки текста для MESSAGE_CAPTURE_MODE (None - строки в group_messages не пишутся).
+
+    Возвращаются все текстовые колонки, чтобы правка затирала значения прежнего режима.
+    """
+    mode = settings.message_capture_mode
+    if mode == "counters":
+        return None
+    values: Dict[str, Any] = {
+        "message_text": None,
+        "text_compressed": None,
+        "text_hash": None,
+        "text_length": len(message_text) if message_text is not None else None,
+    }
+    if message_text is not None:
+        if mode == "hashed":
+            values["text_hash"] = hash_text(message_text)
+        elif mode == "full":
+            values["text_compressed"] = compress_text(message_text, settings.message_compression)
+    return values
+
+def _search_indexing() -> bool:
+    """Индексировать ли текст для /search: текст хранится только в режиме full."""
+    return settings.search_enabled and settings.message_capture_mode == "full"
+
 async def log_group_message(
     message_id: int,
     chat_id: int,
@@ -24,18 +55,49 @@ async def log_group_message(
     """Логирует сообщение из группы и обновляет статистику пользователя."""
     try:
         async with get_session() as session:
-            # 1. Логируем само сообщение
-            new_message = GroupMessage(
-                message_id=message_id,
+            # 1. Логируем само сообщение (что именно сохраняется - см. MESSAGE_CAPTURE_MODE)
+            text_values = _text_values(message_text)
+            if text_values is not None:
+                stmt = sqlite_insert(GroupMessage).values(
+                    message_id=message_id,
+                    chat_id=chat_id,
+                    user_id=user_id,
+                    username=username,
+                    timestamp=timestamp,
+                    **text_values
+                ).on_conflict_do_nothing(
+                    index_elements=[GroupMessage.chat_id, GroupMessage.message_id]
+                ).returning(GroupMessage.id)
+                row_id = (await session.execute(stmt)).scalar_one_or_none()
+                if row_id is None:
+                    # Повторная доставка того же сообщения - счетчик не трогаем
+                    logging.debug("Message %s in chat %s is already logged", message_id, chat_id)
+                    return True
+                if _search_indexing():
+                    await index_messages(session, [(row_id, message_text)])
+
+            # 2. Статистика пользователя в этой группе - атомарный upsert по (chat_id, user_id)
+            chat_stmt = sqlite_insert(ChatUserStats).values(
                 chat_id=chat_id,
                 user_id=user_id,
                 username=username,
-                message_text=message_text,
-                timestamp=timestamp
+                message_count=1,
+                first_seen=timestamp,
+                last_seen=timestamp
+            )
+            chat_stmt = chat_stmt.on_conflict_do_update(
+                index_elements=[ChatUserStats.chat_id, ChatUserStats.user_id],
+                set_={
+                    "message_count": ChatUserStats.message_count + 1,
+                    "last_seen": chat_stmt.excluded.last_seen,
+                    "username": func.coalesce(chat_stmt.excluded.username, ChatUserStats.username),
+                },
             )
-            session.add(new_message)
+            await session.execute(chat_stmt)
+            # Уникальные авторы группы за день (HyperLogLog)
+            await track_chat_activity(session, chat_id, user_id, timestamp)
 
-            # 2. Обновляем статистику пользователя
+            # 3. Обновляем общую статистику пользователя (по всем группам)
             stmt = select(UserStats).where(UserStats.user_id == user_id)
             result = await session.execute(stmt)
             user_stat = result.scalar_one_or_none()
@@ -46,7 +108,7 @@ async def log_group_message(
                 user_stat.last_seen = timestamp
                 if username and user_stat.username != username: # Обновляем имя пользователя, если изменилось
                     user_stat.username = username
-                logging.debug(f"Incremented message count for existing user {user_id}")
+                logging.debug("Incremented message count for existing user %s", user_id)
             else:
                 # Создаем новую запись
                 user_stat = UserStats(
@@ -58,7 +120,7 @@ async def log_group_message(
                     last_seen=timestamp
                 )
                 session.add(user_stat)
-                logging.debug(f"Created new user stats entry for user {user_id}")
+                logging.debug("Created new user stats entry for user %s", user_id)
 
             # await session.flush() # Необязательно здесь, т.к. коммит в конце
         return True
@@ -69,6 +131,89 @@ async def log_group_message(
         logging.exception(f"Unexpected error logging group message or updating stats for user_id={user_id}: {e}")
         return False
 
+async def log_group_message_edit(
+    message_id: int,
+    chat_id: int,
+    user_id: int,
+    username: Optional[str],
+    message_text: Optional[str],
+    timestamp: datetime.datetime,
+    edited_at: datetime.datetime
+) -> bool:
+    """Сохраняет правку сообщения группы в его же строку; message_count не меняется.
+
+    Если исходного сообщения нет в таблице (например, оно отправлено до запуска
+    бота), строка создается с edit_count=1.
+    """
+    text_values = _text_values(message_text)
+    if text_values is None:
+        return True # В режиме counters правки не сохраняются
+    try:
+        async with get_session() as session:
+            indexing = _search_indexing()
+            if indexing:
+                # Из contentless-индекса старую версию можно убрать только по ее тексту
+                result = await session.execute(
+                    select(GroupMessage).where(GroupMessage.chat_id == chat_id, GroupMessage.message_id == message_id)
+                )
+                previous = result.scalar_one_or_none()
+                if previous is not None:
+                    await unindex_messages(session, [(previous.id, previous.text)])
+            stmt = sqlite_insert(GroupMessage).values(
+                message_id=message_id,
+                chat_id=chat_id,
+                user_id=user_id,
+                username=username,
+                timestamp=timestamp,
+                edit_count=1,
+                edited_at=edited_at,
+                **text_values
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[GroupMessage.chat_id, GroupMessage.message_id],
+                set_={
+                    "edit_count": GroupMessage.edit_count + 1,
+                    "edited_at": stmt.excluded.edited_at,
+                    **{column: stmt.excluded[column] for column in text_values},
+                },
+            ).returning(GroupMessage.id)
+            row_id = (await session.execute(stmt)).scalar_one()
+            if indexing:
+                await index_messages(session, [(row_id, message_text)])
+            logging.debug("Stored edit of message %s in chat %s", message_id, chat_id)
+        return True
+    except SQLAlchemyError as e:
+        logging.error(f"Database error logging edit of message {message_id} in chat {chat_id}: {e}")
+        return False
+    except Exception as e:
+        logging.exception(f"Unexpected error logging edit of message {message_id} in chat {chat_id}: {e}")
+        return False
+
+async def add_interview_counts(session: AsyncSession, counts: Dict[int, Tuple[Optional[str], int]]) -> None:
+    """Увеличивает interview_count пачки пользователей в транзакции вызывающего.
+
+    counts - {user_id: (username, число запросов)}; один upsert на пользователя.
+    """
+    now = datetime.datetime.now(pytz.utc)
+    for user_id, (username, count) in counts.items():
+        stmt = sqlite_insert(UserStats).values(
+            user_id=user_id,
+            username=username,
+            message_count=0,
+            interview_count=count,
+            first_seen=now,
+            last_seen=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={
+                "interview_count": UserStats.interview_count + count,
+                "last_seen": stmt.excluded.last_seen,
+                "username": func.coalesce(stmt.excluded.username, UserStats.username),
+            },
+        )
+        await session.execute(stmt)
+
 async def increment_interview_count(user_id: int, username: Optional[str]) -> bool:
     """Увеличивает счетчик собеседований (interview_count) для пользователя."""
     try:
@@ -113,11 +258,20 @@ async def increment_interview_count(user_id: int, username: Optional[str]) -> bo
 
 # --- Функции для получения статистики --- #
 
-async def get_top_users_by_messages(limit: int = 5) -> List[UserStats]:
-    """Возвращает топ пользователей по количеству сообщений."""
+async def get_top_users_by_messages(limit: int = 5, chat_id: Optional[int] = None) -> List[UserStats | ChatUserStats]:
+    """Возвращает топ пользователей по количеству сообщений (во всех группах или в одной)."""
     async with get_session() as session:
         try:
-            stmt = select(UserStats).order_by(UserStats.message_count.desc()).limit(limit)
+            if chat_id is not None:
+                # Идет по индексу (chat_id, message_count) - строки других групп не читаются
+                stmt = (
+                    select(ChatUserStats)
+                    .where(ChatUserStats.chat_id == chat_id)
+                    .order_by(ChatUserStats.message_count.desc())
+                    .limit(limit)
+                )
+            else:
+                stmt = select(UserStats).order_by(UserStats.message_count.desc()).limit(limit)
             result = await session.execute(stmt)
             users = result.scalars().all()
             return list(users)
@@ -157,3 +311,27 @@ async def get_user_stats(user_id: int) -> Optional[UserStats]:
         except Exception as e:
             logging.exception(f"Unexpected error getting stats for user_id={user_id}: {e}")
             return None
+
+async def get_chat_user_stats(chat_id: int, user_id: int) -> Optional[ChatUserStats]:
+    """Возвращает статистику пользователя в конкретной группе."""
+    async with get_session() as session:
+        try:
+            return await session.get(ChatUserStats, (chat_id, user_id))
+        except SQLAlchemyError as e:
+            logging.error(f"Database error getting stats for user_id={user_id} in chat {chat_id}: {e}")
+            return None
+
+async def find_chat_user(chat_id: int, username: str) -> Optional[ChatUserStats]:
+    """Ищет участника группы по username (без @, без учета регистра)."""
+    async with get_session() as session:
+        try:
+            result = await session.execute(
+                select(ChatUserStats)
+                .where(ChatUserStats.chat_id == chat_id, func.lower(ChatUserStats.username) == username.lower())
+                .order_by(ChatUserStats.last_seen.desc())
+                .limit(1)
+            )
+            return result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logging.error(f"Database error looking up @{username} in chat {chat_id}: {e}")
+            return None
@@ -0,0 +1,318 @@
+# src/services/tracing.py
+import asyncio
+import contextvars
+import json
+import logging
+import secrets
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# --- Легковесная трассировка ---
+# Корневой span создается на каждое обновление во внешнем middleware,
+# дочерние - для транзакций get_session, SQL-запросов и вызовов Bot API.
+# Текущий span передается через contextvars, поэтому его видят и корутины,
+# и синхронные обработчики событий SQLAlchemy (они работают в том же контексте).
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+_enabled: bool = False
+_exporter: Optional["SpanExporter"] = None
+_finished: List[Dict[str, Any]] = []
+_export_task: Optional[asyncio.Task] = None
+
+EXPORT_INTERVAL_SECONDS = 5.0
+EXPORT_BATCH_SIZE = 512
+# Верхняя граница буфера: если экспорт не успевает, старые span'ы отбрасываются
+MAX_BUFFERED_SPANS = 20000
+SQL_STATEMENT_MAX_LENGTH = 300
+
+
+class Span:
+    """Отрезок работы с именем, атрибутами и длительностью."""
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "attributes",
+        "start_ns", "_start_perf_ns", "duration_ns", "status", "error",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._start_perf_ns = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        if self.duration_ns is not None:
+            return
+        self.duration_ns = time.perf_counter_ns() - self._start_perf_ns
+        _on_span_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.duration_ns or 0) / 1e6, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _SpanScope:
+    """Контекстный менеджер: делает span текущим на время блока."""
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Optional[Span]):
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Optional[Span]:
+        if self.span is not None:
+            self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is None:
+            return
+        if exc is not None:
+            self.span.record_error(exc)
+        _current_span.reset(self._token)
+        self.span.end()
+
+
+_NOOP_SCOPE = _SpanScope(None)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def current_span() -> Optional[Span]:
+    """Возвращает текущий span (или None, если трассировка не идет)."""
+    return _current_span.get()
+
+
+def begin_span(name: str, root: bool = False, **attributes: Any) -> Optional[Span]:
+    """Создает span без установки его текущим (для листовых span'ов, например SQL).
+
+    Дочерний span создается только внутри уже идущей трассы; root=True
+    начинает новую трассу. Если трассировка выключена, возвращает None.
+    """
+    if not _enabled:
+        return None
+    parent = _current_span.get()
+    if parent is not None and not root:
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+    if root:
+        return Span(name, secrets.token_hex(16), None, attributes)
+    return None
+
+
+def start_span(name: str, root: bool = False, **attributes: Any) -> _SpanScope:
+    """Открывает span и делает его текущим: `with start_span("db.session"): ...`."""
+    if not _enabled:
+        return _NOOP_SCOPE
+    span = begin_span(name, root=root, **attributes)
+    return _SpanScope(span) if span is not None else _NOOP_SCOPE
+
+
+def _on_span_end(span: Span) -> None:
+    """Кладет завершенный span в буфер на экспорт."""
+    if len(_finished) >= MAX_BUFFERED_SPANS:
+        del _finished[:EXPORT_BATCH_SIZE]
+    _finished.append(span.to_dict())
+
+
+# --- Экспорт --- #
+
+class SpanExporter:
+    """Базовый экспортер: получает пачку span'ов в виде словарей."""
+
+    async def export(self, spans: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    """Пишет span'ы в локальный файл, по одному JSON на строку."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, lines: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    async def export(self, spans: List[Dict[str, Any]]) -> None:
+        lines = [json.dumps(span, ensure_ascii=False, default=str) + "\n" for span in spans]
+        # Запись в файл - блокирующая операция, уводим ее из event loop
+        await asyncio.to_thread(self._write, lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """Отправляет span'ы в OTLP/HTTP-совместимый коллектор (JSON-кодировка)."""
+
+    def __init__(self, endpoint: str, service_name: str = "links-bot"):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _to_otlp(self, spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        otlp_spans = []
+        for span in spans:
+            end_ns = span["start_ns"] + int(span["duration_ms"] * 1e6)
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 1, # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span["start_ns"]),
+                "endTimeUnixNano": str(end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span["attributes"].items()],
+                # 1 - STATUS_CODE_OK, 2 - STATUS_CODE_ERROR
+                "status": {"code": 2, "message": span["error"]} if span["status"] == "error" else {"code": 1},
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            otlp_spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "src.services.tracing"}, "spans": otlp_spans}],
+            }]
+        }
+
+    async def export(self, spans: List[Dict[str, Any]]) -> None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        async with self._session.post(self.endpoint, json=self._to_otlp(spans)) as response:
+            if response.status >= 400:
+                logging.warning(f"OTLP collector {self.endpoint} responded with HTTP {response.status}")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+async def flush() -> None:
+    """Отправляет накопленные span'ы экспортеру."""
+    while _finished and _exporter is not None:
+        batch = _finished[:EXPORT_BATCH_SIZE]
+        del _finished[:EXPORT_BATCH_SIZE]
+        try:
+            await _exporter.export(batch)
+        except Exception as e:
+            logging.error(f"Failed to export {len(batch)} spans: {e}")
+            return
+
+
+async def _export_loop() -> None:
+    while True:
+        await asyncio.sleep(EXPORT_INTERVAL_SECONDS)
+        await flush()
+
+
+def configure_tracing(enabled: bool, exporter: Optional[SpanExporter] = None) -> None:
+    """Включает или выключает трассировку и задает экспортер."""
+    global _enabled, _exporter
+    _enabled = enabled and exporter is not None
+    _exporter = exporter
+
+
+def start_tracing() -> None:
+    """Запускает фоновую выгрузку span'ов (нужен работающий event loop)."""
+    global _export_task
+    if _enabled and _export_task is None:
+        _export_task = asyncio.create_task(_export_loop())
+        logging.info(f"Tracing enabled, exporter: {type(_exporter).__name__}")
+
+
+async def stop_tracing() -> None:
+    """Останавливает выгрузку и отправляет остаток буфера."""
+    global _export_task
+    if _export_task is not None:
+        _export_task.cancel()
+        _export_task = None
+    await flush()
+    if _exporter is not None:
+        await _exporter.close()
+
+
+def build_exporter(kind: str, file_path: str, otlp_endpoint: Optional[str]) -> Optional[SpanExporter]:
+    """Создает экспортер по настройкам: 'file' или 'otlp'."""
+    if kind == "otlp":
+        if not otlp_endpoint:
+            logging.error("TRACING_EXPORTER=otlp requires TRACING_OTLP_ENDPOINT, tracing disabled.")
+            return None
+        return OtlpHttpSpanExporter(otlp_endpoint)
+    if kind == "file":
+        return FileSpanExporter(Path(file_path))
+    logging.error(f"Unknown tracing exporter '{kind}', tracing disabled.")
+    return None
+
+
+# --- Инструментирование SQLAlchemy --- #
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Вешает на движок обработчики, создающие span на каждый SQL-запрос."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not _enabled:
+            return
+        span = begin_span("db.statement", statement=statement[:SQL_STATEMENT_MAX_LENGTH], executemany=executemany)
+        if span is not None:
+            conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            span = spans.pop()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("rowcount", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_error(exception_context.original_exception)
+            span.end()
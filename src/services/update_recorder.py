@@ -0,0 +1,197 @@
+# src/services/update_recorder.py
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiogram.types import Update
+
+# --- Запись трасс обновлений ---
+# Внешний middleware передает сюда каждое обновление. В трассу попадает
+# только "форма" трафика: тип события, тип чата, время прихода и обработки,
+# размер текста, команда, действие из callback data и хэши id (HMAC с
+# солью) - ни текстов, ни имен, ни настоящих id, ни токенов ссылок. Записи копятся в памяти и раз в секунду дописываются в
+# gzip-файл в отдельном потоке; при превышении размера файл ротируется
+# как у logging.handlers.RotatingFileHandler (updates.jsonl.gz.1, .2, ...).
+# benchmarks/trace_replay.py воспроизводит такие трассы через диспетчер.
+
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_BUFFERED_RECORDS = 50000
+
+# Части callback data: слова (действия, статусы) сохраняются, числа - id ссылок и
+# чатов - хэшируются как id пользователей; 0 и 1 - флаги и первая страница
+CALLBACK_WORD = re.compile(r"[a-z_]{1,32}")
+CALLBACK_INT = re.compile(r"-?\d+")
+CALLBACK_FLAGS = ("0", "1")
+TOKEN_CALLBACK_PREFIX = "lt" # LinkTokenCallback: подписанный токен ссылки в трассу не пишется
+
+
+class RotatingGzipWriter:
+    """Дописывает строки в gzip-файл и ротирует его по размеру."""
+
+    def __init__(self, path: Path, max_bytes: int, backup_count: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _backup_path(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{index}")
+
+    def _rotate(self) -> None:
+        if self.backup_count <= 0:
+            self.path.unlink(missing_ok=True)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self._backup_path(index)
+            if source.exists():
+                os.replace(source, self._backup_path(index + 1))
+        os.replace(self.path, self._backup_path(1))
+
+    def write(self, lines: List[str]) -> None:
+        if self.max_bytes and self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+            self._rotate()
+        # Каждая пачка - отдельный gzip-member, склеенные member'ы читаются как один файл
+        with gzip.open(self.path, "at", encoding="utf-8", compresslevel=6) as f:
+            f.writelines(lines)
+
+
+class UpdateRecorder:
+    """Превращает обновления в анонимные записи трассы и пишет их пачками."""
+
+    def __init__(self, writer: RotatingGzipWriter, salt: bytes, main_group_id: Optional[int] = None):
+        self.writer = writer
+        self.salt = salt
+        self.main_group_id = main_group_id
+        self._buffer: List[str] = []
+        self._dropped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _hash(self, value: int) -> str:
+        return hmac.new(self.salt, str(value).encode(), hashlib.sha256).hexdigest()[:16]
+
+    def _callback_data(self, data: str) -> str:
+        """callback data без настоящих id: "publish:#<хэш>:#<хэш>", токены ссылок - только "lt"."""
+        prefix, *parts = data.split(":")
+        if prefix == TOKEN_CALLBACK_PREFIX:
+            return prefix
+        anonymized = [prefix]
+        for part in parts:
+            if part in CALLBACK_FLAGS or CALLBACK_WORD.fullmatch(part):
+                anonymized.append(part)
+            elif CALLBACK_INT.fullmatch(part):
+                anonymized.append("#" + self._hash(int(part)))
+            else:
+                anonymized.append("?")
+        return ":".join(anonymized)
+
+    def anonymize(self, update: Update, arrived_at: float, duration: float, handled: bool) -> Dict[str, Any]:
+        """Оставляет от обновления только то, что нужно для воспроизведения нагрузки."""
+        record: Dict[str, Any] = {
+            "t": round(arrived_at, 4),
+            "dur_ms": round(duration * 1000, 3),
+            "handled": handled,
+        }
+        event = update.event
+        record["type"] = update.event_type
+        user = getattr(event, "from_user", None)
+        if user is not None:
+            record["user"] = self._hash(user.id)
+        chat = getattr(event, "chat", None)
+        message = getattr(event, "message", None) # callback_query
+        if chat is None and message is not None:
+            chat = getattr(message, "chat", None)
+        if chat is not None:
+            record["chat"] = self._hash(chat.id)
+            record["chat_type"] = chat.type
+            if chat.id == self.main_group_id:
+                record["main_group"] = True
+
+        text = getattr(event, "text", None) or getattr(event, "caption", None)
+        if text is not None:
+            record["size"] = len(text)
+            if text.startswith("/"):
+                # Имя команды без аргументов и без @botname
+                record["cmd"] = text.split(maxsplit=1)[0].split("@", 1)[0]
+            elif "http://" in text or "https://" in text:
+                record["url"] = True
+        if getattr(event, "forward_origin", None) is not None:
+            record["fwd"] = True
+        data = getattr(event, "data", None) # callback_query
+        if data is not None:
+            # Действие сохраняется, id ссылок и чатов - хэшами (chat в ChatSelectCallback совпадет с хэшем чата)
+            record["data"] = self._callback_data(data)
+        return record
+
+    def record(self, update: Update, arrived_at: float, duration: float, handled: bool) -> None:
+        if len(self._buffer) >= MAX_BUFFERED_RECORDS:
+            self._dropped += 1
+            return
+        try:
+            record = self.anonymize(update, arrived_at, duration, handled)
+        except Exception as e:
+            logging.debug("Failed to record update %s: %s", update.update_id, e)
+            return
+        self._buffer.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            # Сжатие и запись - блокирующие операции, уводим их из event loop
+            await asyncio.to_thread(self.writer.write, lines)
+        except OSError as e:
+            logging.error(f"Failed to write {len(lines)} update trace records: {e}")
+        if self._dropped:
+            logging.warning(f"Update recorder buffer overflow, dropped {self._dropped} records")
+            self._dropped = 0
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop(), name="update-recorder")
+            logging.info(f"Update recorder writing to {self.writer.path}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+update_recorder: Optional[UpdateRecorder] = None
+
+
+def configure_update_recorder(path: str, max_mb: float, backup_count: int, salt: str,
+                              main_group_id: Optional[int] = None) -> UpdateRecorder:
+    """Создает глобальный рекордер. Без соли берется случайная: хэши стабильны только в пределах запуска."""
+    global update_recorder
+    if not salt:
+        logging.warning("UPDATE_RECORDER_SALT is not set, using a random salt for this run.")
+    writer = RotatingGzipWriter(Path(path), int(max_mb * 1024 * 1024), backup_count)
+    update_recorder = UpdateRecorder(writer, (salt or secrets.token_hex(16)).encode(), main_group_id)
+    return update_recorder
+
+
+def iter_trace_records(path: Path):
+    """Читает записи трассы (gzip или обычный JSONL)."""
+    path = Path(path)
+    with open(path, "rb") as raw:
+        is_gzip = raw.read(2) == b"\x1f\x8b"
+    opener = gzip.open if is_gzip else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
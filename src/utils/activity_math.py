@@ -0,0 +1,76 @@
+# src/utils/activity_math.py
+from array import array
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError: # numpy - необязательная зависимость, без нее считаем на чистом Python
+    np = None
+
+# Расчет тепловой карты активности и тренда по меткам времени сообщений.
+# Выполняется в отдельном процессе (activity_service), поэтому модуль не
+# импортирует ничего из проекта: дочернему процессу не нужны ни БД, ни бот.
+# На вход - байты array('q') с Unix-временем сообщений (так дешевле передать
+# между процессами, чем список int).
+
+SECONDS_PER_DAY = 86400
+DAYS_PER_WEEK = 7
+HOURS_PER_DAY = 24
+# 1970-01-01 - четверг: сдвиг, чтобы понедельник был днем 0
+EPOCH_WEEKDAY = 3
+
+
+def compute_activity(timestamps: bytes, utc_offset: int, start_day: int, days: int) -> Dict[str, Any]:
+    """Тепловая карта "день недели x час" и сообщения по дням.
+
+    utc_offset - сдвиг местного времени в секундах, start_day - первый день
+    окна (номер дня от эпохи в местном времени), days - длина окна.
+    """
+    values = array("q")
+    values.frombytes(timestamps)
+    if np is not None:
+        return _compute_numpy(values, utc_offset, start_day, days)
+    return _compute_python(values, utc_offset, start_day, days)
+
+
+def _compute_numpy(values: array, utc_offset: int, start_day: int, days: int) -> Dict[str, Any]:
+    local = np.frombuffer(values, dtype=np.int64) + utc_offset
+    day = local // SECONDS_PER_DAY
+    hour_of_week = ((day + EPOCH_WEEKDAY) % DAYS_PER_WEEK) * HOURS_PER_DAY + (local % SECONDS_PER_DAY) // 3600
+    heatmap = np.bincount(hour_of_week, minlength=DAYS_PER_WEEK * HOURS_PER_DAY)
+    daily = np.bincount(np.clip(day - start_day, 0, days - 1), minlength=days)
+    slope = float(np.polyfit(np.arange(days), daily, 1)[0]) if days > 1 else 0.0
+    return {
+        "total": int(local.size),
+        "heatmap": heatmap.reshape(DAYS_PER_WEEK, HOURS_PER_DAY).tolist(),
+        "daily": daily.tolist(),
+        "slope": slope,
+    }
+
+
+def _compute_python(values: array, utc_offset: int, start_day: int, days: int) -> Dict[str, Any]:
+    heatmap = [0] * (DAYS_PER_WEEK * HOURS_PER_DAY)
+    daily = [0] * days
+    for value in values:
+        local = value + utc_offset
+        day, seconds = divmod(local, SECONDS_PER_DAY)
+        heatmap[((day + EPOCH_WEEKDAY) % DAYS_PER_WEEK) * HOURS_PER_DAY + seconds // 3600] += 1
+        daily[min(max(day - start_day, 0), days - 1)] += 1
+    return {
+        "total": len(values),
+        "heatmap": [heatmap[row * HOURS_PER_DAY:(row + 1) * HOURS_PER_DAY] for row in range(DAYS_PER_WEEK)],
+        "daily": daily,
+        "slope": _linear_slope(daily),
+    }
+
+
+def _linear_slope(values: List[int]) -> float:
+    """Наклон прямой МНК (сообщений в день за день)."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    denominator = sum((x - mean_x) ** 2 for x in range(n))
+    return numerator / denominator
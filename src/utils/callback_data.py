@@ -7,6 +7,11 @@ class LinkCallback(CallbackData, prefix="link"):
     link_id: int
 
 
+class LinkTokenCallback(CallbackData, prefix="lt"):
+    """CallbackData кнопки анонса с подписанным токеном ссылки (см. link_tokens)."""
+    token: str
+
+
 class ChatSelectCallback(CallbackData, prefix="publish"):
     """Callback data для выбора чата для публикации анонса."""
     link_id: int      # ID ссылки, которую публикуем
@@ -17,3 +22,25 @@ class LinkCallbackFactory(CallbackData, prefix="link_action"):
     """CallbackData для действий со ссылкой (например, в анонсе)."""
     action: str # Например, "get", "publish", "delete"
     link_id: int
+
+
+class SearchPageCallback(CallbackData, prefix="search"):
+    """CallbackData для листания результатов /search (сам запрос хранится в FSM)."""
+    page: int
+
+
+class LinkPageCallback(CallbackData, prefix="links"):
+    """CallbackData для листания /showlinks: в кнопке курсор (граница страницы), а не номер страницы."""
+    status: str   # Фильтр: all, pending, published, inactive, upcoming
+    back: bool    # True - страница перед границей, False - после нее
+    event_ts: int # Unix-время события ссылки-границы (только для upcoming, иначе 0)
+    link_id: int  # id ссылки-границы, 0 - первая страница
+
+
+class LinkToggleCallback(CallbackData, prefix="link_toggle"):
+    """CallbackData для включения/выключения ссылки из /showlinks (с позицией страницы для перерисовки)."""
+    link_id: int
+    active: bool  # Новое значение is_active
+    status: str
+    event_ts: int
+    anchor_id: int # Первая ссылка текущей страницы, 0 - первая страница
@@ -0,0 +1,93 @@
+# src/utils/hyperloglog.py
+import hashlib
+import math
+from typing import Iterable, Optional, Tuple
+
+# HyperLogLog - приближенный подсчет уникальных значений за O(1) памяти.
+# Скетч хранится как BLOB: 1 байт точности p + 2^p байт регистров.
+# При p=10 это 1025 байт и стандартная ошибка около 1.04/sqrt(1024) ~ 3.3%.
+# Скетчи объединяются поэлементным максимумом регистров (например, по дням),
+# поэтому "уникальные за месяц" - это слияние 30 дневных скетчей.
+
+DEFAULT_PRECISION = 10
+
+
+def _hash64(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def register_position(value, precision: int = DEFAULT_PRECISION) -> Tuple[int, int]:
+    """Номер регистра и ранг (позиция первой единицы) для значения."""
+    hashed = _hash64(value)
+    index = hashed >> (64 - precision)
+    rest_bits = 64 - precision
+    rest = hashed & ((1 << rest_bits) - 1)
+    return index, rest_bits - rest.bit_length() + 1
+
+
+class HyperLogLog:
+    """Скетч для подсчета уникальных значений."""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[bytes] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be in 4..16, got {precision}")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f"Expected {self.size} registers, got {len(self.registers)}")
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "HyperLogLog":
+        return cls(blob[0], blob[1:])
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + bytes(self.registers)
+
+    def add(self, value) -> bool:
+        """Добавляет значение. Возвращает True, если скетч изменился."""
+        index, rank = register_position(value, self.precision)
+        if self.registers[index] >= rank:
+            return False
+        self.registers[index] = rank
+        return True
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Объединяет с другим скетчем той же точности (на месте)."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        """Оценка числа уникальных значений."""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Малые мощности: линейный подсчет по пустым регистрам точнее
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+def merge_blobs(blobs: Iterable[bytes]) -> Optional[HyperLogLog]:
+    """Сливает сохраненные скетчи в один (None, если скетчей нет)."""
+    merged = None
+    for blob in blobs:
+        sketch = HyperLogLog.from_bytes(blob)
+        merged = sketch if merged is None else merged.merge(sketch)
+    return merged
+
+
+# --- Функции SQLite (регистрируются на каждом соединении в database._create_engine) ---
+# Позволяют обновить регистр одним UPSERT без чтения скетча в Python.
+
+def sql_get_register(blob: bytes, index: int) -> int:
+    return blob[1 + index]
+
+
+def sql_set_register(blob: bytes, index: int, rank: int) -> bytes:
+    if blob[1 + index] >= rank:
+        return blob
+    return blob[:1 + index] + bytes([rank]) + blob[2 + index:]
@@ -1,20 +1,39 @@
+import datetime
+from typing import Optional
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.utils.markdown import hlink
 # Повторно исправляем импорт, чтобы убедиться, что он содержит только существующие классы
-from .callback_data import ChatSelectCallback, LinkCallbackFactory
+from .callback_data import (
+    ChatSelectCallback, LinkCallbackFactory, LinkPageCallback, LinkToggleCallback, LinkTokenCallback,
+    SearchPageCallback
+)
 from src.db.models import Link # Используем напрямую модель Link
-from src.config import settings
+from src.services import link_tokens
+from src.services.chat_registry import chat_registry
+
+def _get_link_button(text: str, link_id: int, token: Optional[str] = None) -> InlineKeyboardButton:
+    """Кнопка 'Получить ссылку': с id ссылки или, если выпущен токен, с токеном (callback или deep link)."""
+    if token is None:
+        return InlineKeyboardButton(text=text, callback_data=LinkCallbackFactory(action="get", link_id=link_id).pack())
+    deep_link = link_tokens.link_token_signer.deep_link(token) if link_tokens.link_token_signer else None
+    if deep_link:
+        return InlineKeyboardButton(text=text, url=deep_link)
+    return InlineKeyboardButton(text=text, callback_data=LinkTokenCallback(token=token).pack())
+
 
-def get_link_keyboard(link_id: int) -> InlineKeyboardMarkup:
-    """Создает клавиатуру с кнопкой 'Получить ссылку' для указанного link_id."""
+def get_link_keyboard(link_id: int, joined: Optional[int] = None, token: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Создает клавиатуру с кнопкой 'Получить ссылку' для указанного link_id.
+
+    joined - сколько человек уже запросили ссылку (живой счетчик на анонсе).
+    token - подписанный токен ссылки (link_tokens), если кнопка выпущена с ним.
+    """
+    text = "🔗 Получить ссылку"
+    if joined:
+        text += f" · уже {joined}"
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(
-                text="🔗 Получить ссылку",
-                callback_data=LinkCallbackFactory(action="get", link_id=link_id).pack()
-            )
-        ]
+        [_get_link_button(text, link_id, token)]
     ])
     return keyboard
 
@@ -43,11 +62,8 @@ def format_link_message_with_button(link: Link) -> tuple[str, InlineKeyboardMark
     # Или используем стандартный текст всегда?
     # Пока используем стандартный текст.
 
-    # Используем LinkCallbackFactory для кнопки, передавая ID основной записи Link
-    builder.button(
-        text=button_text,
-        callback_data=LinkCallbackFactory(action="get", link_id=link.id).pack()
-    )
+    # Кнопка с ID основной записи Link или с подписанным токеном (LINK_TOKEN_MODE)
+    builder.add(_get_link_button(button_text, link.id, link_tokens.issue_link_token(link)))
     reply_markup = builder.as_markup()
 
     return message_text, reply_markup
@@ -58,17 +74,17 @@ def create_publish_keyboard(link_id: int) -> InlineKeyboardMarkup:
     """Создает клавиатуру для выбора чата публикации."""
     builder = InlineKeyboardBuilder()
 
-    # Используем корректное имя атрибута (нижний регистр)
-    target_chats = settings.announcement_target_chats
+    # Реестр сам перечитывает список чатов, если .env изменился
+    target_chats = chat_registry.items()
 
-    if not target_chats or not isinstance(target_chats, dict):
-        # logger.warning("Словарь announcement_target_chats не найден или пуст в настройках.")
+    if not target_chats:
+        # logger.warning("Список чатов для анонсов пуст.")
         # Можно вернуть пустую клавиатуру или клавиатуру с сообщением об ошибке
         # builder.button(text="Ошибка: Чаты не настроены", callback_data="error:no_chats")
         return builder.as_markup() # Возвращаем пустую клавиатуру
 
-    # Добавляем кнопки для каждого чата из настроек
-    for chat_name, chat_id in target_chats.items():
+    # Добавляем кнопки для каждого чата из реестра
+    for chat_name, chat_id in target_chats:
         # Используем ChatSelectCallback
         callback_data = ChatSelectCallback(
             link_id=link_id, target_chat_id=chat_id
@@ -82,3 +98,68 @@ def create_publish_keyboard(link_id: int) -> InlineKeyboardMarkup:
     builder.button(text="❌ Отмена", callback_data=LinkCallbackFactory(action="cancel_publish", link_id=link_id).pack())
     builder.adjust(1) # По одной кнопке в ряду
     return builder.as_markup()
+
+
+def create_search_keyboard(page: int, has_next: bool) -> InlineKeyboardMarkup:
+    """Кнопки листания результатов /search (пустая клавиатура, если листать некуда)."""
+    builder = InlineKeyboardBuilder()
+    if page > 0:
+        builder.button(text="◀️ Назад", callback_data=SearchPageCallback(page=page - 1).pack())
+    if has_next:
+        builder.button(text="Вперед ▶️", callback_data=SearchPageCallback(page=page + 1).pack())
+    return builder.as_markup()
+
+
+LINK_STATUS_TITLES = {
+    "all": "Все",
+    "pending": "Ожидают",
+    "published": "Опубликованы",
+    "inactive": "Выключены",
+    "upcoming": "Скоро",
+}
+
+
+def link_event_ts(status: str, link: Link) -> int:
+    """Время события ссылки для курсора upcoming (в остальных списках курсор - только id)."""
+    if status != "upcoming" or link.event_time_utc is None:
+        return 0
+    return int(link.event_time_utc.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def create_links_keyboard(links: list[Link], status: str, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
+    """Клавиатура /showlinks: включение/выключение ссылок, листание по курсору и фильтры."""
+    builder = InlineKeyboardBuilder()
+    # Позиция страницы, чтобы после переключения перерисовать ее же
+    anchor = links[0] if links and has_prev else None
+    for link in links:
+        builder.button(
+            text=f"{'⏸' if link.is_active else '▶️'} #{link.id}",
+            callback_data=LinkToggleCallback(
+                link_id=link.id, active=not link.is_active, status=status,
+                event_ts=link_event_ts(status, anchor) if anchor else 0, anchor_id=anchor.id if anchor else 0,
+            ).pack(),
+        )
+    sizes = [5] * ((len(links) + 4) // 5)
+
+    navigation = 0
+    if has_prev and links:
+        builder.button(text="◀️ Назад", callback_data=LinkPageCallback(
+            status=status, back=True, event_ts=link_event_ts(status, links[0]), link_id=links[0].id
+        ).pack())
+        navigation += 1
+    if has_next and links:
+        builder.button(text="Вперед ▶️", callback_data=LinkPageCallback(
+            status=status, back=False, event_ts=link_event_ts(status, links[-1]), link_id=links[-1].id
+        ).pack())
+        navigation += 1
+    if navigation:
+        sizes.append(navigation)
+
+    for value, title in LINK_STATUS_TITLES.items():
+        builder.button(
+            text=f"• {title}" if value == status else title,
+            callback_data=LinkPageCallback(status=value, back=False, event_ts=0, link_id=0).pack(),
+        )
+    sizes.append(3)
+    builder.adjust(*sizes)
+    return builder.as_markup()
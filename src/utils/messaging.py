@@ -1,10 +1,33 @@
 # src/utils/messaging.py
+import asyncio
 import logging
+from typing import Awaitable, Callable, TypeVar
+
 from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 
 # Предполагаем, что get_random_phrase находится здесь
 from src.utils.misc import get_random_phrase
+from src.services.tracing import start_span
+
+T = TypeVar("T")
+
+
+async def call_with_flood_control(call: Callable[[], Awaitable[T]], attempts: int = 3) -> T:
+    """Выполняет запрос к Bot API; при flood control ждет retry_after и повторяет.
+
+    Для пачек сообщений (импорт анонсов, чистка старых анонсов) вместе с
+    паузой между запросами. После attempts неудачных попыток пробрасывает
+    TelegramRetryAfter.
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except TelegramRetryAfter as e:
+            if attempt == attempts - 1:
+                raise
+            logging.warning(f"Flood control, retrying in {e.retry_after} s")
+            await asyncio.sleep(e.retry_after)
 
 async def send_link_to_user(bot: Bot, user_id: int, link_url: str, link_id: int) -> tuple[bool, str]:
     """Отправляет ссылку личным сообщением пользователю.
@@ -20,6 +43,11 @@ async def send_link_to_user(bot: Bot, user_id: int, link_url: str, link_id: int)
                         success=True, message="Ссылка отправлена..."
                         success=False, message="Ошибка: Не могу отправить..."
     """
+    with start_span("send_link_to_user", link_id=link_id):
+        return await _send_link_to_user(bot, user_id, link_url, link_id)
+
+
+async def _send_link_to_user(bot: Bot, user_id: int, link_url: str, link_id: int) -> tuple[bool, str]:
     # Получаем случайную фразу
     random_phrase = get_random_phrase()
     try:
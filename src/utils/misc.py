@@ -29,6 +29,12 @@ def _load_phrases():
         logging.exception(f"Error loading phrases from {PHRASES_FILE_PATH}: {e}")
         _phrases_cache = ["Ошибка чтения фраз."] # Запасной вариант
 
+def warm_up_phrases() -> int:
+    """Заранее загружает фразы в кэш (при старте бота, в отдельном потоке)."""
+    if not _phrases_cache:
+        _load_phrases()
+    return len(_phrases_cache)
+
 def get_random_phrase() -> str:
     """Возвращает случайную фразу из файла src/data/phrases.txt."""
     if not _phrases_cache: # Загружаем при первом вызове
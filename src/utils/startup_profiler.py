@@ -0,0 +1,61 @@
+# src/utils/startup_profiler.py
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class StartupProfiler:
+    """Замеряет фазы запуска бота и время до первого обновления.
+
+    Время считается от создания профайлера (как можно раньше в main.py).
+    Фазы могут идти параллельно - у каждой свое начало и длительность.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started_at = time.perf_counter()
+        # (название, смещение начала в секундах, длительность в секундах)
+        self.phases: List[Tuple[str, float, float]] = []
+        self.first_update_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start - self.started_at, time.perf_counter() - start))
+
+    async def run(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Выполняет корутину как отдельную фазу (удобно для asyncio.gather)."""
+        with self.phase(name):
+            return await awaitable
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def report(self) -> str:
+        """Таблица фаз в порядке начала."""
+        lines = [f"{'phase':<24} {'start, ms':>10} {'duration, ms':>13}"]
+        for name, offset, duration in sorted(self.phases, key=lambda phase: phase[1]):
+            lines.append(f"{name:<24} {offset * 1000:>10.1f} {duration * 1000:>13.1f}")
+        lines.append(f"{'total':<24} {'':>10} {self.elapsed() * 1000:>13.1f}")
+        return "\n".join(lines)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "phases": [
+                {"name": name, "start_ms": round(offset * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+                for name, offset, duration in self.phases
+            ],
+            "time_to_first_update_ms": round(self.first_update_at * 1000, 1) if self.first_update_at else None,
+        }
+
+    def first_update_middleware(self, on_first_update: Callable[[float], None]):
+        """Возвращает внешний middleware, который один раз фиксирует время первого обновления."""
+        async def middleware(handler, event, data):
+            if self.first_update_at is None:
+                self.first_update_at = self.elapsed()
+                on_first_update(self.first_update_at)
+            return await handler(event, data)
+        return middleware
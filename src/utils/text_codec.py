@@ -0,0 +1,54 @@
+# src/utils/text_codec.py
+import hashlib
+import zlib
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError: # zstandard - необязательная зависимость, без нее используется zlib
+    zstandard = None
+
+# Формат сжатого текста: 1 байт заголовка + данные.
+# Заголовок говорит, чем сжато, поэтому смена MESSAGE_COMPRESSION не ломает
+# чтение старых строк. Короткие тексты, которые не сжимаются, хранятся как есть.
+RAW = b"r"
+ZLIB = b"z"
+ZSTD = b"s"
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard is not None else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+
+def compress_text(text: str, method: str = "zlib") -> bytes:
+    """Сжимает текст для хранения в BLOB-колонке."""
+    data = text.encode("utf-8")
+    if method == "zstd" and _zstd_compressor is not None:
+        header, packed = ZSTD, _zstd_compressor.compress(data)
+    else:
+        header, packed = ZLIB, zlib.compress(data, 6)
+    if len(packed) >= len(data):
+        return RAW + data
+    return header + packed
+
+
+def decompress_text(blob: Optional[bytes]) -> Optional[str]:
+    """Восстанавливает текст из compress_text()."""
+    if not blob:
+        return None
+    header, payload = blob[:1], blob[1:]
+    if header == ZLIB:
+        data = zlib.decompress(payload)
+    elif header == ZSTD:
+        if _zstd_decompressor is None:
+            raise RuntimeError("Text is zstd-compressed, but the zstandard package is not installed")
+        data = _zstd_decompressor.decompress(payload)
+    elif header == RAW:
+        data = payload
+    else:
+        raise ValueError(f"Unknown compressed text header: {header!r}")
+    return data.decode("utf-8")
+
+
+def hash_text(text: str) -> str:
+    """Хэш текста (для поиска одинаковых сообщений без хранения содержимого)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
@@ -0,0 +1,104 @@
+# tests/test_request_export_service.py
+"""Постраничное чтение журнала запросов по ключу (requested_at, id).
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+import asyncio
+import os
+
+# Обязательные настройки для запуска без .env; реальные значения из окружения не трогаем
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-TOKEN")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("MAIN_GROUP_ID", "-1001000000001")
+
+import pytest
+
+from src.services import database
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _setup(path) -> None:
+    await database.configure_database(f"sqlite+aiosqlite:///{path}")
+    await database.async_init_db()
+    from src.services.link_service import add_links_bulk
+    await add_links_bulk(1, [
+        {"link_url": f"https://example.com/{name}", "announcement_text": name,
+         "event_time_str": None, "event_time_utc": None}
+        for name in ("a", "b")
+    ])
+    # По 7 запросов в секунду: границы страниц попадают внутрь групп с одинаковым requested_at
+    async with database.engine.begin() as conn:
+        await conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100) "
+            "INSERT INTO requests (user_id, username, link_id, requested_at) "
+            "SELECT i % 4, 'user', 1 + i % 2, datetime('2026-01-01 10:00:00', '+' || (i / 7) || ' seconds') FROM n"
+        )
+
+
+async def _collect(filters, batch_size):
+    from src.services.request_export_service import iter_request_batches
+    batches = []
+    async for rows in iter_request_batches(filters, batch_size):
+        batches.append([(row.requested_at, row.id) for row in rows])
+    return batches
+
+
+async def _expected(where: str = ""):
+    async with database.engine.connect() as conn:
+        result = await conn.exec_driver_sql(f"SELECT requested_at, id FROM requests {where} ORDER BY requested_at, id")
+        return [tuple(row) for row in result]
+
+
+@pytest.fixture
+def export_db(tmp_path):
+    _run(_setup(tmp_path / "export.db"))
+    yield
+    _run(database.engine.dispose())
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 5, 7, 10, 100, 1000])
+def test_pages_split_ties_without_gaps_or_duplicates(export_db, batch_size):
+    from src.services.request_export_service import RequestExportFilter
+
+    async def check():
+        batches = await _collect(RequestExportFilter(), batch_size)
+        rows = [row for batch in batches for row in batch]
+        assert rows == await _expected()
+        assert all(len(batch) <= batch_size for batch in batches)
+        # Хотя бы одна граница страницы внутри одной секунды (при мелких пачках)
+        if batch_size in (3, 5):
+            assert any(previous[-1][0] == batch[0][0] for previous, batch in zip(batches, batches[1:]))
+
+    _run(check())
+
+
+@pytest.mark.parametrize("filters, where", [
+    ({"link_id": 1}, "WHERE link_id = 1"),
+    ({"user_id": 3}, "WHERE user_id = 3"),
+])
+def test_filtered_pages_follow_the_same_order(export_db, filters, where):
+    from src.services.request_export_service import RequestExportFilter
+
+    async def check():
+        batches = await _collect(RequestExportFilter(**filters), 4)
+        assert [row for batch in batches for row in batch] == await _expected(where)
+
+    _run(check())
+
+
+def test_next_page_is_an_index_search(export_db):
+    async def check():
+        async with database.engine.connect() as conn:
+            for where in ("", "link_id = 1 AND ", "user_id = 3 AND "):
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT id FROM requests "
+                    f"WHERE {where}(requested_at, id) > ('2026-01-01 10:00:05', 40) ORDER BY requested_at, id LIMIT 10"
+                )
+                plan = " ".join(row[3] for row in result)
+                assert "SEARCH" in plan and "requested_at>?" in plan, plan
+
+    _run(check())